@@ -0,0 +1,100 @@
+"""LAN discovery: let children in the master's home skip the internet tunnel.
+
+A child broadcasts a small UDP probe naming the sync_id of the master it
+syncs from. A master (or relay) with that id answers with the port its
+web app listens on. Nothing secret crosses the wire here, and anything
+can answer: the child only sends its token to an address that first
+proves it holds that token (/sync/hello), and falls back to master_url
+otherwise.
+"""
+import json
+import socket
+import threading
+import config
+
+PROBE = "instapi-sync"
+
+_responder = None  # (thread, socket, stop event) while answering probes
+
+
+def start_responder(identity, port=None, host=""):
+    """Answer probes in a background thread. Returns the bound port, or None.
+
+    identity() is called per probe and returns {"id": sync_id, "port":
+    http_port}, or None while this frame isn't serving sync.
+    """
+    global _responder
+    stop_responder()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.bind((host, config.SYNC_BEACON_PORT if port is None else port))
+    except OSError as e:
+        sock.close()
+        print(f"[BEACON] Could not listen for discovery probes: {e}")
+        return None
+    sock.settimeout(0.5)  # so stop_responder isn't kept waiting
+    stop = threading.Event()
+    thread = threading.Thread(target=_respond, args=(sock, identity, stop), daemon=True)
+    thread.start()
+    _responder = (thread, sock, stop)
+    return sock.getsockname()[1]
+
+
+def stop_responder():
+    global _responder
+    if _responder:
+        thread, sock, stop = _responder
+        stop.set()
+        thread.join(timeout=2)
+        sock.close()
+        _responder = None
+
+
+def _respond(sock, identity, stop):
+    while not stop.is_set():
+        try:
+            data, addr = sock.recvfrom(1024)
+        except socket.timeout:
+            continue
+        except OSError:
+            return
+        try:
+            probe = json.loads(data)
+            wanted = probe["id"] if probe.get("probe") == PROBE else None
+        except (ValueError, TypeError, KeyError, AttributeError):
+            continue
+        info = identity()
+        if not wanted or not info or info["id"] != wanted:
+            continue
+        try:
+            sock.sendto(json.dumps({"probe": PROBE, **info}).encode(), addr)
+        except OSError:
+            pass
+
+
+def discover(sync_id, timeout=None, addr=None):
+    """Probe the LAN for the master with sync_id. Returns [(host, port)].
+
+    Sends to SYNC_DISCOVERY_ADDR (the LAN broadcast address unless
+    configured) on SYNC_BEACON_PORT, or to addr if given, and collects
+    answers for timeout seconds.
+    """
+    timeout = config.SYNC_DISCOVERY_TIMEOUT if timeout is None else timeout
+    addr = addr or (config.SYNC_DISCOVERY_ADDR, config.SYNC_BEACON_PORT)
+    found = []
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.settimeout(timeout)
+        try:
+            sock.sendto(json.dumps({"probe": PROBE, "id": sync_id}).encode(), addr)
+            while True:
+                data, (host, _) = sock.recvfrom(1024)
+                try:
+                    answer = json.loads(data)
+                    if answer.get("probe") == PROBE and answer.get("id") == sync_id:
+                        found.append((host, int(answer["port"])))
+                except (ValueError, TypeError, KeyError, AttributeError):
+                    continue
+        except OSError:
+            pass  # timed out, or no network to broadcast on
+    return found
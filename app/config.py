@@ -11,6 +11,44 @@ PICKER_API_BASE_URL = "https://photospicker.googleapis.com/v1"
 # Sync constants
 DEFAULT_SYNC_INTERVAL = 1800  # 30 minutes
 SYNC_DIR_NAME = "sync"
+OBJECTS_DIR_NAME = ".objects"  # content-addressed store under PHOTOS_DIR, keyed by MD5
+VARIANTS_DIR_NAME = ".variants"  # resolution-limited derivatives served to children
+SYNC_VARIANT_DIMS = (1280, 1920)  # max_dim values the master will render
+DEFAULT_SYNC_MAX_DIM = 1920  # child display profile; 0 = full-resolution originals
+VARIANT_QUALITY = 85
+SYNC_VARIANT_BUDGET = 20  # seconds of inline rendering per manifest request
+DEFAULT_SYNC_CONCURRENCY = 4  # parallel photo downloads per sync cycle
+MAX_SYNC_CONCURRENCY = 8
+SYNC_DOWNLOAD_ATTEMPTS = 3  # tries per photo before giving up on an MD5 mismatch
+SYNC_CHUNK_SIZE = 64 * 1024
+DEFAULT_SYNC_BUNDLE_SIZE = 20  # photos per /sync/bundle request
+MAX_SYNC_BUNDLE_PATHS = 100  # master-side cap per bundle request
+SYNC_WAIT_TIMEOUT = 55  # long-poll hold time; stays under typical proxy idle limits
+SYNC_WAIT_SETTLE = 5  # let a burst of changes land before syncing
+SYNC_CHECKPOINT_PHOTOS = 25  # publish downloaded photos to the frame every N...
+SYNC_CHECKPOINT_SECONDS = 60  # ...or every M seconds, whichever comes first
+SYNC_START_SPREAD = 60  # random extra delay before a child's first cycle
+SYNC_WAKE_SPREAD = 15  # random extra settle time after a long-poll wake-up
+SYNC_JITTER = 0.1  # +/- fraction applied to sync intervals and backoffs
+SYNC_MAX_TRANSFERS = 6  # concurrent photo/bundle responses a master serves
+MAX_SYNC_TRANSFERS = 16
+SYNC_CHILD_MAX_TRANSFERS = 4  # ...and how many of those one child may hold (its default concurrency)
+DEFAULT_SYNC_RATE_LIMIT_KBPS = 0  # master's sync upload cap in KB/s; 0 = unlimited
+QOS_INTERACTIVE_PREFIXES = ("/upload", "/admin", "/slideshow")  # never throttled
+QOS_YIELD_KBPS = 128  # sync pace while an interactive request is in flight
+SYNC_BUSY_RETRY_AFTER = 10  # Retry-After (s) sent with a busy master's 429
+SYNC_BUSY_WAIT_MAX = 30  # longest a child download waits on Retry-After mid-cycle
+SYNC_BUSY_GIVE_UP = 300  # total busy waiting per photo before it's left for a later cycle
+SYNC_FLEET_STALE_AFTER = 6 * 3600  # dashboard flags a child unseen this long (s)
+SYNC_DISCOVERY_TIMEOUT = 1.0  # how long a child listens for probe answers (s)
+SYNC_LAN_RECHECK = 600  # how often a child re-probes for its master's LAN address (s)
+# UDP port masters answer LAN discovery probes on, and where children send them
+SYNC_BEACON_PORT = int(os.environ.get('INSTAPI_BEACON_PORT', 38417))
+SYNC_DISCOVERY_ADDR = os.environ.get('INSTAPI_DISCOVERY_ADDR', '<broadcast>')
+
+# SQLite upkeep (see maintenance.py)
+DB_MAINTENANCE_INTERVAL = 6 * 3600  # seconds between maintenance passes
+DB_MAINTENANCE_RETRY = 60  # re-check after this long when the frame is busy
 
 PHOTOS_DIR = os.environ.get('INSTAPI_PHOTOS_DIR',
              os.path.join(os.path.dirname(__file__), 'static', 'photos'))
@@ -2,6 +2,8 @@ import sqlite3
 import json
 import os
 import threading
+import time
+from contextlib import contextmanager
 from config import IMAGE_EXTENSIONS
 
 DB_PATH = os.environ.get('INSTAPI_DB_PATH',
@@ -9,6 +11,58 @@ DB_PATH = os.environ.get('INSTAPI_DB_PATH',
 
 _local = threading.local()
 
+# Storage profile: connection pragmas sized for the board's RAM. Detected
+# from the device-tree model unless INSTAPI_DB_PROFILE names one.
+DB_PROFILE = os.environ.get('INSTAPI_DB_PROFILE', '')
+MODEL_FILE = '/proc/device-tree/model'
+
+# Every profile runs WAL with synchronous=NORMAL: a commit appends to the
+# WAL without an fsync and the card is synced at checkpoints. A power cut
+# can lose the last few commits but can't corrupt the database.
+DB_PROFILES = {
+    # Pi Zero / Zero 2 W: 512MB shared with Chromium, so a small page
+    # cache, no mmap and temp tables on disk
+    "zero": {
+        "synchronous": "NORMAL",
+        "cache_size": -2048,  # KiB
+        "mmap_size": 0,
+        "temp_store": "FILE",
+        "wal_autocheckpoint": 500,  # pages
+        "journal_size_limit": 4 * 1024 * 1024,
+    },
+    # Pi 4/5 (and dev machines): room to keep the whole library hot
+    "pi4": {
+        "synchronous": "NORMAL",
+        "cache_size": -16384,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 2000,
+        "journal_size_limit": 16 * 1024 * 1024,
+    },
+}
+
+# token -> label for registered child frames. Child requests authenticate
+# against this on every call (thousands a minute during a bulk sync), so it
+# is loaded once and dropped whenever the registry changes.
+_child_labels = None
+_child_labels_lock = threading.Lock()
+
+# The settings table, decoded: (DB_PATH, {key: (json_text, value)}). Hot
+# paths (slideshow polling, uploads, the admin page) read several settings
+# per request, so the table is loaded once and set/delete write through.
+# Writers replace the dict rather than mutate it, and bump the version so
+# a load that raced a write is discarded instead of installed.
+_settings = None
+_settings_version = 0
+_settings_lock = threading.Lock()
+
+# Journal entries kept after compaction; children further behind than this
+# fall back to a full manifest.
+PHOTO_CHANGES_RETAIN = 10000
+
+# Sync cycles kept in sync_log (and so in /admin/sync_metrics trends)
+SYNC_LOG_RETAIN = 50
+
 SCHEMA_SQL = """
 CREATE TABLE IF NOT EXISTS settings (
     key   TEXT PRIMARY KEY,
@@ -25,8 +79,45 @@ CREATE TABLE IF NOT EXISTS photos (
     md5         TEXT
 );
 
-CREATE INDEX IF NOT EXISTS idx_photos_uploader ON photos(uploaded_by);
-CREATE INDEX IF NOT EXISTS idx_photos_subdir ON photos(subdir);
+-- Append-only journal of photo changes. version is monotonic (AUTOINCREMENT
+-- never reuses ids), so children can ask for "everything since version N".
+CREATE TABLE IF NOT EXISTS photo_changes (
+    version     INTEGER PRIMARY KEY AUTOINCREMENT,
+    op          TEXT NOT NULL,
+    filename    TEXT NOT NULL,
+    subdir      TEXT NOT NULL DEFAULT '',
+    uploaded_by TEXT,
+    size_bytes  INTEGER DEFAULT 0,
+    md5         TEXT
+);
+
+-- Resolution-limited derivatives served to child frames, keyed by the
+-- source photo's MD5. md5 == source_md5 means the original already fits.
+CREATE TABLE IF NOT EXISTS photo_variants (
+    source_md5  TEXT NOT NULL,
+    max_dim     INTEGER NOT NULL,
+    md5         TEXT NOT NULL,
+    size_bytes  INTEGER DEFAULT 0,
+    PRIMARY KEY (source_md5, max_dim)
+);
+
+-- Child frames registered on a master. token is the primary key, so
+-- authenticating a child is an index lookup. The rest is fleet status:
+-- what the master served each child and what the child reports applying.
+CREATE TABLE IF NOT EXISTS sync_children (
+    token       TEXT PRIMARY KEY,
+    label       TEXT NOT NULL,
+    created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_seen_at    TEXT,
+    manifest_at     TEXT,
+    served_version  INTEGER,
+    applied_version INTEGER,
+    last_success_at TEXT,
+    photos_served   INTEGER DEFAULT 0,
+    bytes_served    INTEGER DEFAULT 0,
+    last_error      TEXT,
+    last_error_at   TEXT
+);
 
 CREATE TABLE IF NOT EXISTS sync_log (
     id             INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -35,88 +126,473 @@ CREATE TABLE IF NOT EXISTS sync_log (
     photos_added   INTEGER DEFAULT 0,
     photos_removed INTEGER DEFAULT 0,
     duration_s     REAL DEFAULT 0,
-    error          TEXT
+    error          TEXT,
+    bytes_downloaded INTEGER DEFAULT 0,
+    retries          INTEGER DEFAULT 0,
+    throughput_bps   REAL,
+    latency_p50_ms   REAL,
+    latency_p95_ms   REAL,
+    phase_timings    TEXT
 );
 """
 
+# sync_children columns update_sync_child may set directly (the served
+# counters are only ever incremented)
+SYNC_CHILD_STATUS_COLUMNS = frozenset({
+    "last_seen_at", "manifest_at", "served_version", "applied_version",
+    "last_success_at", "last_error", "last_error_at",
+})
+
 
 def get_db():
     """Get thread-local DB connection."""
     if not hasattr(_local, 'conn') or _local.conn is None:
         _local.conn = sqlite3.connect(DB_PATH)
         _local.conn.row_factory = sqlite3.Row
+        # Must precede anything that writes the file header (like WAL mode)
+        # to apply to a new database; older ones are converted by their
+        # first vacuum_free_pages()
+        _local.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
         _local.conn.execute("PRAGMA journal_mode=WAL")
         _local.conn.execute("PRAGMA busy_timeout=5000")
+        for pragma, value in DB_PROFILES[storage_profile()].items():
+            _local.conn.execute(f"PRAGMA {pragma}={value}")
     return _local.conn
 
 
+def storage_profile():
+    """Name of the DB_PROFILES entry connections are tuned with."""
+    if DB_PROFILE in DB_PROFILES:
+        return DB_PROFILE
+    try:
+        with open(MODEL_FILE) as f:
+            model = f.read()
+    except OSError:
+        return "pi4"
+    return "zero" if "Zero" in model else "pi4"
+
+
+@contextmanager
+def transaction():
+    """Group writes on this thread into one commit (one SD card fsync).
+
+    Mutators called inside the block skip their own commit. The outermost
+    block commits when it exits cleanly and rolls back if it raises; cache
+    updates (settings, child tokens) are applied only after the commit.
+    """
+    db = get_db()
+    depth = getattr(_local, "tx_depth", 0)
+    if depth == 0:
+        _local.tx_after = []
+    _local.tx_depth = depth + 1
+    try:
+        yield db
+        if depth == 0:
+            db.commit()
+            for callback in _local.tx_after:
+                callback()
+    except BaseException:
+        if depth == 0:
+            db.rollback()
+        raise
+    finally:
+        _local.tx_depth = depth
+        if depth == 0:
+            _local.tx_after = []
+
+
+def _commit(db):
+    """Commit now, unless a transaction() block will."""
+    if not getattr(_local, "tx_depth", 0):
+        db.commit()
+
+
+def _after_commit(callback):
+    """Run callback once the current write is committed."""
+    if getattr(_local, "tx_depth", 0):
+        _local.tx_after.append(callback)
+    else:
+        callback()
+
+
 def init_db():
-    """Create tables if they don't exist."""
+    """Create tables if they don't exist and apply pending MIGRATIONS."""
     db = get_db()
     db.executescript(SCHEMA_SQL)
+    _apply_migrations(db)
+    _migrate_sync_children_setting(db)
     db.commit()
+    _invalidate_child_labels()
+    _invalidate_settings()
+
+
+def _add_columns(db, table, columns):
+    """ALTER TABLE ADD COLUMN for each (name, declaration) the table lacks.
+
+    CREATE TABLE IF NOT EXISTS leaves existing tables alone, so migrations
+    that add columns use this to stay idempotent.
+    """
+    existing = {row["name"] for row in db.execute(f"PRAGMA table_info({table})")}
+    for name, decl in columns:
+        if name not in existing:
+            db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+def _add_sync_status_columns(db):
+    """Sync telemetry (sync_log) and fleet status (sync_children) columns,
+    added before migrations were versioned. Frozen: don't add to this list."""
+    _add_columns(db, "sync_log", [
+        ("bytes_downloaded", "INTEGER DEFAULT 0"),
+        ("retries", "INTEGER DEFAULT 0"),
+        ("throughput_bps", "REAL"),
+        ("latency_p50_ms", "REAL"),
+        ("latency_p95_ms", "REAL"),
+        ("phase_timings", "TEXT"),
+    ])
+    _add_columns(db, "sync_children", [
+        ("last_seen_at", "TEXT"),
+        ("manifest_at", "TEXT"),
+        ("served_version", "INTEGER"),
+        ("applied_version", "INTEGER"),
+        ("last_success_at", "TEXT"),
+        ("photos_served", "INTEGER DEFAULT 0"),
+        ("bytes_served", "INTEGER DEFAULT 0"),
+        ("last_error", "TEXT"),
+        ("last_error_at", "TEXT"),
+    ])
+
+
+def _add_photo_indexes(db):
+    """Covering indexes for the hot photo queries.
+
+    - manifest: (subdir, filename) order plus every column the manifest
+      and child-side diff read, so streaming it never touches the table
+    - slideshow/gallery: created_at order with the path columns
+    - uploader: per-uploader listings and the uploaded_by map
+    - md5: lookups by content
+    The plain subdir and uploaded_by indexes they supersede are dropped.
+    """
+    for statement in (
+        "CREATE INDEX IF NOT EXISTS idx_photos_manifest "
+        "ON photos(subdir, filename, md5, size_bytes, created_at, uploaded_by)",
+        "CREATE INDEX IF NOT EXISTS idx_photos_created ON photos(created_at, subdir, filename)",
+        "CREATE INDEX IF NOT EXISTS idx_photos_by_uploader ON photos(uploaded_by, filename)",
+        "CREATE INDEX IF NOT EXISTS idx_photos_md5 ON photos(md5)",
+        "DROP INDEX IF EXISTS idx_photos_path",
+        "DROP INDEX IF EXISTS idx_photos_subdir",
+        "DROP INDEX IF EXISTS idx_photos_uploader",
+    ):
+        db.execute(statement)
+
+
+# Schema changes on top of SCHEMA_SQL, as (version, description, function).
+# init_db applies those above PRAGMA user_version in order, each in its own
+# transaction with the version bump. Databases from before versioning start
+# at 0 with some changes already made, so every migration must be idempotent.
+# Append only: never renumber or edit one that has shipped. New columns go
+# in SCHEMA_SQL (for new databases) and a new migration (for existing ones).
+MIGRATIONS = [
+    (1, "sync telemetry and fleet status columns", _add_sync_status_columns),
+    (2, "covering indexes for manifest, slideshow and gallery queries", _add_photo_indexes),
+]
+
+
+def _apply_migrations(db):
+    """Bring the schema up to the last of MIGRATIONS, logging timings."""
+    current = db.execute("PRAGMA user_version").fetchone()[0]
+    pending = [m for m in MIGRATIONS if m[0] > current]
+    if not pending:
+        return
+    started = time.monotonic()
+    for version, description, migrate in pending:
+        step_started = time.monotonic()
+        db.execute("BEGIN")
+        try:
+            migrate(db)
+            db.execute(f"PRAGMA user_version={version}")
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        print(f"[MIGRATION] v{version}: {description} "
+              f"({time.monotonic() - step_started:.2f}s)")
+    print(f"[MIGRATION] Schema v{current} -> v{pending[-1][0]} "
+          f"in {time.monotonic() - started:.2f}s")
+
+
+def _migrate_sync_children_setting(db):
+    """Move children from the old JSON sync_children setting into the table."""
+    row = db.execute("SELECT value FROM settings WHERE key='sync_children'").fetchone()
+    if row is None:
+        return
+    children = json.loads(row["value"]) or []
+    db.executemany(
+        "INSERT OR IGNORE INTO sync_children (token, label) VALUES (?, ?)",
+        [(c["token"], c["label"]) for c in children]
+    )
+    db.execute("DELETE FROM settings WHERE key='sync_children'")
+    if children:
+        print(f"[MIGRATION] Moved {len(children)} sync children into their own table")
 
 
 # --- Settings helpers ---
 
 def get_setting(key, default=None):
-    """Get a setting value. Returns deserialized JSON."""
-    row = get_db().execute("SELECT value FROM settings WHERE key=?", (key,)).fetchone()
-    if row is None:
+    """Get a setting value. Returns deserialized JSON. Served from memory.
+
+    Lists and dicts come back as fresh copies, so changing one can't
+    change what the next caller reads.
+    """
+    entry = _cached_settings().get(key)
+    if entry is None:
         return default
-    return json.loads(row["value"])
+    return _settings_value(entry)
 
 
 def set_setting(key, value):
     """Set a setting value. Serializes to JSON."""
-    get_db().execute(
-        "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
-        (key, json.dumps(value))
+    set_settings({key: value})
+
+
+def set_settings(values):
+    """Set several settings in one commit. values: {key: value}."""
+    rows = [(key, json.dumps(value)) for key, value in values.items()]
+    db = get_db()
+    db.executemany(
+        "INSERT INTO settings (key, value) VALUES (?, ?) "
+        "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+        rows
     )
-    get_db().commit()
+    _commit(db)
+    for key, text in rows:
+        _after_commit(lambda key=key, text=text: _write_through(key, text))
 
 
 def delete_setting(key):
     """Delete a setting."""
     get_db().execute("DELETE FROM settings WHERE key=?", (key,))
-    get_db().commit()
+    _commit(get_db())
+    _after_commit(lambda: _write_through(key, None))
 
 
 def get_all_settings():
     """Get all settings as a dict."""
-    rows = get_db().execute("SELECT key, value FROM settings").fetchall()
-    return {row["key"]: json.loads(row["value"]) for row in rows}
+    return {key: _settings_value(entry) for key, entry in _cached_settings().items()}
 
 
 def clear_all_settings():
-    """Clear all settings (for factory reset)."""
+    """Clear all settings (for factory reset), including registered children."""
     get_db().execute("DELETE FROM settings")
-    get_db().commit()
+    get_db().execute("DELETE FROM sync_children")
+    _commit(get_db())
+    _after_commit(_invalidate_child_labels)
+    _after_commit(_invalidate_settings)
+
+
+def _settings_value(entry):
+    text, value = entry
+    return json.loads(text) if isinstance(value, (dict, list)) else value
+
+
+def _cached_settings():
+    """{key: (json_text, value)} for the current DB, loading it if needed."""
+    cached = _settings
+    if cached is not None and cached[0] == DB_PATH:
+        return cached[1]
+    return _load_settings()
+
+
+def _load_settings():
+    global _settings
+    version = _settings_version
+    path = DB_PATH
+    rows = get_db().execute("SELECT key, value FROM settings").fetchall()
+    loaded = {row["key"]: (row["value"], json.loads(row["value"])) for row in rows}
+    with _settings_lock:
+        if _settings_version == version:
+            _settings = (path, loaded)
+    return loaded
+
+
+def _write_through(key, text):
+    """Apply a committed change to the cache (text None = deleted)."""
+    global _settings, _settings_version
+    with _settings_lock:
+        _settings_version += 1
+        cached = _settings
+        if cached is None or cached[0] != DB_PATH:
+            return
+        settings = dict(cached[1])
+        if text is None:
+            settings.pop(key, None)
+        else:
+            settings[key] = (text, json.loads(text))
+        _settings = (cached[0], settings)
+
+
+def _invalidate_settings():
+    """Drop the settings cache (after the change is committed)."""
+    global _settings, _settings_version
+    with _settings_lock:
+        _settings_version += 1
+        _settings = None
+
+
+# --- Sync children helpers ---
+
+def get_sync_children():
+    """Get registered child frames as [{"label", "token"}] in creation order."""
+    rows = get_db().execute("SELECT label, token FROM sync_children ORDER BY rowid").fetchall()
+    return [dict(row) for row in rows]
+
+
+def add_sync_child(label, token):
+    """Register a child frame."""
+    get_db().execute("INSERT INTO sync_children (token, label) VALUES (?, ?)", (token, label))
+    _commit(get_db())
+    _after_commit(_invalidate_child_labels)
+
+
+def remove_sync_child(token):
+    """Unregister a child frame by token."""
+    get_db().execute("DELETE FROM sync_children WHERE token=?", (token,))
+    _commit(get_db())
+    _after_commit(_invalidate_child_labels)
+
+
+def get_sync_fleet():
+    """Get every child frame's full record (label, token and fleet status)."""
+    rows = get_db().execute("SELECT * FROM sync_children ORDER BY rowid").fetchall()
+    return [dict(row) for row in rows]
+
+
+def update_sync_child(token, photos=0, nbytes=0, **fields):
+    """Record fleet status for a child in one statement.
+
+    fields set columns (e.g. last_seen_at, applied_version); photos and
+    nbytes are added to the photos_served/bytes_served counters.
+    """
+    unknown = set(fields) - SYNC_CHILD_STATUS_COLUMNS
+    if unknown:
+        raise ValueError(f"Unknown sync_children columns: {sorted(unknown)}")
+    assignments = [f"{name}=?" for name in fields]
+    assignments += ["photos_served = photos_served + ?", "bytes_served = bytes_served + ?"]
+    get_db().execute(
+        f"UPDATE sync_children SET {', '.join(assignments)} WHERE token=?",
+        (*fields.values(), photos, nbytes, token)
+    )
+    _commit(get_db())
+
+
+def get_sync_child_label(token):
+    """Label of the child owning token, or None. Served from memory."""
+    labels = _child_labels
+    if labels is None:
+        labels = _load_child_labels()
+    return labels.get(token)
+
+
+def _load_child_labels():
+    global _child_labels
+    with _child_labels_lock:
+        if _child_labels is None:
+            rows = get_db().execute("SELECT token, label FROM sync_children").fetchall()
+            _child_labels = {row["token"]: row["label"] for row in rows}
+        return _child_labels
+
+
+def _invalidate_child_labels():
+    """Drop the token cache (after the change is committed)."""
+    global _child_labels
+    with _child_labels_lock:
+        _child_labels = None
 
 
 # --- Photos helpers ---
 
-def add_photo(filename, subdir='', uploaded_by='admin', size_bytes=0, md5=None):
-    """Add a photo record. Updates size/md5 if exists, preserves uploaded_by."""
+def add_photo(filename, subdir='', uploaded_by='admin', size_bytes=0, md5=None,
+              created_at=None):
+    """Add a photo record. Updates size/md5 if exists, preserves uploaded_by.
+
+    created_at defaults to now; sync passes the master's so a child keeps
+    the master's ordering no matter which order photos arrive in.
+    """
+    add_photos([{"filename": filename, "subdir": subdir, "uploaded_by": uploaded_by,
+                 "size_bytes": size_bytes, "md5": md5, "created_at": created_at}])
+
+
+def add_photos(photos):
+    """Add or update many photo records in one commit (see add_photo).
+
+    photos: dicts with a filename and any of subdir, uploaded_by,
+    size_bytes, md5 and created_at. Existing records are read in one
+    query and only rows that actually change are upserted and journaled,
+    so re-adding an unchanged library writes nothing.
+    """
+    photos = [dict(_PHOTO_DEFAULTS, **photo) for photo in photos]
+    if not photos:
+        return
     db = get_db()
-    existing = db.execute("SELECT id FROM photos WHERE filename=?", (filename,)).fetchone()
-    if existing:
-        db.execute(
-            "UPDATE photos SET subdir=?, size_bytes=?, md5=? WHERE filename=?",
-            (subdir, size_bytes, md5, filename)
-        )
-    else:
-        db.execute(
-            "INSERT INTO photos (filename, subdir, uploaded_by, size_bytes, md5) VALUES (?, ?, ?, ?, ?)",
-            (filename, subdir, uploaded_by, size_bytes, md5)
+    current = _photos_by_filename(db, [p["filename"] for p in photos])
+    upserts = []
+    changes = []
+    for p in photos:
+        old = current.get(p["filename"])
+        uploader = old["uploaded_by"] if old else p["uploaded_by"]
+        if old is None or old["subdir"] != p["subdir"] or old["md5"] != p["md5"]:
+            op = "add"
+        elif old["size_bytes"] != p["size_bytes"]:
+            op = "meta"
+        else:
+            continue
+        upserts.append((p["filename"], p["subdir"], p["uploaded_by"], p["size_bytes"],
+                        p["md5"], p["created_at"]))
+        changes.append((op, p["filename"], p["subdir"], uploader, p["size_bytes"], p["md5"]))
+        current[p["filename"]] = dict(p, uploaded_by=uploader)
+    if not upserts:
+        return
+    with transaction():
+        db.executemany(
+            "INSERT INTO photos (filename, subdir, uploaded_by, size_bytes, md5, created_at) "
+            "VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP)) "
+            "ON CONFLICT(filename) DO UPDATE SET "
+            "subdir=excluded.subdir, size_bytes=excluded.size_bytes, md5=excluded.md5",
+            upserts
         )
-    get_db().commit()
+        _journal_changes(db, changes)
+
+
+_PHOTO_DEFAULTS = {"subdir": "", "uploaded_by": "admin", "size_bytes": 0, "md5": None,
+                   "created_at": None}
 
 
 def remove_photo(filename):
     """Remove a photo record."""
-    get_db().execute("DELETE FROM photos WHERE filename=?", (filename,))
-    get_db().commit()
+    remove_photos([filename])
+
+
+def remove_photos(filenames):
+    """Remove many photo records in one commit. Returns the removed rows."""
+    db = get_db()
+    removed = list(_photos_by_filename(db, list(filenames)).values())
+    if not removed:
+        return []
+    with transaction():
+        db.executemany("DELETE FROM photos WHERE filename=?",
+                       [(row["filename"],) for row in removed])
+        _journal_changes(db, [("delete", row["filename"], row["subdir"], row["uploaded_by"], 0, None)
+                              for row in removed])
+    return removed
+
+
+def _photos_by_filename(db, filenames):
+    """{filename: row} for the given filenames that have records."""
+    rows = {}
+    for i in range(0, len(filenames), 500):  # stay under SQLite's variable limit
+        chunk = filenames[i:i + 500]
+        rows.update((row["filename"], row) for row in db.execute(
+            f"SELECT * FROM photos WHERE filename IN ({','.join('?' * len(chunk))})", chunk))
+    return rows
 
 
 def get_photo(filename):
@@ -134,6 +610,65 @@ def get_photos_by_uploader(uploader):
     return get_db().execute("SELECT * FROM photos WHERE uploaded_by=?", (uploader,)).fetchall()
 
 
+# What the manifest and child-side diff read from photos: exactly the
+# columns of idx_photos_manifest, so those scans never touch the table
+_MANIFEST_COLUMNS = ("subdir", "filename", "md5", "size_bytes", "created_at", "uploaded_by")
+
+
+def _published_clause(sync_dir, synced):
+    """SQL condition on p.subdir picking photos outside sync_dir, or under
+    it when synced is set, with its parameters."""
+    params = (sync_dir, len(sync_dir) + 1, sync_dir + "/")
+    if synced:
+        return "(p.subdir = ? OR substr(p.subdir, 1, ?) = ?)", params
+    return "p.subdir != ? AND substr(p.subdir, 1, ?) != ?", params
+
+
+def iter_manifest_photos(sync_dir, max_dim=0, synced=False):
+    """Cursor over photos outside sync_dir (what a master publishes), or
+    with synced=True the photos under it (what a relay republishes).
+
+    Rows come in (subdir, filename) order, each with variant_md5 and
+    variant_size of its max_dim variant (NULL if not rendered yet).
+    """
+    clause, params = _published_clause(sync_dir, synced)
+    columns = ", ".join(f"p.{name}" for name in _MANIFEST_COLUMNS)
+    return get_db().execute(
+        f"SELECT {columns}, v.md5 AS variant_md5, v.size_bytes AS variant_size FROM photos p "
+        "LEFT JOIN photo_variants v ON v.source_md5 = p.md5 AND v.max_dim = ? "
+        f"WHERE {clause} ORDER BY p.subdir, p.filename",
+        (max_dim,) + params
+    )
+
+
+def iter_synced_photos(sync_dir):
+    """Cursor over photos under sync_dir, in (subdir, filename) order."""
+    return get_db().execute(
+        f"SELECT {', '.join(_MANIFEST_COLUMNS)} FROM photos "
+        "WHERE subdir = ? OR substr(subdir, 1, ?) = ? "
+        "ORDER BY subdir, filename",
+        (sync_dir, len(sync_dir) + 1, sync_dir + "/")
+    )
+
+
+def get_photos_missing_variant(sync_dir, max_dim, synced=False):
+    """Published photos (see iter_manifest_photos) with no max_dim variant yet."""
+    clause, params = _published_clause(sync_dir, synced)
+    return get_db().execute(
+        "SELECT p.* FROM photos p "
+        "LEFT JOIN photo_variants v ON v.source_md5 = p.md5 AND v.max_dim = ? "
+        "WHERE v.md5 IS NULL AND p.md5 IS NOT NULL AND p.md5 != '' "
+        f"AND {clause}",
+        (max_dim,) + params
+    ).fetchall()
+
+
+def get_photo_md5s():
+    """Set of every photo's MD5 (empty ones left out)."""
+    rows = get_db().execute("SELECT DISTINCT md5 FROM photos WHERE md5 != ''").fetchall()
+    return {row["md5"] for row in rows}
+
+
 def get_photo_count():
     """Get total photo count."""
     return get_db().execute("SELECT COUNT(*) FROM photos").fetchone()[0]
@@ -145,6 +680,31 @@ def get_upload_meta():
     return {row["filename"]: row["uploaded_by"] for row in rows}
 
 
+def set_upload_meta(upload_meta):
+    """Apply {filename: uploaded_by} to existing photo records in bulk.
+
+    Diffs against the stored uploaders first and writes only rows that
+    changed, in one transaction, so an unchanged library costs a single
+    SELECT and no commit. Returns the number of rows updated.
+    """
+    db = get_db()
+    changed = [
+        row for row in db.execute(
+            "SELECT filename, subdir, uploaded_by, size_bytes, md5 FROM photos")
+        if upload_meta.get(row["filename"]) and upload_meta[row["filename"]] != row["uploaded_by"]
+    ]
+    if not changed:
+        return 0
+    with transaction():
+        db.executemany(
+            "UPDATE photos SET uploaded_by=? WHERE filename=?",
+            [(upload_meta[row["filename"]], row["filename"]) for row in changed]
+        )
+        _journal_changes(db, [("meta", row["filename"], row["subdir"], upload_meta[row["filename"]],
+                               row["size_bytes"], row["md5"]) for row in changed])
+    return len(changed)
+
+
 def get_photo_urls():
     """Build slideshow URL list from photos table.
 
@@ -165,36 +725,216 @@ def get_photo_urls():
 
 def clear_all_photos():
     """Clear all photo records (for factory reset)."""
-    get_db().execute("DELETE FROM photos")
-    get_db().commit()
+    db = get_db()
+    db.execute("DELETE FROM photos")
+    db.execute("DELETE FROM photo_variants")
+    # Journal can't describe "everything went away" compactly — drop it so
+    # every child falls back to a full manifest.
+    _compact_photo_changes(db, keep=0)
+    _commit(db)
+
+
+# --- Photo change journal ---
+
+def _journal_changes(db, changes):
+    """Record photo changes (caller commits).
+
+    changes: (op, filename, subdir, uploaded_by, size_bytes, md5) tuples,
+    op being add, delete or meta.
+    """
+    before = _current_change_version(db)
+    db.executemany(
+        "INSERT INTO photo_changes (op, filename, subdir, uploaded_by, size_bytes, md5) VALUES (?, ?, ?, ?, ?, ?)",
+        changes
+    )
+    # Compact occasionally (when crossing a multiple of 500) rather than on every write
+    if _current_change_version(db) // 500 != before // 500:
+        _compact_photo_changes(db, PHOTO_CHANGES_RETAIN)
+
+
+def _compact_photo_changes(db, keep):
+    """Drop all but the newest `keep` journal entries."""
+    db.execute("DELETE FROM photo_changes WHERE version <= ?",
+               (_current_change_version(db) - keep,))
+
+
+def _current_change_version(db):
+    row = db.execute("SELECT seq FROM sqlite_sequence WHERE name='photo_changes'").fetchone()
+    return row["seq"] if row else 0
+
+
+def _change_floor(db):
+    """Highest version that has been compacted away.
+
+    Versions are contiguous and only compaction deletes entries, so the
+    floor is just below the oldest surviving entry (or the current version
+    if the journal was emptied).
+    """
+    oldest = db.execute("SELECT MIN(version) FROM photo_changes").fetchone()[0]
+    if oldest is None:
+        return _current_change_version(db)
+    return oldest - 1
+
+
+def get_photo_version():
+    """Current photo journal version (0 if nothing has ever changed)."""
+    return _current_change_version(get_db())
+
+
+def get_photo_changes(since):
+    """Get journal entries newer than `since`, collapsed to the latest per file.
+
+    Each entry carries the photo's created_at (None once it's deleted).
+    Returns None if entries after `since` were compacted away (or `since`
+    is from a different database), meaning the caller needs a full manifest.
+    """
+    db = get_db()
+    if since < _change_floor(db) or since > _current_change_version(db):
+        return None
+    rows = db.execute(
+        "SELECT c.*, p.created_at FROM photo_changes c "
+        "LEFT JOIN photos p ON p.filename = c.filename "
+        "WHERE c.version > ? ORDER BY c.version", (since,)
+    ).fetchall()
+    latest = {}
+    for row in rows:
+        latest.pop(row["filename"], None)  # keep journal order of last change
+        latest[row["filename"]] = dict(row)
+    return list(latest.values())
+
+
+# --- Photo variant helpers ---
+
+def get_photo_variant(source_md5, max_dim):
+    """Get the cached variant record for a source photo at max_dim."""
+    return get_db().execute(
+        "SELECT * FROM photo_variants WHERE source_md5=? AND max_dim=?",
+        (source_md5, max_dim)
+    ).fetchone()
+
+
+def add_photo_variant(source_md5, max_dim, md5, size_bytes):
+    """Record a built variant (or that the original already fits)."""
+    get_db().execute(
+        "INSERT OR REPLACE INTO photo_variants (source_md5, max_dim, md5, size_bytes) VALUES (?, ?, ?, ?)",
+        (source_md5, max_dim, md5, size_bytes)
+    )
+    _commit(get_db())
+
+
+def get_all_photo_variants():
+    """Get all variant records."""
+    return get_db().execute("SELECT * FROM photo_variants").fetchall()
+
+
+def remove_photo_variants(source_md5):
+    """Remove every variant record of a source photo."""
+    get_db().execute("DELETE FROM photo_variants WHERE source_md5=?", (source_md5,))
+    _commit(get_db())
 
 
 # --- Sync log helpers ---
 
-def add_sync_log(result, photos_added=0, photos_removed=0, duration_s=0, error=None):
-    """Add a sync log entry and prune old entries."""
+def add_sync_log(result, photos_added=0, photos_removed=0, duration_s=0, error=None,
+                 metrics=None):
+    """Add a sync log entry and prune old entries.
+
+    metrics optionally carries the cycle's telemetry: bytes_downloaded,
+    retries, throughput_bps, latency_p50_ms, latency_p95_ms and
+    phase_timings ({phase: seconds}).
+    """
+    metrics = metrics or {}
     db = get_db()
-    db.execute(
-        "INSERT INTO sync_log (result, photos_added, photos_removed, duration_s, error) VALUES (?, ?, ?, ?, ?)",
-        (result, photos_added, photos_removed, duration_s, error)
+    cursor = db.execute(
+        "INSERT INTO sync_log (result, photos_added, photos_removed, duration_s, error, "
+        "bytes_downloaded, retries, throughput_bps, latency_p50_ms, latency_p95_ms, phase_timings) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (result, photos_added, photos_removed, duration_s, error,
+         metrics.get("bytes_downloaded", 0), metrics.get("retries", 0),
+         metrics.get("throughput_bps"), metrics.get("latency_p50_ms"),
+         metrics.get("latency_p95_ms"),
+         json.dumps(metrics["phase_timings"]) if metrics.get("phase_timings") else None)
     )
-    # Keep last 50 entries
-    db.execute("DELETE FROM sync_log WHERE id NOT IN (SELECT id FROM sync_log ORDER BY id DESC LIMIT 50)")
-    db.commit()
+    # ids are consecutive, so the retained window is a primary-key range
+    db.execute("DELETE FROM sync_log WHERE id <= ?", (cursor.lastrowid - SYNC_LOG_RETAIN,))
+    _commit(db)
+
+
+def _sync_log_entry(row):
+    entry = dict(row)
+    entry["phase_timings"] = json.loads(entry["phase_timings"]) if entry["phase_timings"] else {}
+    return entry
 
 
 def get_sync_history(limit=5):
-    """Get recent sync history."""
+    """Get recent sync history, newest first."""
     rows = get_db().execute(
         "SELECT * FROM sync_log ORDER BY id DESC LIMIT ?", (limit,)
     ).fetchall()
-    return [dict(row) for row in rows]
+    return [_sync_log_entry(row) for row in rows]
 
 
 def get_last_sync():
     """Get the most recent sync log entry."""
     row = get_db().execute("SELECT * FROM sync_log ORDER BY id DESC LIMIT 1").fetchone()
-    return dict(row) if row else None
+    return _sync_log_entry(row) if row else None
+
+
+# --- Maintenance ---
+
+def checkpoint_wal():
+    """Copy the WAL into the database and truncate it to zero bytes.
+
+    Returns (busy, wal_pages, checkpointed). busy is 1 if a reader kept the
+    checkpoint from finishing; the WAL is then left for the next attempt.
+    """
+    return tuple(get_db().execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone())
+
+
+def optimize():
+    """Refresh query planner statistics (a full ANALYZE the first time)."""
+    db = get_db()
+    analyzed = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE name='sqlite_stat1'"
+    ).fetchone()
+    db.execute("PRAGMA optimize" if analyzed else "ANALYZE")
+    _commit(db)
+
+
+def vacuum_free_pages():
+    """Hand free pages back to the filesystem. Returns the number freed.
+
+    A database created before auto_vacuum=INCREMENTAL is rebuilt once with
+    a full VACUUM to switch it over.
+    """
+    db = get_db()
+    free = db.execute("PRAGMA freelist_count").fetchone()[0]
+    if db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        db.execute("VACUUM")
+    elif free:
+        # Frees one page per step; executescript steps it to completion
+        db.executescript("PRAGMA incremental_vacuum")
+    return free
+
+
+def get_storage_stats():
+    """Database and WAL sizes, page counts and the active storage profile."""
+    db = get_db()
+
+    def pragma(name):
+        return db.execute(f"PRAGMA {name}").fetchone()[0]
+
+    wal_path = DB_PATH + "-wal"
+    return {
+        "profile": storage_profile(),
+        "page_size": pragma("page_size"),
+        "page_count": pragma("page_count"),
+        "freelist_count": pragma("freelist_count"),
+        "auto_vacuum": ("none", "full", "incremental")[pragma("auto_vacuum")],
+        "db_bytes": os.path.getsize(DB_PATH),
+        "wal_bytes": os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+    }
 
 
 # --- Migration ---
@@ -209,6 +949,7 @@ def migrate_from_json(photos_dir):
 
     print("[MIGRATION] Migrating from JSON files to SQLite...")
     migrated_files = []
+    settings = {}
 
     # 1. Migrate device_state.json
     state_file = os.environ.get('INSTAPI_STATE_FILE',
@@ -227,6 +968,14 @@ def migrate_from_json(photos_dir):
                  entry.get("duration_s", 0), entry.get("error"))
             )
 
+        # Registered children go straight into their table; init_db's move
+        # out of the old setting has already run by the time we get here
+        children = state.pop("sync_children", None) or []
+        db.executemany(
+            "INSERT OR IGNORE INTO sync_children (token, label) VALUES (?, ?)",
+            [(c["token"], c["label"]) for c in children]
+        )
+
         # Everything else goes to settings
         # Skip transient keys that shouldn't be persisted
         skip_keys = {"photo_urls", "done", "photos_chosen", "current_index",
@@ -236,7 +985,7 @@ def migrate_from_json(photos_dir):
                      "upload_processing", "upload_total", "upload_completed"}
         for key, value in state.items():
             if key not in skip_keys:
-                set_setting(key, value)
+                settings[key] = value
 
         migrated_files.append(state_file)
         print(f"[MIGRATION] Migrated device_state.json ({len(state)} settings, {len(sync_history)} sync entries)")
@@ -247,7 +996,7 @@ def migrate_from_json(photos_dir):
         with open(config_file) as f:
             config = json.load(f)
         for key, value in config.items():
-            set_setting(f"slideshow_{key}", value)
+            settings[f"slideshow_{key}"] = value
         migrated_files.append(config_file)
         print(f"[MIGRATION] Migrated slideshow_config.json ({len(config)} settings)")
 
@@ -264,7 +1013,7 @@ def migrate_from_json(photos_dir):
     photo_count = 0
     if os.path.exists(photos_dir):
         for root, dirs, files in os.walk(photos_dir):
-            dirs[:] = [d for d in dirs if d not in ('thumbs', '.staging')]
+            dirs[:] = [d for d in dirs if d not in ('thumbs', '.staging', '.objects', '.variants')]
             for f in files:
                 if f.lower().endswith(IMAGE_EXTENSIONS):
                     subdir = os.path.relpath(root, photos_dir)
@@ -279,7 +1028,9 @@ def migrate_from_json(photos_dir):
                     )
                     photo_count += 1
 
-    db.commit()
+    # One commit for the settings and everything inserted above
+    set_settings(settings)
+    _invalidate_child_labels()
     print(f"[MIGRATION] Reconciled {photo_count} photos from disk")
 
     # Rename old files (safety net - don't delete)
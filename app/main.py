@@ -19,7 +19,7 @@ def reconcile_photos():
     This ensures the slideshow and admin panel reflect reality after a reboot,
     even if the database was lost or out of sync.
     """
-    from photo_ops import walk_photos, generate_thumbnail, compute_md5
+    from photo_ops import walk_photos, generate_thumbnail, compute_md5, store_object, prune_objects
 
     photos_dir = config.PHOTOS_DIR
     actual_filenames = set()
@@ -27,6 +27,10 @@ def reconcile_photos():
     thumb_dir = os.path.join(photos_dir, "thumbs")
     os.makedirs(thumb_dir, exist_ok=True)
     md5_backfilled = 0
+    interning = True
+    # One read and one commit for the whole library, not one per photo
+    known = {row["filename"]: row for row in db.get_all_photos()}
+    found = []
 
     for filename, full_path, subdir in walk_photos(photos_dir):
         actual_filenames.add(filename)
@@ -36,17 +40,26 @@ def reconcile_photos():
             size = 0
 
         # Check if MD5 needs backfilling (only compute if not already in DB)
-        existing = db.get_photo(filename)
+        existing = known.get(filename)
+        hashed = False
         if existing and existing["md5"]:
             md5 = existing["md5"]
         else:
             md5 = compute_md5(full_path)
+            hashed = True
             md5_backfilled += 1
             if md5_backfilled % 50 == 0:
                 print(f"[RECONCILE] MD5 backfill progress: {md5_backfilled} photos...")
 
-        db.add_photo(filename, subdir=subdir, uploaded_by='admin',
-                     size_bytes=size, md5=md5)
+        found.append({"filename": filename, "subdir": subdir, "uploaded_by": "admin",
+                      "size_bytes": size, "md5": md5})
+
+        # Intern files not yet in the object store (first boot after upgrade,
+        # files copied in by hand). Key by the actual bytes, not a DB MD5
+        # that may predate an in-place edit like the USB watermark.
+        # Stop trying after a failure: the filesystem can't hardlink.
+        if interning and os.stat(full_path).st_nlink == 1:
+            interning = store_object(full_path, md5 if hashed else compute_md5(full_path))
 
         # Backfill thumbnails for photos that predate this feature
         thumb = os.path.join(thumb_dir, filename)
@@ -55,19 +68,19 @@ def reconcile_photos():
 
         photo_count += 1
 
+    db.add_photos(found)
     if photo_count > 0:
-        db.set_setting("done", True)
-        db.set_setting("photos_chosen", True)
+        db.set_settings({"done": True, "photos_chosen": True})
 
     # Remove DB records for files that no longer exist on disk
-    removed = 0
-    for row in db.get_all_photos():
-        if row["filename"] not in actual_filenames:
-            db.remove_photo(row["filename"])
-            removed += 1
+    removed = len(db.remove_photos([name for name in known if name not in actual_filenames]))
     if removed:
         print(f"Reconciled: removed {removed} stale DB records")
 
+    pruned = prune_objects()
+    if pruned:
+        print(f"Reconciled: pruned {pruned} unreferenced stored objects")
+
     if photo_count > 0:
         msg = f"Reconciled {photo_count} photos from disk"
         if md5_backfilled:
@@ -95,15 +108,14 @@ if __name__ == "__main__":
         db.set_setting("upload_token", token)
         print(f"Upload token: {token}")
 
-    # Initialize sync role
-    if db.get_setting("sync_role") == "master":
-        if not db.get_setting("sync_children"):
-            db.set_setting("sync_children", [])
+    # Checkpoint, analyze and vacuum the DB while the frame is idle
+    import maintenance
+    maintenance.start()
 
-    # Start child sync loop if configured
-    if db.get_setting("sync_role") == "child" and db.get_setting("master_url"):
+    # Start child (or relay) sync loop if configured
+    if db.get_setting("sync_role") in ("child", "relay") and db.get_setting("master_url"):
         from routes.sync_routes import start_sync_loop
-        start_sync_loop()
+        start_sync_loop(at_boot=True)
 
     # In USB mode, ensure USB content matches disk after startup.
     # This catches: failed USB updates, mode detection fixes, service restarts
@@ -124,6 +136,10 @@ if __name__ == "__main__":
     port = int(os.environ.get("PORT", 3000))
     print(f"Starting app on port {port}")
 
+    # Answer LAN discovery probes (only while this frame is a master or relay)
+    from routes.sync_routes import start_beacon
+    start_beacon(port)
+
     # Turn off the reloader to avoid double loading confusion:
     #   debug=True but use_reloader=False => You still get debug logs,
     #   but no double "restart with stat" process.
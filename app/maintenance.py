@@ -0,0 +1,96 @@
+"""Background SQLite upkeep for SD-card frames.
+
+Every DB_MAINTENANCE_INTERVAL seconds, once the frame is idle (no
+interactive request, child transfer, or sync/upload/picker job in
+flight), one pass:
+
+- refreshes query planner statistics (PRAGMA optimize),
+- hands free pages back to the filesystem (incremental vacuum),
+- checkpoints the WAL and truncates it, so the -wal file doesn't sit on
+  the card at its high-water mark.
+
+The last pass's outcome is in-memory only, like progress.py, and is
+reported by /admin/db_stats.
+"""
+import sqlite3
+import threading
+import time
+import config
+import db
+import progress
+import qos
+
+# Jobs that write heavily; maintenance waits for them to finish
+BUSY_JOBS = ("sync", "upload", "picker_download")
+
+_run_lock = threading.Lock()
+_last = None
+_thread = None
+_stop_event = threading.Event()
+
+
+def is_idle():
+    """True when nothing is being served or written in bulk."""
+    return (not qos.interactive_busy() and not qos.bulk_in_flight()
+            and not any(progress.is_running(job) for job in BUSY_JOBS))
+
+
+def run():
+    """Run one maintenance pass now. Returns its summary."""
+    global _last
+    with _run_lock:
+        timings = {}
+        started = time.time()
+
+        def timed(phase, step):
+            t0 = time.monotonic()
+            result = step()
+            timings[phase] = round(time.monotonic() - t0, 3)
+            return result
+
+        timed("optimize", db.optimize)
+        pages_freed = timed("vacuum", db.vacuum_free_pages)
+        busy, _, _ = timed("checkpoint", db.checkpoint_wal)
+        _last = {
+            "at": started,
+            "pages_freed": pages_freed,
+            "checkpoint_busy": bool(busy),
+            "phase_timings": timings,
+        }
+        print(f"[DB] Maintenance: freed {pages_freed} pages, "
+              f"checkpoint {'busy' if busy else 'done'} ({timings})", flush=True)
+        return dict(_last)
+
+
+def last_run():
+    """Summary of the last pass (None if none has run since startup)."""
+    return dict(_last) if _last else None
+
+
+def _maintenance_loop(stop_event):
+    while not stop_event.wait(config.DB_MAINTENANCE_INTERVAL):
+        while not is_idle():
+            if stop_event.wait(config.DB_MAINTENANCE_RETRY):
+                return
+        try:
+            run()
+        except sqlite3.Error as e:
+            print(f"[DB] Maintenance failed: {e}", flush=True)
+
+
+def start():
+    """Start the background maintenance thread."""
+    global _thread, _stop_event
+    stop()
+    _stop_event = threading.Event()
+    _thread = threading.Thread(target=_maintenance_loop, args=(_stop_event,), daemon=True)
+    _thread.start()
+
+
+def stop():
+    """Stop the background maintenance thread."""
+    global _thread
+    _stop_event.set()
+    if _thread and _thread.is_alive():
+        _thread.join(timeout=5)
+    _thread = None
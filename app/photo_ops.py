@@ -7,8 +7,10 @@
 import os
 import hashlib
 import threading
-from PIL import Image
-from config import IMAGE_EXTENSIONS, THUMBNAIL_SIZE, THUMBNAIL_QUALITY, PHOTOS_DIR
+from PIL import Image, ImageOps
+from config import (IMAGE_EXTENSIONS, THUMBNAIL_SIZE, THUMBNAIL_QUALITY, PHOTOS_DIR,
+                    OBJECTS_DIR_NAME, VARIANTS_DIR_NAME, VARIANT_QUALITY)
+import config
 import db
 
 
@@ -31,7 +33,7 @@ def generate_thumbnail(source_path, thumb_path):
         print(f"[THUMB] Failed for {source_path}: {e}")
 
 
-def walk_photos(directory, exclude_dirs=('thumbs', '.staging')):
+def walk_photos(directory, exclude_dirs=('thumbs', '.staging', OBJECTS_DIR_NAME, VARIANTS_DIR_NAME)):
     """Walk a directory tree yielding image files.
 
     Yields (filename, full_path, subdir) tuples where subdir is the
@@ -39,7 +41,8 @@ def walk_photos(directory, exclude_dirs=('thumbs', '.staging')):
 
     Args:
         directory: Root directory to walk
-        exclude_dirs: Directory names to skip (default: thumbs, .staging)
+        exclude_dirs: Directory names to skip (default: thumbs, .staging,
+            .objects, .variants)
     """
     if not os.path.exists(directory):
         return
@@ -54,6 +57,171 @@ def walk_photos(directory, exclude_dirs=('thumbs', '.staging')):
                 yield f, full_path, subdir
 
 
+# ============== Content-addressed store ==============
+#
+# Every photo file is also hardlinked into PHOTOS_DIR/.objects/<md5[:2]>/<md5>.
+# Byte-identical photos under different names or subdirs (a child's own
+# upload coming back down via sync, picker re-selections) then share one
+# inode, and sync can link a photo into place instead of downloading it.
+# An object whose link count drops to 1 is referenced by nothing else.
+#
+# Photo files must only ever be replaced (write elsewhere + os.replace),
+# never rewritten in place, or every name sharing the inode changes too.
+
+def object_path(md5, photos_dir=None):
+    """Path of the store object for an MD5 (whether or not it exists)."""
+    if photos_dir is None:
+        photos_dir = config.PHOTOS_DIR
+    return os.path.join(photos_dir, OBJECTS_DIR_NAME, md5[:2], md5)
+
+
+def _link_into_place(src, dest):
+    """Atomically make dest a hardlink to src. Raises OSError on failure."""
+    tmp = f"{dest}.link"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    os.link(src, tmp)
+    os.replace(tmp, dest)
+
+
+def store_object(file_path, md5, photos_dir=None):
+    """Intern a photo file into the object store.
+
+    If an object with this MD5 already exists, file_path is swapped for a
+    hardlink to it (freeing the duplicate's space); otherwise file_path
+    becomes the object. Returns True if file_path is now backed by the
+    store. Filesystems without hardlink support just keep the plain file.
+    """
+    if not md5 or not os.path.isfile(file_path):
+        return False
+    obj = object_path(md5, photos_dir)
+    try:
+        if os.path.isfile(obj):
+            if not os.path.samefile(obj, file_path):
+                _link_into_place(obj, file_path)
+        else:
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+            os.link(file_path, obj)
+        return True
+    except OSError as e:
+        print(f"[OBJECTS] Could not link {file_path}: {e}")
+        return False
+
+
+def link_object(md5, dest, photos_dir=None):
+    """Materialize a stored object at dest. Returns False if not stored."""
+    if not md5:
+        return False
+    obj = object_path(md5, photos_dir)
+    if not os.path.isfile(obj):
+        return False
+    try:
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        _link_into_place(obj, dest)
+        return True
+    except OSError as e:
+        print(f"[OBJECTS] Could not link {md5} to {dest}: {e}")
+        return False
+
+
+def release_object(md5, photos_dir=None):
+    """Drop the object for an MD5 once no photo path links to it."""
+    if not md5:
+        return
+    obj = object_path(md5, photos_dir)
+    try:
+        if os.stat(obj).st_nlink <= 1:
+            os.remove(obj)
+    except OSError:
+        pass
+
+
+def prune_objects(photos_dir=None):
+    """Remove every unreferenced object. Returns the number removed."""
+    if photos_dir is None:
+        photos_dir = config.PHOTOS_DIR
+    objects_dir = os.path.join(photos_dir, OBJECTS_DIR_NAME)
+    removed = 0
+    if not os.path.isdir(objects_dir):
+        return removed
+    for root, dirs, files in os.walk(objects_dir, topdown=False):
+        for f in files:
+            path = os.path.join(root, f)
+            try:
+                if os.stat(path).st_nlink <= 1:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        if root != objects_dir and not os.listdir(root):
+            os.rmdir(root)
+    return removed
+
+
+# ============== Resolution variants ==============
+
+def variant_path(source_md5, max_dim, photos_dir=None):
+    """Path of the cached max_dim derivative of a source photo."""
+    if photos_dir is None:
+        photos_dir = config.PHOTOS_DIR
+    return os.path.join(photos_dir, VARIANTS_DIR_NAME, str(max_dim), f"{source_md5}.jpg")
+
+
+def photo_variant(source_path, source_md5, max_dim):
+    """Return (path, md5, size) of a photo scaled to fit within max_dim.
+
+    Derivatives are rendered once and cached under PHOTOS_DIR/.variants,
+    keyed by the source MD5, with their own MD5 kept in photo_variants so
+    the manifest can list it. Photos that already fit are served as-is.
+    """
+    known = db.get_photo_variant(source_md5, max_dim)
+    path = variant_path(source_md5, max_dim)
+    if known:
+        if known["md5"] == source_md5:
+            return source_path, source_md5, known["size_bytes"]
+        if os.path.isfile(path):
+            return path, known["md5"], known["size_bytes"]
+
+    try:
+        img = Image.open(source_path)
+        if max(img.size) <= max_dim:
+            result = (source_path, source_md5, os.path.getsize(source_path))
+        else:
+            # draft() lets the JPEG decoder downscale while decoding, which
+            # is most of the cost on a Pi
+            img.draft("RGB", (max_dim, max_dim))
+            img = ImageOps.exif_transpose(img).convert("RGB")
+            img.thumbnail((max_dim, max_dim), Image.LANCZOS)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            img.save(tmp, "JPEG", quality=VARIANT_QUALITY)
+            os.replace(tmp, path)
+            result = (path, compute_md5(path), os.path.getsize(path))
+    except Exception as e:
+        # Undecodable or gone: fall back to the original, uncached
+        print(f"[VARIANT] Failed for {source_path}: {e}")
+        size = os.path.getsize(source_path) if os.path.isfile(source_path) else 0
+        return source_path, source_md5, size
+
+    db.add_photo_variant(source_md5, max_dim, result[1], result[2])
+    return result
+
+
+def prune_variants(live_md5s, photos_dir=None):
+    """Drop cached variants whose source photo is gone. Returns count removed."""
+    stale = set()
+    for row in db.get_all_photo_variants():
+        if row["source_md5"] not in live_md5s:
+            path = variant_path(row["source_md5"], row["max_dim"], photos_dir)
+            if os.path.exists(path):
+                os.remove(path)
+            stale.add(row["source_md5"])
+    with db.transaction():
+        for source_md5 in stale:
+            db.remove_photo_variants(source_md5)
+    return len(stale)
+
+
 def delete_photo_files(filename, photos_dir=None):
     """Delete a photo file, its thumbnail, and its DB record.
 
@@ -87,8 +255,10 @@ def delete_photo_files(filename, photos_dir=None):
     if os.path.exists(thumb_path):
         os.remove(thumb_path)
 
-    # Remove from DB
-    db.remove_photo(filename)
+    # Remove from DB, and the stored object if this was its last name
+    for row in db.remove_photos([filename]):
+        if row["md5"]:
+            release_object(row["md5"], photos_dir)
 
     return deleted
 
@@ -98,6 +268,7 @@ def notify_photos_changed():
 
     This is the lifecycle hook that every photo-modifying flow must call
     AFTER its batch is complete (not per-photo). It:
+    - Drops cached variants whose source photo is gone
     - Sets done/photos_chosen flags based on photo count
     - Triggers USB sync if in USB mode
 
@@ -107,6 +278,7 @@ def notify_photos_changed():
     from routes.sync_routes import mark_manifest_dirty
 
     mark_manifest_dirty()
+    prune_variants(db.get_photo_md5s())
     count = db.get_photo_count()
     if count > 0:
         db.set_setting("done", True)
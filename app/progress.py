@@ -0,0 +1,52 @@
+"""In-memory progress registry for running jobs (sync, upload, picker download).
+
+Counters here change once per photo and the admin UI polls them every few
+seconds. Keeping them out of the settings table saves a SQLite commit (an
+SD card fsync) per photo. Nothing here survives a restart, which is the
+point: a crash can't leave a job stuck "in progress". Final outcomes
+(last_sync_result, sync_log, photo records) are still persisted by callers.
+"""
+import threading
+import time
+
+# {job_id: {"running", "total", "completed", "phase", "started_at", "updated_at"}}
+_jobs = {}
+_lock = threading.Lock()
+
+
+def _idle():
+    return {"running": False, "total": 0, "completed": 0, "phase": "",
+            "started_at": None, "updated_at": None}
+
+
+def start(job, total=0, phase=""):
+    """Mark a job as running, resetting its counters."""
+    now = time.time()
+    with _lock:
+        _jobs[job] = dict(_idle(), running=True, total=total, phase=phase,
+                          started_at=now, updated_at=now)
+
+
+def update(job, **fields):
+    """Set fields (total, completed, phase) on a job's progress."""
+    with _lock:
+        state = _jobs.setdefault(job, _idle())
+        state.update(fields)
+        state["updated_at"] = time.time()
+
+
+def finish(job):
+    """Forget a job's progress; readers see it as idle again."""
+    with _lock:
+        _jobs.pop(job, None)
+
+
+def get(job):
+    """Snapshot of a job's progress (idle defaults if it isn't running)."""
+    with _lock:
+        return dict(_jobs.get(job) or _idle())
+
+
+def is_running(job):
+    with _lock:
+        return job in _jobs and _jobs[job]["running"]
@@ -0,0 +1,116 @@
+"""Master-side traffic lanes: keep family uploads fast while children sync.
+
+A master Pi has one small uplink and one Flask process. Requests fall into
+two lanes:
+
+- interactive: uploads, the admin page and the slideshow. Never limited.
+- bulk: photo and bundle transfers to child frames. Admitted under a global
+  and a per-child concurrency cap, and their bytes are paced by a shared
+  token bucket. While any interactive request is in flight, bulk drops to
+  a single transfer paced at QOS_YIELD_KBPS so uploads get the uplink.
+
+Limits come from admin settings (sync_max_transfers,
+sync_child_max_transfers, sync_rate_limit_kbps) and are read once per
+transfer. State is in-memory only, like rate_limit.py.
+"""
+import threading
+import time
+import config
+
+_lock = threading.Lock()
+_interactive = 0  # interactive requests in flight
+_bulk = {}  # {child token: bulk transfers in flight}
+
+
+def is_interactive(path):
+    """True for requests in the interactive lane."""
+    return path.startswith(config.QOS_INTERACTIVE_PREFIXES)
+
+
+def begin_interactive():
+    global _interactive
+    with _lock:
+        _interactive += 1
+
+
+def end_interactive():
+    global _interactive
+    with _lock:
+        _interactive = max(0, _interactive - 1)
+
+
+def interactive_busy():
+    """True while any interactive request is being served."""
+    return _interactive > 0
+
+
+def admit_bulk(child, max_total, max_per_child):
+    """Try to start a bulk transfer for child. Returns True if admitted.
+
+    Every admitted transfer must be ended with end_bulk(child).
+    """
+    with _lock:
+        if _interactive:
+            max_total = min(max_total, 1)
+        if sum(_bulk.values()) >= max_total or _bulk.get(child, 0) >= max_per_child:
+            return False
+        _bulk[child] = _bulk.get(child, 0) + 1
+        return True
+
+
+def end_bulk(child):
+    with _lock:
+        if _bulk.get(child, 0) <= 1:
+            _bulk.pop(child, None)
+        else:
+            _bulk[child] -= 1
+
+
+def bulk_in_flight():
+    """Snapshot of {child token: transfers in flight}."""
+    with _lock:
+        return dict(_bulk)
+
+
+class TokenBucket:
+    """Byte pacing shared by every bulk transfer.
+
+    Senders take tokens as they write and sleep off any debt, so the
+    combined rate converges on the configured one however many transfers
+    are running. Bursts are capped at one second's worth.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+        self._stamp = time.monotonic()
+
+    def consume(self, n, rate):
+        """Account for n bytes at rate bytes/sec (falsy rate = unlimited)."""
+        if not rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(rate, self._tokens + (now - self._stamp) * rate) - n
+            self._stamp = now
+            debt = -self._tokens
+        if debt > 0:
+            time.sleep(debt / rate)
+
+
+_bucket = TokenBucket()
+
+
+def paced(chunks, rate_limit):
+    """Yield chunks at no more than rate_limit bytes/sec (0 = unlimited).
+
+    Re-checks the interactive lane on every chunk, so a transfer already
+    under way slows to QOS_YIELD_KBPS as soon as an upload starts.
+    """
+    for chunk in chunks:
+        rate = rate_limit
+        if interactive_busy():
+            yield_rate = config.QOS_YIELD_KBPS * 1024
+            rate = min(rate, yield_rate) if rate else yield_rate
+        _bucket.consume(len(chunk), rate)
+        yield chunk
@@ -5,6 +5,8 @@ import socket
 from flask import render_template, jsonify, request, session, redirect, url_for
 from app import app
 import db
+import maintenance
+import progress
 import config as _config
 from config import SCOPES, PHOTOS_DIR, SECRETS_PATH, load_slideshow_config, save_slideshow_config, get_redirect_uri
 from google_auth_oauthlib.flow import Flow
@@ -75,7 +77,7 @@ def admin():
     upload_token = db.get_setting("upload_token", "")
     sync_role = db.get_setting("sync_role", "")
     # Infer master role if children exist but role wasn't saved
-    if not sync_role and db.get_setting("sync_children"):
+    if not sync_role and db.get_sync_children():
         sync_role = "master"
         db.set_setting("sync_role", "master")
     storage = get_storage_info()
@@ -261,11 +263,16 @@ def get_storage_info():
     """Get storage usage info."""
     try:
         # Get disk usage for photos directory
+        # Count each inode once: the object store hardlinks every photo
         photos_size = 0
+        seen = set()
         if os.path.exists(PHOTOS_DIR):
             for root, dirs, files in os.walk(PHOTOS_DIR):
                 for f in files:
-                    photos_size += os.path.getsize(os.path.join(root, f))
+                    st = os.stat(os.path.join(root, f))
+                    if (st.st_dev, st.st_ino) not in seen:
+                        seen.add((st.st_dev, st.st_ino))
+                        photos_size += st.st_size
 
         # Get total disk usage
         total, used, free = shutil.disk_usage("/")
@@ -298,6 +305,25 @@ def system_info():
     })
 
 
+@app.route("/admin/db_stats")
+@require_admin
+def db_stats():
+    """Return database/WAL sizes, page counts and the last maintenance pass."""
+    return jsonify({
+        "storage": db.get_storage_stats(),
+        "last_maintenance": maintenance.last_run(),
+    })
+
+
+@app.route("/admin/db_maintenance", methods=["POST"])
+@require_admin
+def db_maintenance():
+    """Run a maintenance pass now, busy or not."""
+    result = maintenance.run()
+    return jsonify({"success": True, "maintenance": result,
+                    "storage": db.get_storage_stats()})
+
+
 @app.route("/admin/photos")
 @require_admin
 def list_photos():
@@ -322,7 +348,7 @@ def list_photos():
 @app.route("/admin/delete_photo", methods=["POST"])
 @require_admin
 def delete_single_photo():
-    """Delete a single photo. On child frames, proxies to master."""
+    """Delete a single photo. On child and relay frames, proxies to master."""
     try:
         data = request.get_json()
         photo_path = data.get("path", "")
@@ -333,8 +359,8 @@ def delete_single_photo():
 
         filename = os.path.basename(photo_path)
 
-        # Child frame: proxy delete to master
-        if db.get_setting("sync_role") == "child" and "/sync/" in photo_path:
+        # Child or relay frame: proxy delete to master
+        if db.get_setting("sync_role") in ("child", "relay") and "/sync/" in photo_path:
             master_url = db.get_setting("master_url")
             sync_token = db.get_setting("sync_token")
             if not master_url or not sync_token:
@@ -431,10 +457,11 @@ def switch_mode():
 @require_admin
 def download_status():
     """Return current photo download progress."""
+    download = progress.get("picker_download")
     return jsonify({
-        "downloading": db.get_setting("downloading", False),
-        "download_total": db.get_setting("download_total", 0),
-        "download_completed": db.get_setting("download_completed", 0),
+        "downloading": download["running"],
+        "download_total": download["total"],
+        "download_completed": download["completed"],
         "done": db.get_setting("done", False),
         "photo_count": db.get_photo_count()
     })
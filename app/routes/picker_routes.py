@@ -7,7 +7,7 @@ from app import app
 import config
 import db
 from routes.sync_routes import mark_manifest_dirty
-from photo_ops import compute_md5, notify_photos_changed
+from photo_ops import compute_md5, notify_photos_changed, store_object
 from utils import (
     parse_time_value,
     poll_for_media_items,
@@ -69,7 +69,8 @@ def finalize_selection():
             picker_paths = download_and_return_paths(picker_urls, "picker")
             all_photo_urls.extend(picker_paths)
 
-            # Track downloaded picker photos in DB
+            # Track downloaded picker photos in DB (one commit)
+            records = []
             for url_path in picker_paths:
                 filename = os.path.basename(url_path)
                 photo_path = os.path.join(config.PHOTOS_DIR, "picker", filename)
@@ -78,14 +79,15 @@ def finalize_selection():
                 if os.path.isfile(photo_path):
                     file_size = os.path.getsize(photo_path)
                     file_md5 = compute_md5(photo_path)
-                db.add_photo(filename, subdir="picker", uploaded_by="picker",
-                             size_bytes=file_size, md5=file_md5)
+                records.append({"filename": filename, "subdir": "picker", "uploaded_by": "picker",
+                                "size_bytes": file_size, "md5": file_md5})
+                store_object(photo_path, file_md5)
+            db.add_photos(records)
 
     # Shuffle photos
     random.shuffle(all_photo_urls)
 
-    db.set_setting("current_index", 0)
-    db.set_setting("done", True)
+    db.set_settings({"current_index": 0, "done": True})
     mark_manifest_dirty()
     notify_photos_changed()
     return redirect(url_for("done", _external=True))
@@ -1,70 +1,413 @@
 # routes/sync_routes.py
 import os
+import gzip
+import tarfile
+import collections
+import json
 import time
+import hashlib
+import hmac
+import itertools
 import threading
 import shutil
+import random
+import weakref
+import zlib
 import secrets as secrets_mod
 import requests
-from datetime import datetime
-from flask import jsonify, request, send_from_directory
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import wraps
+from requests.adapters import HTTPAdapter
+from werkzeug.wsgi import ClosingIterator
+from flask import g, jsonify, request, send_from_directory, Response
 from app import app
+import beacon
 import config
 import db
+import progress
+import qos
 from utils import sync_photos_to_usb, get_display_mode
 from auth import require_admin
-from photo_ops import compute_md5, generate_thumbnail, walk_photos, delete_photo_files, notify_photos_changed
+from photo_ops import (compute_md5, generate_thumbnail, walk_photos, delete_photo_files,
+                       notify_photos_changed, store_object, link_object, release_object,
+                       photo_variant)
 
 # --- Manifest cache ---
+# The full manifest is built once per change, then serialized and gzipped
+# once per child label; requests only compare ETags and write cached bytes.
 _manifest_cache = None
 _manifest_dirty = True
+_manifest_lock = threading.Lock()  # single-flight rebuild
+_manifest_changed = threading.Condition()  # wakes /sync/wait long-polls
 
 
 def mark_manifest_dirty():
     """Mark manifest as needing rebuild. Call after photos change."""
     global _manifest_dirty
     _manifest_dirty = True
+    with _manifest_changed:
+        _manifest_changed.notify_all()
+
+
+def _is_synced_subdir(subdir):
+    """True for photos that live under photos/sync/ (pulled from a master)."""
+    return subdir == config.SYNC_DIR_NAME or bool(subdir and subdir.startswith(config.SYNC_DIR_NAME + "/"))
+
+
+def _serves_sync():
+    """True when this frame serves /sync/* to children: a master or a relay."""
+    return db.get_setting("sync_role") in ("master", "relay")
+
+
+def _is_relay():
+    return db.get_setting("sync_role") == "relay"
+
+
+def _published_root(relay):
+    """Directory that manifest paths are relative to."""
+    return os.path.join(config.PHOTOS_DIR, config.SYNC_DIR_NAME) if relay else config.PHOTOS_DIR
+
+
+def _published_path(subdir, filename, relay):
+    """Manifest path of a photo, or None if this frame doesn't publish it.
+
+    A master publishes its own photos and never what it pulled into sync/.
+    A relay publishes only what it pulled, with the sync/ prefix dropped,
+    so its children see the same paths as if they synced from the master.
+    """
+    if _is_synced_subdir(subdir) != relay:
+        return None
+    if relay:
+        subdir = subdir[len(config.SYNC_DIR_NAME) + 1:]
+    return f"{subdir}/{filename}" if subdir else filename
 
 
 def _build_manifest():
-    """Build photo manifest from DB (excludes sync/ photos).
+    """Build photo manifest from DB (excludes sync/ photos; on a relay,
+    only sync/ photos).
 
     Uses the photos table as source of truth. MD5 and size are already
     stored by every flow that adds photos (upload, picker, reconcile).
+    The journal version is read first, so a change racing the build is
+    at worst replayed by the child's next delta. Caller holds _manifest_lock.
     """
     global _manifest_cache, _manifest_dirty
+    # Clear first: a mark_manifest_dirty() during the build must win
+    _manifest_dirty = False
+    version = db.get_photo_version()
+    relay = _is_relay()
     photos = []
     for row in db.get_all_photos():
-        subdir = row["subdir"]
-        # Exclude synced photos from master manifest
-        if subdir == config.SYNC_DIR_NAME or (subdir and subdir.startswith(config.SYNC_DIR_NAME + "/")):
+        path = _published_path(row["subdir"], row["filename"], relay)
+        if path is None:
             continue
-        path = f"{subdir}/{row['filename']}" if subdir else row["filename"]
-        photos.append({
+        entry = {
             "path": path,
             "size": row["size_bytes"] or 0,
             "md5": row["md5"] or "",
-        })
-    _manifest_cache = {
+            "created_at": row["created_at"],
+        }
+        thumb_md5 = _thumb_md5(row["filename"])
+        if thumb_md5:
+            entry["thumb_md5"] = thumb_md5
+        photos.append(entry)
+    manifest = {
         "photos": photos,
         "photo_count": len(photos),
+        "version": version,
+        "sync_id": _sync_id(),
         "timestamp": int(time.time()),
+        # Upload metadata so children know who uploaded each photo
+        "upload_meta": db.get_upload_meta(),
     }
-    _manifest_dirty = False
+    _manifest_cache = {"manifest": manifest, "encoded": {}}
     return _manifest_cache
 
 
+_thumb_md5s = {}  # thumb path -> (mtime_ns, size, md5)
+
+
+def _thumb_md5(filename):
+    """MD5 of the master's thumbnail for a photo, or None if it has none.
+
+    Hashes are remembered and only recomputed when the thumbnail's mtime
+    or size changes, so a manifest rebuild costs one stat per photo.
+    """
+    path = os.path.join(config.PHOTOS_DIR, "thumbs", filename)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    cached = _thumb_md5s.get(path)
+    if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+    md5 = compute_md5(path)
+    _thumb_md5s[path] = (st.st_mtime_ns, st.st_size, md5)
+    return md5
+
+
+def _build_delta(since):
+    """Build a delta manifest of journal changes after `since`.
+
+    Returns None when the journal no longer reaches back that far.
+    """
+    version = db.get_photo_version()
+    changes = db.get_photo_changes(since)
+    if changes is None:
+        return None
+    relay = _is_relay()
+    entries = []
+    for change in changes:
+        version = max(version, change["version"])
+        path = _published_path(change["subdir"], change["filename"], relay)
+        if path is None:
+            continue
+        entry = {
+            "op": change["op"],
+            "path": path,
+            "size": change["size_bytes"] or 0,
+            "md5": change["md5"] or "",
+            "uploaded_by": change["uploaded_by"] or "",
+            "created_at": change["created_at"],
+        }
+        thumb_md5 = _thumb_md5(change["filename"]) if change["op"] != "delete" else None
+        if thumb_md5:
+            entry["thumb_md5"] = thumb_md5
+        entries.append(entry)
+    return {
+        "delta": True,
+        "since": since,
+        "version": version,
+        "sync_id": _sync_id(),
+        "changes": entries,
+        "timestamp": int(time.time()),
+    }
+
+
 def _get_manifest():
-    """Return cached manifest, rebuilding if dirty."""
-    global _manifest_dirty
-    if _manifest_dirty or _manifest_cache is None:
-        return _build_manifest()
-    return _manifest_cache
+    """Return the manifest cache entry, rebuilding it at most once per change."""
+    cache = _manifest_cache
+    if not _manifest_dirty and cache is not None:
+        return cache
+    with _manifest_lock:
+        if _manifest_dirty or _manifest_cache is None:
+            return _build_manifest()
+        return _manifest_cache
+
+
+def _encoded_manifest(label, max_dim=None):
+    """Return (etag, json_bytes, gzip_bytes) of the full manifest for a child.
+
+    The label is baked into the body (your_label) and a display profile
+    swaps in variant MD5s, so each (label, max_dim) gets its own encoding;
+    it is computed once and shared until the next change. Returns None
+    while variants for max_dim are still being rendered.
+
+    The ETag hashes everything but the timestamp, so unchanged content
+    keeps its ETag across rebuilds and restarts.
+    """
+    cache = _get_manifest()
+    key = (label, max_dim)
+    encoded = cache["encoded"].get(key)
+    if encoded is not None:
+        return encoded
+    # Not under _manifest_lock: rendering variants can take up to
+    # SYNC_VARIANT_BUDGET seconds, and other children's manifests shouldn't
+    # wait on it. Two requests racing here just encode the same body twice.
+    body = dict(cache["manifest"])
+    if max_dim:
+        photos = _variant_entries(body["photos"], max_dim)
+        if photos is None:
+            return None
+        body["photos"] = photos
+        body["max_dim"] = max_dim
+    if label:
+        body["your_label"] = label
+    content = dict(body, timestamp=None)
+    etag = hashlib.md5(json.dumps(content, separators=(",", ":")).encode()).hexdigest()
+    raw = json.dumps(body, separators=(",", ":")).encode()
+    return cache["encoded"].setdefault(key, (etag, raw, gzip.compress(raw)))
+
+
+_variants_warming = set()  # max_dims being rendered in the background
+_variants_warming_lock = threading.Lock()
+
+
+def _requested_dim():
+    """The child's display profile (?max_dim=), if it's one we render."""
+    max_dim = request.args.get("max_dim", type=int)
+    return max_dim if max_dim in config.SYNC_VARIANT_DIMS else None
+
+
+def _variant_entries(entries, max_dim):
+    """Swap manifest entries' md5/size for those of their max_dim variants.
+
+    Variants already rendered are a DB lookup. New ones render inline for
+    up to SYNC_VARIANT_BUDGET seconds; past that the rest render in the
+    background and None is returned, so the child retries shortly instead
+    of downloading originals it would replace on the next cycle.
+    """
+    deadline = time.time() + config.SYNC_VARIANT_BUDGET
+    root = _published_root(_is_relay())
+    result = []
+    for entry in entries:
+        if entry.get("op") == "delete" or not entry["md5"]:
+            result.append(entry)
+            continue
+        if time.time() > deadline:
+            _warm_variants_async(max_dim)
+            return None
+        _, md5, size = photo_variant(
+            os.path.join(root, entry["path"]), entry["md5"], max_dim)
+        result.append(dict(entry, md5=md5, size=size))
+    return result
+
+
+def _warm_variants_async(max_dim):
+    """Render every photo's max_dim variant in a background thread."""
+    with _variants_warming_lock:
+        if max_dim in _variants_warming:
+            return
+        _variants_warming.add(max_dim)
+    relay = _is_relay()
+
+    def warm():
+        try:
+            for row in db.get_photos_missing_variant(config.SYNC_DIR_NAME, max_dim, relay):
+                photo_variant(_photo_file(row), row["md5"], max_dim)
+            print(f"[SYNC] Variants ready for max_dim={max_dim}")
+        finally:
+            with _variants_warming_lock:
+                _variants_warming.discard(max_dim)
+
+    threading.Thread(target=warm, daemon=True).start()
+
+
+def _ensure_variants(max_dim):
+    """Render the max_dim variants the library still lacks.
+
+    Same budget as _variant_entries: past SYNC_VARIANT_BUDGET seconds the
+    rest render in the background and False is returned.
+    """
+    if max_dim in _variants_warming:
+        return False
+    deadline = time.time() + config.SYNC_VARIANT_BUDGET
+    for row in db.get_photos_missing_variant(config.SYNC_DIR_NAME, max_dim, _is_relay()):
+        if time.time() > deadline:
+            _warm_variants_async(max_dim)
+            return False
+        photo_variant(_photo_file(row), row["md5"], max_dim)
+    return True
+
+
+def _photo_file(row):
+    return os.path.join(config.PHOTOS_DIR, row["subdir"], row["filename"])
+
+
+def _variants_pending():
+    """503 telling a child to come back once its variants are rendered."""
+    resp = jsonify({"error": "Preparing photos for this display, retry shortly"})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = "30"
+    return resp
+
+
+def _bulk_lane(view):
+    """Admit a photo transfer into qos's bulk lane; past its caps, 429.
+
+    Caps (total and per child token) and the byte rate come from admin
+    settings. The slot is held until the response body has been sent
+    (or, should the server never close it, until the body is garbage
+    collected), so a dozen frames catching up at once queue on their
+    side instead of ours.
+    """
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        child = request.args.get("token") or (request.get_json(silent=True) or {}).get("token", "")
+        if not qos.admit_bulk(
+                child,
+                db.get_setting("sync_max_transfers", config.SYNC_MAX_TRANSFERS),
+                db.get_setting("sync_child_max_transfers", config.SYNC_CHILD_MAX_TRANSFERS)):
+            # Flow control, not a failure: the child honours Retry-After, and a
+            # child running more workers than its cap hits this routinely
+            _fleet_note(child)
+            resp = jsonify({"error": "Busy, retry shortly"})
+            resp.status_code = 429
+            resp.headers["Retry-After"] = str(config.SYNC_BUSY_RETRY_AFTER)
+            return resp
+        try:
+            resp = app.make_response(view(*args, **kwargs))
+        except BaseException:
+            qos.end_bulk(child)
+            raise
+        if not resp.is_streamed:
+            # Error or empty body: nothing left to transfer
+            qos.end_bulk(child)
+            return resp
+        # Not call_on_close: file responses are passed straight through to
+        # the server, which closes the body but never the response object
+        body = resp.response
+        release = weakref.finalize(body, qos.end_bulk, child)
+        rate = db.get_setting("sync_rate_limit_kbps", config.DEFAULT_SYNC_RATE_LIMIT_KBPS) * 1024
+        counted = _counted(body, child)
+        callbacks = [counted.close, release]
+        if hasattr(body, "close"):
+            callbacks.insert(1, body.close)
+        resp.response = ClosingIterator(qos.paced(counted, rate), callbacks)
+        return resp
+    return decorated
+
+
+@app.before_request
+def _track_interactive():
+    """Count uploads, admin and slideshow requests in qos's interactive lane."""
+    if qos.is_interactive(request.path):
+        qos.begin_interactive()
+        g.qos_interactive = True
+
+
+@app.teardown_request
+def _end_interactive(exc=None):
+    if g.pop("qos_interactive", False):
+        qos.end_interactive()
 
 
 def _validate_sync_token(token):
     """Check if token matches any registered child token on this master."""
-    children = db.get_setting("sync_children", [])
-    return any(c["token"] == token for c in children)
+    return db.get_sync_child_label(token) is not None
+
+
+def _sync_id():
+    """This frame's sync identity, which children match LAN beacons against.
+
+    Public (it rides in every manifest); tokens still do the authenticating.
+    """
+    sync_id = db.get_setting("sync_id")
+    if not sync_id:
+        sync_id = secrets_mod.token_hex(8)
+        db.set_setting("sync_id", sync_id)
+    return sync_id
+
+
+def _hello_child_id(token):
+    """Public handle for a child's token, so a LAN hello can name the child
+    without the token itself crossing the wire."""
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def _hello_proof(token, nonce, host):
+    """HMAC only a holder of token can compute, bound to the child's nonce
+    and the address (host:port) the master was reached at."""
+    return hmac.new(token.encode(), f"{nonce}|{host}".encode(), hashlib.sha256).hexdigest()
+
+
+def start_beacon(port):
+    """Answer LAN discovery probes with this frame's sync_id and web port."""
+    def identity():
+        return {"id": _sync_id(), "port": port} if _serves_sync() else None
+    return beacon.start_responder(identity)
 
 
 # ============== MASTER ENDPOINTS ==============
@@ -72,50 +415,422 @@ def _validate_sync_token(token):
 @app.route("/sync/manifest")
 def sync_manifest():
     """Serve photo manifest for child Pis to sync from."""
-    if db.get_setting("sync_role") != "master":
+    if not _serves_sync():
+        return jsonify({"error": "Not a master"}), 404
+
+    token = request.args.get("token", "")
+    label = db.get_sync_child_label(token)
+    if label is None:
+        return jsonify({"error": "Invalid token"}), 403
+
+    resp = _manifest_response(label)
+    if resp.status_code in (200, 304):
+        _flush_fleet(token, manifest_at=_now_iso(), served_version=db.get_photo_version())
+    else:
+        _flush_fleet(token, last_error=f"Manifest {resp.status_code}", last_error_at=_now_iso())
+    return resp
+
+
+def _manifest_response(label):
+    """Build the manifest response (delta, NDJSON or cached full JSON)."""
+    max_dim = _requested_dim()
+
+    # Children that know their journal version get only what changed since
+    since = request.args.get("since", type=int)
+    if since is not None:
+        version = db.get_photo_version()
+        if request.if_none_match.contains(f"v{version}"):
+            return _not_modified(f"v{version}")
+        delta = _build_delta(since)
+        if delta is not None and max_dim:
+            delta["changes"] = _variant_entries(delta["changes"], max_dim)
+            if delta["changes"] is None:
+                return _variants_pending()
+            delta["max_dim"] = max_dim
+        if delta is not None:
+            # Tell the child its own label (based on which token authenticated)
+            if label:
+                delta["your_label"] = label
+            resp = jsonify(delta)
+            resp.set_etag(f"v{delta['version']}")
+            return resp
+
+    if request.args.get("format") == "ndjson":
+        return _stream_manifest(label, max_dim)
+
+    encoded = _encoded_manifest(label, max_dim)
+    if encoded is None:
+        return _variants_pending()
+    etag, raw, gz = encoded
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
+    if request.accept_encodings["gzip"]:
+        resp = Response(gz, mimetype="application/json")
+        resp.headers["Content-Encoding"] = "gzip"
+    else:
+        resp = Response(raw, mimetype="application/json")
+    resp.vary.add("Accept-Encoding")
+    resp.set_etag(etag)
+    return resp
+
+
+def _stream_manifest(label, max_dim):
+    """Full manifest as newline-delimited JSON, generated from a DB cursor.
+
+    A header line (version, your_label, max_dim), then one line per photo
+    in (subdir, filename) order so the child can merge-diff it against its
+    own index, then a trailer with the photo count so a cut-off stream is
+    never mistaken for deletions. Nothing is held in memory on either end.
+    """
+    if max_dim and not _ensure_variants(max_dim):
+        return _variants_pending()
+    # Version first: a change racing the stream is replayed by the next delta
+    version = db.get_photo_version()
+    etag = f"n{version}.{max_dim or 0}"
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
+    header = {"version": version, "sync_id": _sync_id(), "timestamp": int(time.time())}
+    if max_dim:
+        header["max_dim"] = max_dim
+    if label:
+        header["your_label"] = label
+
+    relay = _is_relay()
+
+    def records():
+        yield header
+        count = 0
+        for row in db.iter_manifest_photos(config.SYNC_DIR_NAME, max_dim or 0, relay):
+            entry = {
+                "path": _published_path(row["subdir"], row["filename"], relay),
+                "size": row["size_bytes"] or 0,
+                "md5": row["md5"] or "",
+                "created_at": row["created_at"],
+                "uploaded_by": row["uploaded_by"],
+            }
+            if max_dim and entry["md5"]:
+                if row["variant_md5"]:
+                    entry["md5"], entry["size"] = row["variant_md5"], row["variant_size"]
+                else:
+                    # Added since _ensure_variants ran
+                    _, entry["md5"], entry["size"] = photo_variant(
+                        _photo_file(row), entry["md5"], max_dim)
+            thumb_md5 = _thumb_md5(row["filename"])
+            if thumb_md5:
+                entry["thumb_md5"] = thumb_md5
+            count += 1
+            yield entry
+        yield {"end": True, "photo_count": count}
+
+    lines = (json.dumps(r, separators=(",", ":")).encode() + b"\n" for r in records())
+    gzipped = bool(request.accept_encodings["gzip"])
+    resp = Response(_gzip_stream(lines) if gzipped else lines, mimetype="application/x-ndjson")
+    if gzipped:
+        resp.headers["Content-Encoding"] = "gzip"
+    resp.vary.add("Accept-Encoding")
+    resp.set_etag(etag)
+    return resp
+
+
+def _gzip_stream(chunks):
+    """gzip-compress an iterable of bytes as it is consumed."""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+# --- Fleet status ---
+# Activity per child (last seen, photos and bytes served, errors) is kept
+# in memory and written to sync_children about once per sync cycle: when
+# the child fetches its manifest or reports back, or the dashboard reads.
+
+_fleet_pending = {}  # token -> {"photos", "nbytes", column: value}
+_fleet_lock = threading.Lock()
+
+
+def _now_iso():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _fleet_note(token, photos=0, nbytes=0, **fields):
+    """Remember activity for a registered child until the next flush."""
+    if db.get_sync_child_label(token) is None:
+        return
+    with _fleet_lock:
+        pending = _fleet_pending.setdefault(token, {"photos": 0, "nbytes": 0})
+        pending["photos"] += photos
+        pending["nbytes"] += nbytes
+        pending.update(fields, last_seen_at=_now_iso())
+
+
+def _flush_fleet(token=None, **fields):
+    """Write remembered activity for token (seen now, plus fields), or for
+    every child when token is None."""
+    with _fleet_lock:
+        if token is None:
+            batch = dict(_fleet_pending)
+            _fleet_pending.clear()
+        else:
+            batch = {token: _fleet_pending.pop(token, {})}
+            batch[token].update(fields, last_seen_at=_now_iso())
+    for child, pending in batch.items():
+        db.update_sync_child(child, **pending)
+
+
+def _fleet_entry(child, version, now):
+    """Dashboard view of one sync_children row: lag and a one-word status."""
+    applied = child["applied_version"]
+    seen = child["last_seen_at"]
+    seen_ago = (now - datetime.fromisoformat(seen)).total_seconds() if seen else None
+    failing = child["last_error_at"] and child["last_error_at"] > (child["last_success_at"] or "")
+    if seen is None:
+        status = "never"
+    elif seen_ago > config.SYNC_FLEET_STALE_AFTER:
+        status = "stale"
+    elif failing:
+        status = "error"
+    elif applied is None or applied < version:
+        status = "behind"
+    else:
+        status = "ok"
+    return {
+        "label": child["label"],
+        "status": status,
+        "last_seen_at": seen,
+        "seen_ago_s": round(seen_ago) if seen_ago is not None else None,
+        "manifest_at": child["manifest_at"],
+        "last_success_at": child["last_success_at"],
+        "served_version": child["served_version"],
+        "applied_version": applied,
+        "versions_behind": max(0, version - applied) if applied is not None else None,
+        "photos_served": child["photos_served"] or 0,
+        "bytes_served": child["bytes_served"] or 0,
+        "last_error": child["last_error"],
+        "last_error_at": child["last_error_at"],
+    }
+
+
+def _counted(chunks, token):
+    """Pass a transfer's chunks through, crediting their bytes to token."""
+    sent = 0
+    try:
+        for chunk in chunks:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        _fleet_note(token, nbytes=sent)
+
+
+def _not_modified(etag):
+    """Empty 304 response carrying the current ETag."""
+    resp = Response(status=304)
+    resp.set_etag(etag)
+    return resp
+
+
+@app.route("/sync/hello")
+def sync_hello():
+    """Prove to a child that an address (say, one found by LAN discovery)
+    is its master, before the child sends it its token.
+
+    The child names itself with _hello_child_id and sends a fresh nonce.
+    Only its real master holds the token to answer with _hello_proof.
+    """
+    if not _serves_sync():
+        return jsonify({"error": "Not a master"}), 404
+
+    child_id = request.args.get("child", "")
+    nonce = request.args.get("nonce", "")
+    token = next((c["token"] for c in db.get_sync_children()
+                  if _hello_child_id(c["token"]) == child_id), None)
+    if token is None or not nonce:
+        return jsonify({"error": "Unknown child"}), 403
+    return jsonify({"sync_id": _sync_id(),
+                    "proof": _hello_proof(token, nonce, request.host)})
+
+
+@app.route("/sync/wait")
+def sync_wait():
+    """Long-poll: hold the request until photos change or the timeout passes.
+
+    Children pass the journal version they last applied; the response says
+    whether the master has moved past it. Returns at once if it already has.
+    """
+    if not _serves_sync():
         return jsonify({"error": "Not a master"}), 404
 
     token = request.args.get("token", "")
     if not _validate_sync_token(token):
         return jsonify({"error": "Invalid token"}), 403
+    _fleet_note(token)
 
-    manifest = _get_manifest()
-    # Include upload metadata so children know who uploaded each photo
-    manifest["upload_meta"] = db.get_upload_meta()
-    # Tell the child its own label (based on which token authenticated)
-    for child in db.get_setting("sync_children", []):
-        if child["token"] == token:
-            manifest["your_label"] = child["label"]
-            break
-    return jsonify(manifest)
+    version = request.args.get("version", type=int)
+    timeout = request.args.get("timeout", config.SYNC_WAIT_TIMEOUT, type=int)
+    deadline = time.time() + max(0, min(timeout, config.SYNC_WAIT_TIMEOUT))
+
+    # Checking the version while holding the condition means a change
+    # committed before mark_manifest_dirty() can't slip between check and wait
+    with _manifest_changed:
+        current = db.get_photo_version()
+        while current == version:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            _manifest_changed.wait(remaining)
+            current = db.get_photo_version()
+
+    return jsonify({"changed": current != version, "version": current})
 
 
 @app.route("/sync/photo/<path:photo_path>")
+@_bulk_lane
 def sync_photo(photo_path):
     """Serve a single photo file for child download."""
-    if db.get_setting("sync_role") != "master":
+    if not _serves_sync():
         return jsonify({"error": "Not a master"}), 404
 
     token = request.args.get("token", "")
     if not _validate_sync_token(token):
         return jsonify({"error": "Invalid token"}), 403
 
-    # Path traversal protection
-    safe_path = os.path.normpath(os.path.join(config.PHOTOS_DIR, photo_path))
-    if not safe_path.startswith(os.path.normpath(config.PHOTOS_DIR)):
+    safe_path = _resolve_sync_path(photo_path)
+    if safe_path is None:
         return jsonify({"error": "Invalid path"}), 403
 
-    # Don't serve from thumbs/ or sync/
-    rel = os.path.relpath(safe_path, config.PHOTOS_DIR)
-    if rel.startswith("thumbs") or rel.startswith(config.SYNC_DIR_NAME):
+    if not os.path.isfile(safe_path):
+        _fleet_note(token, last_error=f"Not found: {photo_path}", last_error_at=_now_iso())
+        return jsonify({"error": "Not found"}), 404
+
+    _fleet_note(token, photos=1)
+    # Use the photo's MD5 as a strong ETag: it's stable across restarts and
+    # is what children put in If-Range when resuming (Range/206 handling
+    # comes from send_from_directory's conditional responses)
+    path, md5 = _served_file(safe_path, _requested_dim())
+    return send_from_directory(os.path.dirname(path), os.path.basename(path),
+                               conditional=True, etag=md5 or True)
+
+
+@app.route("/sync/thumb/<path:photo_path>")
+def sync_thumb(photo_path):
+    """Serve a photo's thumbnail, so children needn't decode the original."""
+    if not _serves_sync():
+        return jsonify({"error": "Not a master"}), 404
+
+    token = request.args.get("token", "")
+    if not _validate_sync_token(token):
+        return jsonify({"error": "Invalid token"}), 403
+
+    safe_path = _resolve_sync_path(photo_path)
+    if safe_path is None:
         return jsonify({"error": "Invalid path"}), 403
 
-    if not os.path.isfile(safe_path):
+    thumb_dir = os.path.join(config.PHOTOS_DIR, "thumbs")
+    filename = os.path.basename(safe_path)
+    if not os.path.isfile(os.path.join(thumb_dir, filename)):
         return jsonify({"error": "Not found"}), 404
+    return send_from_directory(thumb_dir, filename, conditional=True,
+                               etag=_thumb_md5(filename) or True)
+
+
+@app.route("/sync/bundle", methods=["POST"])
+@_bulk_lane
+def sync_bundle():
+    """Stream several photos as one uncompressed tar for bulk child sync.
+
+    Body: {"token": ..., "paths": [manifest paths]}. The archive is written
+    straight from disk as it's sent (headers, file chunks, padding), so the
+    master never buffers a photo. Paths that are off-limits or missing are
+    left out; the child retries them individually.
+    """
+    if not _serves_sync():
+        return jsonify({"error": "Not a master"}), 404
+
+    data = request.get_json(silent=True) or {}
+    if not _validate_sync_token(data.get("token", "")):
+        return jsonify({"error": "Invalid token"}), 403
+
+    paths = data.get("paths")
+    if not isinstance(paths, list) or not paths:
+        return jsonify({"error": "paths required"}), 400
+    if len(paths) > config.MAX_SYNC_BUNDLE_PATHS:
+        return jsonify({"error": f"At most {config.MAX_SYNC_BUNDLE_PATHS} paths per bundle"}), 400
+
+    max_dim = _requested_dim()
+    files = []
+    for photo_path in map(str, paths):
+        safe_path = _resolve_sync_path(photo_path)
+        if safe_path and os.path.isfile(safe_path):
+            files.append((photo_path, _served_file(safe_path, max_dim)[0]))
+
+    _fleet_note(data["token"], photos=len(files))
+    return Response(_stream_tar(files), mimetype="application/x-tar")
+
+
+def _resolve_sync_path(photo_path):
+    """Map a manifest path to a file under PHOTOS_DIR, or None if off-limits.
+
+    On a relay, manifest paths are relative to photos/sync/.
+    """
+    root = _published_root(_is_relay())
+    # Path traversal protection
+    safe_path = os.path.normpath(os.path.join(root, photo_path))
+    if not safe_path.startswith(os.path.normpath(root)):
+        return None
+
+    # Don't serve from thumbs/, sync/ or the object/variant stores
+    rel = os.path.relpath(safe_path, root)
+    if rel.startswith(("thumbs", config.SYNC_DIR_NAME, config.OBJECTS_DIR_NAME,
+                       config.VARIANTS_DIR_NAME)):
+        return None
+    return safe_path
 
-    directory = os.path.dirname(safe_path)
+
+def _served_file(safe_path, max_dim):
+    """Return (path, md5) of the file to send for a resolved photo path.
+
+    With a display profile this is the photo's max_dim variant. md5 is
+    None when the DB has no record of exactly this file.
+    """
     filename = os.path.basename(safe_path)
-    return send_from_directory(directory, filename)
+    photo = db.get_photo(filename)
+    if not photo or not photo["md5"] or os.path.normpath(
+            os.path.join(config.PHOTOS_DIR, photo["subdir"], filename)) != safe_path:
+        return safe_path, None
+    if max_dim:
+        path, md5, _ = photo_variant(safe_path, photo["md5"], max_dim)
+        return path, md5
+    return safe_path, photo["md5"]
+
+
+def _stream_tar(files):
+    """Yield a tar archive of (arcname, full_path) pairs chunk by chunk."""
+    for arcname, full_path in files:
+        try:
+            fh = open(full_path, 'rb')
+        except OSError:
+            continue  # deleted since the request came in
+        with fh:
+            info = tarfile.TarInfo(arcname)
+            st = os.fstat(fh.fileno())
+            info.size = st.st_size
+            info.mtime = int(st.st_mtime)
+            info.mode = 0o644
+            yield info.tobuf(format=tarfile.GNU_FORMAT)
+            remaining = info.size
+            while remaining > 0:
+                chunk = fh.read(min(config.SYNC_CHUNK_SIZE, remaining))
+                if not chunk:
+                    # Truncated underneath us; pad so the archive stays valid
+                    # (the child's MD5 check rejects this member)
+                    chunk = b"\0" * min(config.SYNC_CHUNK_SIZE, remaining)
+                remaining -= len(chunk)
+                yield chunk
+            yield b"\0" * (-info.size % tarfile.BLOCKSIZE)
+    # End-of-archive marker: two empty blocks
+    yield b"\0" * (2 * tarfile.BLOCKSIZE)
 
 
 # ============== MASTER ADMIN ENDPOINTS ==============
@@ -124,7 +839,7 @@ def sync_photo(photo_path):
 @require_admin
 def get_sync_children():
     """Return list of registered child frames."""
-    return jsonify(db.get_setting("sync_children", []))
+    return jsonify(db.get_sync_children())
 
 
 @app.route("/admin/sync_add_child", methods=["POST"])
@@ -137,13 +852,9 @@ def add_sync_child():
         return jsonify({"success": False, "error": "Label required"})
 
     token = secrets_mod.token_urlsafe(16)
-    child = {"label": label, "token": token}
+    db.add_sync_child(label, token)
 
-    children = db.get_setting("sync_children", [])
-    children.append(child)
-    db.set_setting("sync_children", children)
-
-    return jsonify({"success": True, "child": child})
+    return jsonify({"success": True, "child": {"label": label, "token": token}})
 
 
 @app.route("/admin/sync_remove_child", methods=["POST"])
@@ -151,15 +862,50 @@ def add_sync_child():
 def remove_sync_child():
     """Remove a child token."""
     data = request.get_json()
-    token = data.get("token", "")
+    db.remove_sync_child(data.get("token", ""))
+
+    return jsonify({"success": True})
 
-    children = db.get_setting("sync_children", [])
-    children = [c for c in children if c["token"] != token]
-    db.set_setting("sync_children", children)
 
+@app.route("/sync/report", methods=["POST"])
+def sync_report():
+    """Children report the journal version they applied after each cycle.
+
+    Body: {"token", "version", "result": "success"|"error", "error"}.
+    """
+    if not _serves_sync():
+        return jsonify({"error": "Not a master"}), 404
+
+    data = request.get_json(silent=True) or {}
+    token = data.get("token", "")
+    if not _validate_sync_token(token):
+        return jsonify({"error": "Invalid token"}), 403
+
+    fields = {}
+    if isinstance(data.get("version"), int):
+        fields["applied_version"] = data["version"]
+    if data.get("result") == "success":
+        fields["last_success_at"] = _now_iso()
+    elif data.get("error"):
+        fields["last_error"] = str(data["error"])[:200]
+        fields["last_error_at"] = _now_iso()
+    _flush_fleet(token, **fields)
     return jsonify({"success": True})
 
 
+@app.route("/admin/sync_fleet")
+@require_admin
+def sync_fleet():
+    """How far behind each child frame is, for the master's dashboard."""
+    _flush_fleet()
+    version = db.get_photo_version()
+    now = datetime.now()
+    return jsonify({
+        "version": version,
+        "children": [_fleet_entry(child, version, now) for child in db.get_sync_fleet()],
+    })
+
+
 @app.route("/sync/delete_photo", methods=["POST"])
 def sync_delete_photo():
     """Delete a photo on master. Requires valid token + ownership."""
@@ -178,9 +924,7 @@ def sync_delete_photo():
     if token == db.get_setting("upload_token"):
         uploader = "admin"
     else:
-        for child in db.get_setting("sync_children", []):
-            if child["token"] == token:
-                uploader = child["label"]
+        uploader = db.get_sync_child_label(token)
 
     if not uploader:
         return jsonify({"success": False, "error": "Invalid token"}), 403
@@ -213,9 +957,9 @@ def trigger_sync_now():
     Instead of spawning a separate thread (which races with the loop),
     restart the loop — it runs a cycle immediately on start.
     """
-    if db.get_setting("sync_role") != "child":
+    if db.get_setting("sync_role") not in ("child", "relay"):
         return jsonify({"success": False, "error": "Not a child"})
-    if db.get_setting("sync_in_progress", False):
+    if progress.is_running("sync"):
         return jsonify({"success": False, "error": "Sync already in progress"})
 
     start_sync_loop()  # stops existing loop, starts fresh (runs cycle after 10s)
@@ -226,30 +970,92 @@ def trigger_sync_now():
 @require_admin
 def sync_status():
     """Return current sync state."""
+    sync = progress.get("sync")
     return jsonify({
         "sync_role": db.get_setting("sync_role"),
         "master_url": db.get_setting("master_url"),
+        "sync_via_lan": _lan_master["url"],
         "last_sync": db.get_setting("last_sync"),
         "last_sync_result": db.get_setting("last_sync_result"),
         "synced_photo_count": _count_synced_photos(),
-        "sync_in_progress": db.get_setting("sync_in_progress", False),
+        "sync_in_progress": sync["running"],
         "sync_error": db.get_setting("sync_error"),
         "sync_interval": db.get_setting("sync_interval", config.DEFAULT_SYNC_INTERVAL),
-        "sync_total": db.get_setting("sync_total", 0),
-        "sync_completed": db.get_setting("sync_completed", 0),
-        "sync_phase": db.get_setting("sync_phase", ""),
+        "sync_concurrency": db.get_setting("sync_concurrency", config.DEFAULT_SYNC_CONCURRENCY),
+        "sync_max_dim": db.get_setting("sync_max_dim", config.DEFAULT_SYNC_MAX_DIM),
+        "sync_max_transfers": db.get_setting("sync_max_transfers", config.SYNC_MAX_TRANSFERS),
+        "sync_child_max_transfers": db.get_setting("sync_child_max_transfers",
+                                                   config.SYNC_CHILD_MAX_TRANSFERS),
+        "sync_rate_limit_kbps": db.get_setting("sync_rate_limit_kbps",
+                                               config.DEFAULT_SYNC_RATE_LIMIT_KBPS),
+        "sync_total": sync["total"],
+        "sync_completed": sync["completed"],
+        "sync_phase": sync["phase"],
         "sync_history": db.get_sync_history(5),
     })
 
 
+@app.route("/admin/sync_metrics")
+@require_admin
+def sync_metrics():
+    """Per-cycle sync telemetry (oldest first) and trends across it."""
+    cycles = list(reversed(db.get_sync_history(db.SYNC_LOG_RETAIN)))
+    return jsonify({"cycles": cycles, "trends": _sync_trends(cycles)})
+
+
+def _sync_trends(cycles):
+    """Summarize sync_log entries: where time goes and how throughput moves.
+
+    throughput_change_pct compares the newer half of the cycles that
+    downloaded photos against the older half.
+    """
+    def avg(values):
+        values = [v for v in values if v is not None]
+        return round(sum(values) / len(values), 1) if values else None
+
+    ok = [c for c in cycles if c["result"] == "success"]
+    transfers = [c for c in ok if c["throughput_bps"]]
+
+    phase_avg = {}
+    for name in {name for c in ok for name in c["phase_timings"]}:
+        phase_avg[name] = round(sum(c["phase_timings"].get(name, 0) for c in ok) / len(ok), 3)
+
+    change = None
+    half = len(transfers) // 2
+    if half:
+        older = avg(c["throughput_bps"] for c in transfers[:half])
+        newer = avg(c["throughput_bps"] for c in transfers[-half:])
+        change = round((newer - older) / older * 100, 1) if older else None
+
+    return {
+        "cycles": len(cycles),
+        "errors": len(cycles) - len(ok),
+        "avg_duration_s": avg(c["duration_s"] for c in ok),
+        "avg_phase_s": phase_avg,
+        "slowest_phase": max(phase_avg, key=phase_avg.get) if phase_avg else None,
+        "avg_throughput_bps": avg(c["throughput_bps"] for c in transfers),
+        "throughput_change_pct": change,
+        "avg_latency_p50_ms": avg(c["latency_p50_ms"] for c in transfers),
+        "avg_latency_p95_ms": avg(c["latency_p95_ms"] for c in transfers),
+        "total_bytes": sum(c["bytes_downloaded"] or 0 for c in cycles),
+        "total_retries": sum(c["retries"] or 0 for c in cycles),
+    }
+
+
 @app.route("/admin/sync_config", methods=["POST"])
 @require_admin
 def save_sync_config():
-    """Save sync configuration (role, master URL, token, interval)."""
+    """Save sync configuration (role, master URL, token, interval, concurrency,
+    display resolution; on a master, bulk transfer caps and rate limit).
+
+    A relay takes both: it pulls from its master like a child and serves
+    what it pulled to its own children like a master. It always syncs
+    originals (display resolution 0).
+    """
     data = request.get_json()
     role = data.get("sync_role", "")
 
-    if role not in ("master", "child", ""):
+    if role not in ("master", "child", "relay", ""):
         return jsonify({"success": False, "error": "Invalid role"})
 
     old_role = db.get_setting("sync_role")
@@ -259,42 +1065,133 @@ def save_sync_config():
     else:
         db.delete_setting("sync_role")
 
-    if role == "child":
+    if role in ("child", "relay"):
         master_url = data.get("master_url", "").rstrip("/")
         sync_token = data.get("sync_token", "").strip()
         # Allow partial updates (e.g. just interval) if already configured
-        if master_url:
+        if master_url and master_url != db.get_setting("master_url"):
             db.set_setting("master_url", master_url)
-        if sync_token:
+            _forget_manifest_position()
+            _forget_lan_master(forget_id=True)
+        if sync_token and sync_token != db.get_setting("sync_token"):
             db.set_setting("sync_token", sync_token)
+            _forget_manifest_position()
         # Require both for initial setup
         if not db.get_setting("master_url") or not db.get_setting("sync_token"):
             return jsonify({"success": False, "error": "Master URL and sync token required"})
         if "sync_interval" in data:
             db.set_setting("sync_interval", max(300, min(7200, int(data["sync_interval"]))))
-    elif role == "master":
-        # Initialize children list if not present
-        if db.get_setting("sync_children") is None:
-            db.set_setting("sync_children", [])
+        if "sync_concurrency" in data:
+            db.set_setting("sync_concurrency",
+                           max(1, min(config.MAX_SYNC_CONCURRENCY, int(data["sync_concurrency"]))))
+        max_dim = None
+        if role == "relay":
+            # A relay renders each of its frames' profiles, so it needs originals
+            max_dim = 0
+        elif "sync_max_dim" in data:
+            max_dim = int(data["sync_max_dim"])
+            if max_dim not in (0,) + config.SYNC_VARIANT_DIMS:
+                return jsonify({"success": False, "error": "Invalid display resolution"})
+        if max_dim is not None and max_dim != db.get_setting("sync_max_dim",
+                                                             config.DEFAULT_SYNC_MAX_DIM):
+            db.set_setting("sync_max_dim", max_dim)
+            # Every photo's MD5 changes with the profile: re-diff in full
+            _forget_manifest_position()
+    if role in ("master", "relay"):
+        # Bulk-lane limits (see qos.py)
+        if "sync_max_transfers" in data:
+            db.set_setting("sync_max_transfers",
+                           max(1, min(config.MAX_SYNC_TRANSFERS, int(data["sync_max_transfers"]))))
+        if "sync_child_max_transfers" in data:
+            db.set_setting("sync_child_max_transfers",
+                           max(1, min(config.MAX_SYNC_TRANSFERS, int(data["sync_child_max_transfers"]))))
+        if "sync_rate_limit_kbps" in data:
+            db.set_setting("sync_rate_limit_kbps", max(0, int(data["sync_rate_limit_kbps"])))
+    if role == "master":
         # Clean up child-only keys
         db.delete_setting("master_url")
         db.delete_setting("sync_token")
+        _forget_manifest_position()
+        _forget_lan_master(forget_id=True)
 
     # Start/stop/restart sync loop
-    if role == "child":
+    if role in ("child", "relay"):
         # Restart loop to pick up any changes (interval, master URL, token)
         start_sync_loop()
-    elif old_role == "child" and role != "child":
+    elif old_role in ("child", "relay"):
         stop_sync_loop()
+    if role != old_role:
+        # Masters and relays publish different photos
+        mark_manifest_dirty()
 
     return jsonify({"success": True})
 
 
 # ============== SYNC LOGIC ==============
 
+# Each loop thread gets its own stop event, so a thread still blocked in a
+# long-poll when the loop is restarted exits instead of running on
 _sync_stop_event = threading.Event()
 _sync_thread = None
 
+# Background checkpoint publishing (see _publish_checkpoint)
+_checkpoint_publish = {"running": False, "again": False}
+_checkpoint_lock = threading.Lock()
+_checkpoint_idle = threading.Event()  # clear while a checkpoint publish runs
+_checkpoint_idle.set()
+
+
+def _forget_manifest_position():
+    """Make the next cycle fetch and diff the full manifest."""
+    db.delete_setting("sync_manifest_version")
+    db.delete_setting("sync_manifest_etag")
+
+
+# LAN address of our master, found by beacon.discover and confirmed with
+# /sync/hello; re-probed every SYNC_LAN_RECHECK seconds
+_lan_master = {"url": None, "checked": 0.0}
+
+
+def _forget_lan_master(forget_id=False):
+    """Re-probe before the next cycle (and, for a new master, relearn its id)."""
+    _lan_master.update(url=None, checked=0.0)
+    if forget_id:
+        db.delete_setting("master_sync_id")
+
+
+def _master_endpoint(session, master_url, sync_token):
+    """Where to sync from: the master's LAN address if it answers there
+    and proves it holds our token (see sync_hello), else master_url.
+
+    Anything on the LAN can answer a probe, so the token is only sent
+    once the proof checks out; any other reply means no LAN master.
+    The master's sync_id is learned from its manifests, so the first
+    cycle always goes through master_url.
+    """
+    sync_id = db.get_setting("master_sync_id")
+    if not sync_id:
+        return master_url
+    if time.time() - _lan_master["checked"] < config.SYNC_LAN_RECHECK:
+        return _lan_master["url"] or master_url
+    _lan_master.update(url=None, checked=time.time())
+    for host, port in beacon.discover(sync_id):
+        url = f"http://{host}:{port}"
+        nonce = secrets_mod.token_hex(16)
+        params = {"child": _hello_child_id(sync_token), "nonce": nonce}
+        try:
+            with session.get(f"{url}/sync/hello", params=params, timeout=5) as resp:
+                answer = resp.json() if resp.status_code == 200 else None
+        except (requests.RequestException, ValueError):
+            continue
+        if (not isinstance(answer, dict) or answer.get("sync_id") != sync_id
+                or not hmac.compare_digest(str(answer.get("proof", "")),
+                                           _hello_proof(sync_token, nonce, f"{host}:{port}"))):
+            continue
+        print(f"[SYNC] Master found on the local network at {url}")
+        _lan_master["url"] = url
+        break
+    return _lan_master["url"] or master_url
+
 
 def _count_synced_photos():
     """Count photos in the sync directory."""
@@ -302,6 +1199,16 @@ def _count_synced_photos():
     return sum(1 for _ in walk_photos(sync_dir))
 
 
+def _sync_rel_path(row):
+    """Path of a synced photo relative to photos/sync/ (None if not synced)."""
+    subdir = row["subdir"]
+    if subdir == config.SYNC_DIR_NAME:
+        return row["filename"]
+    if _is_synced_subdir(subdir):
+        return f"{subdir[len(config.SYNC_DIR_NAME) + 1:]}/{row['filename']}"
+    return None
+
+
 def _build_local_manifest():
     """Build manifest of photos/sync/ directory for comparison.
 
@@ -310,16 +1217,9 @@ def _build_local_manifest():
     """
     local = {}
     for row in db.get_all_photos():
-        subdir = row["subdir"]
-        if subdir != config.SYNC_DIR_NAME and not (subdir and subdir.startswith(config.SYNC_DIR_NAME + "/")):
-            continue
-        # Reconstruct the path relative to sync_dir
-        if subdir == config.SYNC_DIR_NAME:
-            rel_path = row["filename"]
-        else:
-            sub = subdir[len(config.SYNC_DIR_NAME) + 1:]
-            rel_path = f"{sub}/{row['filename']}"
-        local[rel_path] = row["md5"] or ""
+        rel_path = _sync_rel_path(row)
+        if rel_path is not None:
+            local[rel_path] = row["md5"] or ""
 
     # If any entries have empty MD5, backfill from disk
     if any(not md5 for md5 in local.values()):
@@ -333,8 +1233,621 @@ def _build_local_manifest():
     return local
 
 
+def _plan_delta(changes):
+    """Diff a delta manifest's changes against local records.
+
+    Only the changed photos are looked up, so a quiet cycle costs nothing
+    beyond the (tiny) delta response. Returns (master_photos, to_download,
+    to_delete, upload_meta) shaped like the full-manifest diff.
+    """
+    master_photos = {}
+    to_download = []
+    to_delete = []
+    upload_meta = {}
+    for change in changes:
+        path = change["path"]
+        filename = os.path.basename(path)
+        local = db.get_photo(filename)
+        local_path = _sync_rel_path(local) if local else None
+
+        if change["op"] == "delete":
+            if local_path is not None:
+                to_delete.append(local_path)
+            continue
+
+        master_photos[path] = change["md5"]
+        upload_meta[filename] = change["uploaded_by"]
+        if local_path != path or local["md5"] != change["md5"]:
+            to_download.append(path)
+    return master_photos, to_download, to_delete, upload_meta
+
+
+def _ndjson_records(resp, metrics=None):
+    """Decode a streamed manifest one line at a time as it downloads."""
+    for line in resp.iter_lines(chunk_size=config.SYNC_CHUNK_SIZE):
+        if line:
+            if metrics:
+                metrics.add_bytes(len(line) + 1)
+            yield json.loads(line)
+
+
+def _path_key(path):
+    """Sort key matching the master's (subdir, filename) manifest order."""
+    return os.path.dirname(path), os.path.basename(path)
+
+
+def _plan_streamed(records):
+    """Merge-diff a streamed manifest against the local index.
+
+    Master records and local rows both come in (subdir, filename) order,
+    so one pass over each finds new, changed and removed photos without
+    building either side as a dict. Returns (entries, to_download,
+    to_delete, upload_meta), entries being the master records of
+    to_download. A stream that is out of order or lacks its trailer
+    raises ValueError before anything is deleted.
+    """
+    sync_dir = os.path.join(config.PHOTOS_DIR, config.SYNC_DIR_NAME)
+    local = db.iter_synced_photos(config.SYNC_DIR_NAME)
+    row = next(local, None)
+    entries = []
+    to_download = []
+    to_delete = []
+    upload_meta = {}
+    last_key = None
+    count = 0
+    for record in records:
+        if record.get("end"):
+            if record.get("photo_count") != count:
+                raise ValueError(f"Manifest stream has {count} of {record.get('photo_count')} photos")
+            break
+        path = record["path"]
+        key = _path_key(path)
+        if last_key is not None and key <= last_key:
+            raise ValueError(f"Manifest stream out of order at {path}")
+        last_key = key
+        count += 1
+
+        # Local photos sorting before this one are gone from the master
+        while row is not None and _path_key(_sync_rel_path(row)) < key:
+            to_delete.append(_sync_rel_path(row))
+            row = next(local, None)
+
+        filename = os.path.basename(path)
+        uploader = record.get("uploaded_by") or ""
+        if row is not None and _path_key(_sync_rel_path(row)) == key:
+            local_md5 = row["md5"]
+            if not local_md5 and os.path.isfile(os.path.join(sync_dir, path)):
+                local_md5 = compute_md5(os.path.join(sync_dir, path))
+            if uploader and uploader != row["uploaded_by"]:
+                upload_meta[filename] = uploader
+            row = next(local, None)
+            if local_md5 == record["md5"]:
+                continue
+        entries.append(record)
+        to_download.append(path)
+        upload_meta[filename] = uploader
+    else:
+        raise ValueError("Manifest stream ended early")
+
+    while row is not None:
+        to_delete.append(_sync_rel_path(row))
+        row = next(local, None)
+    return entries, to_download, to_delete, upload_meta
+
+
+def _retry_after(resp, default):
+    """Seconds a 429/503 response asked us to wait (Retry-After), else default."""
+    value = resp.headers.get("Retry-After", "").strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0, int((when - datetime.now(timezone.utc)).total_seconds()))
+
+
+def _jittered(seconds, floor=False):
+    """Spread a delay by +/- SYNC_JITTER so children started together drift apart.
+
+    With floor, only ever lengthens it (for waits the master asked for).
+    """
+    low = 1 if floor else 1 - config.SYNC_JITTER
+    return seconds * random.uniform(low, 1 + config.SYNC_JITTER)
+
+
+def _new_http_session(pool_size):
+    """Create a keep-alive HTTP session sized for the download pool.
+
+    Every request in a cycle goes through one session, so only the first
+    connection to the master (often via ngrok) pays the TCP/TLS handshake.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _partial_path(dest, expected_md5):
+    """Where an in-progress download of dest is kept.
+
+    Naming the partial after the md5 it is working towards means a resume
+    can never splice bytes of an older version of the photo onto a newer one.
+    """
+    return f"{dest}.{expected_md5}.part" if expected_md5 else dest + ".part"
+
+
+def _save_verified(chunks, dest, expected_md5, append=False):
+    """Write chunks to dest's .part file, hashing as they arrive.
+
+    The .part file is renamed onto dest only if it matches expected_md5
+    (when given), so the photo is never held in memory, never re-read from
+    the SD card, and a bad transfer never replaces a good file. With
+    append=True the chunks continue an existing partial (a resumed
+    download), whose bytes are hashed first. If the transfer breaks off,
+    a partial with a known md5 is kept so a later cycle can resume it.
+    Returns (size_bytes, md5), or None on mismatch.
+    """
+    part_path = _partial_path(dest, expected_md5)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    h = hashlib.md5()
+    size = 0
+    if append and os.path.exists(part_path):
+        with open(part_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(config.SYNC_CHUNK_SIZE), b''):
+                h.update(chunk)
+                size += len(chunk)
+    try:
+        with open(part_path, 'ab' if append else 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                h.update(chunk)
+                size += len(chunk)
+    except BaseException:
+        if not expected_md5:
+            _remove_quietly(part_path)
+        raise
+
+    file_md5 = h.hexdigest()
+    if expected_md5 and file_md5 != expected_md5:
+        _remove_quietly(part_path)
+        return None
+    os.replace(part_path, dest)
+    return size, file_md5
+
+
+class _MasterBusy(Exception):
+    """The master kept answering busy; the photo is left for a later cycle."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Master busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+def _download_photo(session, master_url, sync_token, path, expected_md5, sync_dir,
+                    metrics=None, busy=None):
+    """Stream one photo into sync_dir. Runs in a pool worker thread.
+
+    If an earlier attempt (this cycle or a previous one, even before a
+    restart) left a partial behind, only the missing bytes are requested
+    with Range, guarded by If-Range on the md5 the master uses as the
+    photo's ETag; if the master's copy changed it sends the whole file.
+    A mismatch against the manifest's md5 (truncated or corrupted
+    transfer) is retried up to SYNC_DOWNLOAD_ATTEMPTS times and then
+    dropped. Busy answers (429/503) don't use up those attempts: each
+    sets busy (so the pool can back off) and is waited out, until
+    SYNC_BUSY_GIVE_UP seconds of waiting raise _MasterBusy.
+
+    Does no DB work (connections are thread-local) — the caller records
+    the result. Returns (dest, size_bytes, md5), or None on failure.
+    """
+    dest = os.path.join(sync_dir, path)
+    part_path = _partial_path(dest, expected_md5)
+    attempt = 1
+    waited = 0
+    while True:
+        busy_wait = None
+        headers = {}
+        offset = os.path.getsize(part_path) if expected_md5 and os.path.exists(part_path) else 0
+        if offset:
+            headers = {"Range": f"bytes={offset}-", "If-Range": f'"{expected_md5}"'}
+
+        with session.get(
+            f"{master_url}/sync/photo/{path}",
+            params={"token": sync_token},
+            headers=headers,
+            timeout=60,
+            stream=True
+        ) as photo_resp:
+            if photo_resp.status_code == 416:
+                # Partial already holds every byte; just verify it
+                saved = _save_verified(iter(()), dest, expected_md5, append=True)
+            elif photo_resp.status_code in (200, 206):
+                if offset and photo_resp.status_code == 206:
+                    print(f"[SYNC] Resuming {path} at byte {offset}")
+                saved = _save_verified(
+                    photo_resp.iter_content(chunk_size=config.SYNC_CHUNK_SIZE),
+                    dest, expected_md5, append=photo_resp.status_code == 206)
+            elif photo_resp.status_code in (429, 503):
+                busy_wait = min(_retry_after(photo_resp, config.SYNC_BUSY_RETRY_AFTER),
+                                config.SYNC_BUSY_WAIT_MAX)
+            else:
+                print(f"[SYNC] Failed to download {path}: {photo_resp.status_code}")
+                return None
+
+        if busy_wait is not None:
+            if busy:
+                busy.set()
+            waited += busy_wait
+            if waited > config.SYNC_BUSY_GIVE_UP:
+                print(f"[SYNC] Master still busy, leaving {path} for a later cycle")
+                raise _MasterBusy(busy_wait)
+            print(f"[SYNC] Master busy, retrying {path} in {busy_wait}s")
+            time.sleep(_jittered(busy_wait, floor=True))
+        elif saved is not None:
+            return (dest,) + saved
+        else:
+            print(f"[SYNC] MD5 mismatch for {path} (attempt {attempt}/{config.SYNC_DOWNLOAD_ATTEMPTS})")
+            if attempt == config.SYNC_DOWNLOAD_ATTEMPTS:
+                break
+            attempt += 1
+        if metrics:
+            metrics.add_retry()
+
+    print(f"[SYNC] Giving up on {path} after {config.SYNC_DOWNLOAD_ATTEMPTS} attempts")
+    return None
+
+
+class _ChunkReader:
+    """File-like read() over an iterator of byte chunks (for tarfile's r| mode)."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buf = b""
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buf) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buf += chunk
+        if size < 0:
+            size = len(self._buf)
+        data, self._buf = self._buf[:size], self._buf[size:]
+        return data
+
+
+def _download_bundle(session, master_url, sync_token, paths, expected_md5s, sync_dir,
+                     busy=None):
+    """Fetch several photos in one /sync/bundle request. Runs in a pool worker.
+
+    The tar stream is unpacked on the fly: each member goes through the
+    same .part + MD5 verification as a single download. Returns
+    (results, leftovers) where results are (path, dest, size, md5) tuples
+    and leftovers are paths that weren't delivered intact (retried one by
+    one by the caller), or None if the master has no bundle endpoint.
+    A busy answer sets busy, like _download_photo.
+    """
+    wanted = set(paths)
+    results = []
+    try:
+        with session.post(
+            f"{master_url}/sync/bundle",
+            json={"token": sync_token, "paths": paths},
+            timeout=60,
+            stream=True
+        ) as resp:
+            if resp.status_code in (404, 405):
+                return None
+            if resp.status_code in (429, 503):
+                # Busy master: hold this worker off, then retry one by one
+                if busy:
+                    busy.set()
+                time.sleep(_jittered(min(_retry_after(resp, config.SYNC_BUSY_RETRY_AFTER),
+                                         config.SYNC_BUSY_WAIT_MAX), floor=True))
+                return results, paths
+            if resp.status_code != 200:
+                print(f"[SYNC] Bundle of {len(paths)} failed: {resp.status_code}")
+                return results, paths
+
+            reader = _ChunkReader(resp.iter_content(chunk_size=config.SYNC_CHUNK_SIZE))
+            with tarfile.open(fileobj=reader, mode="r|") as tar:
+                for member in tar:
+                    # Only accept what we asked for — also rules out traversal
+                    if not member.isfile() or member.name not in wanted:
+                        continue
+                    src = tar.extractfile(member)
+                    dest = os.path.join(sync_dir, member.name)
+                    saved = _save_verified(
+                        iter(lambda: src.read(config.SYNC_CHUNK_SIZE), b""),
+                        dest, expected_md5s.get(member.name))
+                    if saved is None:
+                        print(f"[SYNC] MD5 mismatch for {member.name} in bundle")
+                        continue
+                    wanted.discard(member.name)
+                    results.append((member.name, dest) + saved)
+    except (requests.RequestException, tarfile.TarError) as e:
+        print(f"[SYNC] Bundle interrupted after {len(results)} of {len(paths)}: {e}")
+    return results, [p for p in paths if p in wanted]
+
+
+def _download_thumb(session, master_url, sync_token, path, expected_md5, thumb_dir):
+    """Fetch the master's thumbnail for a photo. Runs in a pool worker.
+
+    Returns True once it's saved and matches expected_md5.
+    """
+    dest = os.path.join(thumb_dir, os.path.basename(path))
+    with session.get(
+        f"{master_url}/sync/thumb/{path}",
+        params={"token": sync_token},
+        timeout=30,
+        stream=True
+    ) as resp:
+        if resp.status_code != 200:
+            return False
+        try:
+            saved = _save_verified(resp.iter_content(chunk_size=config.SYNC_CHUNK_SIZE),
+                                   dest, expected_md5)
+        except BaseException:
+            # Too small to be worth resuming
+            _remove_quietly(_partial_path(dest, expected_md5))
+            raise
+    return saved is not None
+
+
+def _fetch_thumbnails(session, master_url, sync_token, thumb_md5s, thumb_dir, max_workers):
+    """Fetch master thumbnails for {path: thumb_md5} in parallel.
+
+    Returns the set of paths whose thumbnail couldn't be fetched.
+    """
+    failed = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(_download_thumb, session, master_url, sync_token,
+                        path, md5, thumb_dir): path
+            for path, md5 in thumb_md5s.items()
+        }
+        for future, path in futures.items():
+            try:
+                ok = future.result()
+            except requests.RequestException as e:
+                print(f"[SYNC] Thumbnail error for {path}: {e}")
+                ok = False
+            if not ok:
+                failed.add(path)
+    return failed
+
+
+def _remove_quietly(path):
+    """Remove a file, ignoring it if already gone."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _download_parallel(session, master_url, sync_token, paths, expected_md5s,
+                       sync_dir, max_workers, bundle_size=1, metrics=None, deferred=None):
+    """Download photos with a bounded pool, yielding (path, dest, size, md5)
+    as each one finishes and verifies against expected_md5s[path].
+
+    With bundle_size > 1, photos are fetched via /sync/bundle in batches
+    of up to bundle_size (smaller when there isn't enough work to keep
+    every worker busy). Photos with a partial to resume, and photos a
+    bundle didn't deliver intact, are fetched individually; a master
+    without the endpoint drops us to single photos.
+
+    The number of requests in flight starts at half of max_workers and
+    adapts to measured throughput: after each window of completions it
+    grows by one while bytes/sec keeps improving, and shrinks by one when
+    it falls off (a saturated uplink only gets slower with more streams).
+    A busy answer from the master halves it straight away. Per-photo
+    network errors are logged and skipped, as before; photos the master
+    stayed too busy to send go into deferred (path -> its Retry-After) if
+    given, along with the rest of the queue. Bytes, per-photo latency and
+    retries are reported to metrics.
+    """
+    limit = max(1, max_workers // 2)
+    queue = collections.deque()
+    singles = collections.deque()  # resumable partials and bundle leftovers
+    for path in paths:
+        expected = expected_md5s.get(path)
+        if expected and os.path.exists(_partial_path(os.path.join(sync_dir, path), expected)):
+            singles.append(path)
+        else:
+            queue.append(path)
+    use_bundles = bundle_size > 1
+    busy = threading.Event()  # set by workers on a 429/503
+    in_flight = {}
+    started = {}
+    last_rate = 0.0
+    window_bytes = 0
+    window_count = 0
+    window_start = time.time()
+
+    def submit(pool):
+        if singles:
+            batch = [singles.popleft()]
+        else:
+            n = 1
+            if use_bundles:
+                n = min(bundle_size, max(1, -(-len(queue) // max_workers)))
+            batch = [queue.popleft() for _ in range(min(n, len(queue)))]
+        if len(batch) == 1:
+            future = pool.submit(_download_photo, session, master_url, sync_token,
+                                 batch[0], expected_md5s.get(batch[0]), sync_dir, metrics,
+                                 busy)
+        else:
+            future = pool.submit(_download_bundle, session, master_url, sync_token,
+                                 batch, expected_md5s, sync_dir, busy)
+        in_flight[future] = batch
+        started[future] = time.time()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            while len(in_flight) < limit and (queue or singles):
+                submit(pool)
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = in_flight.pop(future)
+                elapsed = time.time() - started.pop(future)
+                try:
+                    result = future.result()
+                except requests.RequestException as e:
+                    print(f"[SYNC] Download error for {batch[0]}: {e}")
+                    continue
+                except _MasterBusy as e:
+                    # Still busy after all that waiting: leave this photo and
+                    # everything not yet started for the next cycle
+                    left = [batch[0]] + list(singles) + list(queue)
+                    singles.clear()
+                    queue.clear()
+                    if deferred is not None:
+                        deferred.update(dict.fromkeys(left, e.retry_after))
+                    continue
+
+                if len(batch) == 1:
+                    results = [(batch[0],) + result] if result else []
+                elif result is None:
+                    # Master predates /sync/bundle — fetch one at a time
+                    use_bundles = False
+                    queue.extendleft(reversed(batch))
+                    continue
+                else:
+                    results, leftovers = result
+                    singles.extend(leftovers)
+                    if metrics and leftovers:
+                        metrics.add_retry(len(leftovers))
+
+                for item in results:
+                    window_bytes += item[2]
+                    window_count += 1
+                    if metrics:
+                        # A bundle's photos share its request time
+                        metrics.add_download(item[2], elapsed / len(results))
+                    yield item
+
+            if busy.is_set():
+                # The master is turning requests away: back off hard, and
+                # start a fresh window so the slump isn't read as a trend
+                busy.clear()
+                limit = max(1, limit // 2)
+                last_rate = 0.0
+                window_bytes = 0
+                window_count = 0
+                window_start = time.time()
+            # Re-tune the in-flight limit once per window of completions
+            elif window_count >= limit:
+                rate = window_bytes / max(time.time() - window_start, 0.001)
+                if rate > last_rate * 1.1 and limit < max_workers:
+                    limit += 1
+                elif rate < last_rate * 0.8 and limit > 1:
+                    limit -= 1
+                last_rate = rate
+                window_bytes = 0
+                window_count = 0
+                window_start = time.time()
+
+
+class _SyncMetrics:
+    """Telemetry for one sync cycle, written to sync_log when it ends.
+
+    Phases are timed back to back on the sync thread; download workers
+    report retries from the pool, hence the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._phase = None
+        self._phase_start = None
+        self.phases = {}
+        self.bytes = 0
+        self.photo_bytes = 0
+        self.retries = 0
+        self.latencies = []
+
+    def phase(self, name):
+        """End the current phase (if any) and start timing `name`."""
+        now = time.time()
+        if self._phase:
+            self.phases[self._phase] = round(
+                self.phases.get(self._phase, 0) + now - self._phase_start, 3)
+        self._phase, self._phase_start = name, now
+
+    def add_bytes(self, n):
+        with self._lock:
+            self.bytes += n
+
+    def add_download(self, size, latency_s):
+        with self._lock:
+            self.bytes += size
+            self.photo_bytes += size
+            self.latencies.append(latency_s)
+
+    def add_retry(self, n=1):
+        with self._lock:
+            self.retries += n
+
+    def summary(self):
+        """Close the running phase and return add_sync_log's metrics dict."""
+        self.phase(None)
+        latencies = sorted(self.latencies)
+        download_s = self.phases.get("download", 0)
+        return {
+            "bytes_downloaded": self.bytes,
+            "retries": self.retries,
+            "throughput_bps": round(self.photo_bytes / download_s) if latencies and download_s else None,
+            "latency_p50_ms": _percentile_ms(latencies, 50),
+            "latency_p95_ms": _percentile_ms(latencies, 95),
+            "phase_timings": self.phases,
+        }
+
+
+def _percentile_ms(sorted_values, pct):
+    """Nearest-rank percentile of sorted seconds, in ms (None if empty)."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return round(sorted_values[index] * 1000, 1)
+
+
+def _record_sync_success(start_time, downloaded, deleted, metrics=None):
+    """Persist the outcome of a successful sync cycle."""
+    db.set_setting("last_sync", datetime.now().isoformat(timespec="seconds"))
+    db.set_setting("last_sync_result", "success")
+    db.delete_setting("sync_error")
+    db.add_sync_log("success",
+                    photos_added=downloaded,
+                    photos_removed=deleted,
+                    duration_s=round(time.time() - start_time, 1),
+                    metrics=metrics.summary() if metrics else None)
+
+
+def _record_sync_error(start_time, error, metrics=None, downloaded=0, deleted=0):
+    """Persist the outcome of a failed (or partly applied) sync cycle."""
+    db.set_setting("sync_error", error)
+    db.set_setting("last_sync_result", "error")
+    db.add_sync_log("error",
+                    photos_added=downloaded,
+                    photos_removed=deleted,
+                    duration_s=round(time.time() - start_time, 1),
+                    error=error,
+                    metrics=metrics.summary() if metrics else None)
+
+
 def run_sync_cycle():
-    """Execute one sync cycle: fetch manifest, download new, delete removed."""
+    """Execute one sync cycle: fetch manifest, download new, delete removed.
+
+    Returns the master's Retry-After in seconds when it answered busy
+    (429/503) and said when to come back, or stayed busy long enough that
+    photos were left for the next cycle; else None.
+    """
     master_url = db.get_setting("master_url")
     sync_token = db.get_setting("sync_token")
 
@@ -342,81 +1855,121 @@ def run_sync_cycle():
         print("[SYNC] No master URL or sync token configured")
         return
 
-    db.set_setting("sync_in_progress", True)
+    concurrency = db.get_setting("sync_concurrency", config.DEFAULT_SYNC_CONCURRENCY)
+    http = _new_http_session(concurrency)
+    max_dim = db.get_setting("sync_max_dim", config.DEFAULT_SYNC_MAX_DIM)
+    if max_dim:
+        # Display profile rides on every request of the cycle (manifest,
+        # photos, bundles): the master sends photos pre-scaled to fit
+        http.params["max_dim"] = max_dim
+
+    progress.start("sync")
     _sync_start_time = time.time()
-    print(f"[SYNC] Starting sync from {master_url}")
+    metrics = _SyncMetrics()
 
     try:
-        # 1. Fetch master manifest
-        resp = requests.get(
+        master_url = _master_endpoint(http, master_url, sync_token)
+        print(f"[SYNC] Starting sync from {master_url}")
+
+        # 1. Fetch master manifest (only changes, if we know our journal version)
+        # A full manifest comes back as NDJSON (older masters ignore format)
+        params = {"token": sync_token, "format": "ndjson"}
+        since = db.get_setting("sync_manifest_version")
+        if since is not None:
+            params["since"] = since
+        headers = {}
+        etag = db.get_setting("sync_manifest_etag")
+        if etag:
+            headers["If-None-Match"] = etag
+        metrics.phase("manifest")
+        resp = http.get(
             f"{master_url}/sync/manifest",
-            params={"token": sync_token},
-            timeout=30
+            params=params,
+            headers=headers,
+            timeout=30,
+            stream=True
         )
+        # Wire size: with gzip this is the compressed body (streams count lines)
+        metrics.add_bytes(int(resp.headers.get("Content-Length") or 0))
 
-        if resp.status_code == 403:
-            db.set_setting("sync_error", "Invalid sync token")
-            db.set_setting("last_sync_result", "error")
-            db.add_sync_log("error",
-                            duration_s=round(time.time() - _sync_start_time, 1),
-                            error="Invalid sync token")
+        if resp.status_code == 304:
+            # Nothing changed on the master since our last complete cycle
+            _record_sync_success(_sync_start_time, 0, 0, metrics)
+            print("[SYNC] Manifest unchanged (304), nothing to do", flush=True)
+            return
+        elif resp.status_code == 403:
+            _record_sync_error(_sync_start_time, "Invalid sync token", metrics)
             print("[SYNC] Invalid sync token (403)")
             return
+        elif resp.status_code in (429, 503):
+            retry_after = _retry_after(resp, None)
+            _record_sync_error(_sync_start_time, f"Master busy ({resp.status_code})", metrics)
+            print(f"[SYNC] Master busy ({resp.status_code}), Retry-After: {retry_after}")
+            return retry_after
         elif resp.status_code != 200:
-            db.set_setting("sync_error", f"Master returned {resp.status_code}")
-            db.set_setting("last_sync_result", "error")
-            db.add_sync_log("error",
-                            duration_s=round(time.time() - _sync_start_time, 1),
-                            error=f"Master returned {resp.status_code}")
+            _record_sync_error(_sync_start_time, f"Master returned {resp.status_code}", metrics)
             print(f"[SYNC] Master returned {resp.status_code}")
             return
 
-        manifest = resp.json()
-        master_photos = {p["path"]: p["md5"] for p in manifest.get("photos", [])}
-
-        # Save upload metadata from master (who uploaded each photo)
-        upload_meta = manifest.get("upload_meta", {})
+        # 2. Diff against our synced photos
+        metrics.phase("diff")
+        if resp.headers.get("Content-Type", "").startswith("application/x-ndjson"):
+            # Parsed as it arrives and merge-diffed against our index, so
+            # only the differences are ever held in memory
+            records = _ndjson_records(resp, metrics)
+            manifest = next(records, None)
+            if manifest is None:
+                raise ValueError("Empty manifest stream")
+            entries, to_download, to_delete, upload_meta = _plan_streamed(records)
+            master_photos = {e["path"]: e["md5"] for e in entries}
+        else:
+            manifest = resp.json()
+            if manifest.get("delta"):
+                entries = manifest.get("changes", [])
+                master_photos, to_download, to_delete, upload_meta = _plan_delta(entries)
+            else:
+                entries = manifest.get("photos", [])
+                master_photos = {p["path"]: p["md5"] for p in entries}
+                upload_meta = manifest.get("upload_meta", {})
+
+                local_photos = _build_local_manifest()
+                to_download = [
+                    path for path, md5 in master_photos.items()
+                    if path not in local_photos or local_photos[path] != md5
+                ]
+                to_delete = [
+                    path for path in local_photos
+                    if path not in master_photos
+                ]
+        is_delta = manifest.get("delta", False)
+        master_thumbs = {e["path"]: e["thumb_md5"] for e in entries if e.get("thumb_md5")}
+        master_created = {e["path"]: e["created_at"] for e in entries if e.get("created_at")}
+
+        # Save upload metadata from master (who uploaded each photo);
+        # only records whose uploader changed are written
         if upload_meta:
-            for fname, uploader in upload_meta.items():
-                photo = db.get_photo(fname)
-                if photo:
-                    # Update uploaded_by on existing record
-                    db.add_photo(fname, subdir=photo["subdir"],
-                                 uploaded_by=uploader,
-                                 size_bytes=photo["size_bytes"],
-                                 md5=photo["md5"])
+            db.set_upload_meta(upload_meta)
 
         # Save our own label (so we know which photos are "mine")
         your_label = manifest.get("your_label")
         if your_label:
             db.set_setting("sync_label", your_label)
+        # ...and the master's identity, for finding it on the LAN
+        sync_id = manifest.get("sync_id")
+        if sync_id and sync_id != db.get_setting("master_sync_id"):
+            db.set_setting("master_sync_id", sync_id)
 
-        # 2. Build local manifest
-        local_photos = _build_local_manifest()
-
-        # 3. Diff
-        to_download = [
-            path for path, md5 in master_photos.items()
-            if path not in local_photos or local_photos[path] != md5
-        ]
-        to_delete = [
-            path for path in local_photos
-            if path not in master_photos
-        ]
+        # Newest first: on a long catch-up the family's latest photos show
+        # up in the first checkpoint instead of hours later
+        to_download.sort(key=lambda path: master_created.get(path, ""), reverse=True)
 
         print(f"[SYNC] {len(to_download)} to download, {len(to_delete)} to delete", flush=True)
-        db.set_setting("sync_total", len(to_download))
-        db.set_setting("sync_completed", 0)
-        db.set_setting("sync_phase", "downloading")
+        progress.update("sync", total=len(to_download), completed=0, phase="downloading")
 
-        # 4. Check disk space
+        # 3. Check disk space
         free = shutil.disk_usage("/").free
         if free < 50 * 1024 * 1024 and to_download:
-            db.set_setting("sync_error", "Disk full")
-            db.set_setting("last_sync_result", "error")
-            db.add_sync_log("error",
-                            duration_s=round(time.time() - _sync_start_time, 1),
-                            error="Disk full")
+            _record_sync_error(_sync_start_time, "Disk full", metrics)
             print("[SYNC] Disk full, skipping downloads")
             return
 
@@ -425,113 +1978,244 @@ def run_sync_cycle():
         os.makedirs(sync_dir, exist_ok=True)
         os.makedirs(thumb_dir, exist_ok=True)
 
-        # 5. Download new/changed photos
-        downloaded = 0
+        # 4. Photos we already hold under another name are linked from the
+        # object store; the rest download in parallel over one session
+        metrics.phase("download")
+        linked = []
+        missing = []
         for path in to_download:
-            try:
-                photo_resp = requests.get(
-                    f"{master_url}/sync/photo/{path}",
-                    params={"token": sync_token},
-                    timeout=60
-                )
-                if photo_resp.status_code != 200:
-                    print(f"[SYNC] Failed to download {path}: {photo_resp.status_code}")
-                    continue
+            dest = os.path.join(sync_dir, path)
+            if link_object(master_photos[path], dest):
+                linked.append((path, dest, os.path.getsize(dest), master_photos[path]))
+            else:
+                missing.append(path)
+        if linked:
+            print(f"[SYNC] {len(linked)} linked from local object store", flush=True)
 
-                # Save photo
-                dest = os.path.join(sync_dir, path)
-                os.makedirs(os.path.dirname(dest), exist_ok=True)
-                with open(dest, 'wb') as f:
-                    f.write(photo_resp.content)
-
-                # Compute md5 of downloaded file
-                file_md5 = compute_md5(dest)
-                file_size = os.path.getsize(dest)
-
-                # Track in DB
-                uploader = upload_meta.get(os.path.basename(path), "")
-                db.add_photo(os.path.basename(path), subdir="sync",
-                             uploaded_by=uploader,
-                             size_bytes=file_size, md5=file_md5)
-
-                # Generate thumbnail
-                generate_thumbnail(dest, os.path.join(thumb_dir, os.path.basename(path)))
+        downloaded = 0
+        deferred = {}  # path -> Retry-After, for photos the master was too busy to send
+        pending = []  # synced since the last checkpoint
+        records = []  # ...and their DB rows, written in one commit per checkpoint
+        last_publish = time.time()
+        bundle_size = db.get_setting("sync_bundle_size", config.DEFAULT_SYNC_BUNDLE_SIZE)
+        try:
+            for path, dest, file_size, file_md5 in itertools.chain(linked, _download_parallel(
+                    http, master_url, sync_token, missing, master_photos,
+                    sync_dir, concurrency, bundle_size, metrics, deferred)):
+                # Track in DB under its real subdir (e.g. sync/upload) so the
+                # next cycle's local manifest paths line up with the master's
+                records.append({
+                    "filename": os.path.basename(path),
+                    "subdir": os.path.dirname(f"{config.SYNC_DIR_NAME}/{path}"),
+                    "uploaded_by": upload_meta.get(os.path.basename(path), ""),
+                    "size_bytes": file_size,
+                    "md5": file_md5,
+                    "created_at": master_created.get(path),
+                })
+                store_object(dest, file_md5)
+                pending.append((path, dest))
 
                 downloaded += 1
-                db.set_setting("sync_completed", downloaded)
-            except requests.RequestException as e:
-                print(f"[SYNC] Download error for {path}: {e}")
-                continue
+                progress.update("sync", completed=downloaded)
 
-        # 6. Delete removed photos
-        db.set_setting("sync_phase", "cleaning")
+                # Checkpoint: hand what we have to the slideshow/USB pipeline
+                # rather than holding it until the whole batch is done
+                if (len(pending) < config.SYNC_CHECKPOINT_PHOTOS
+                        and time.time() - last_publish < config.SYNC_CHECKPOINT_SECONDS):
+                    continue
+                db.add_photos(records)
+                records = []
+                metrics.phase("thumbnails")
+                _sync_thumbnails(http, master_url, sync_token, pending, master_thumbs,
+                                 thumb_dir, concurrency)
+                print(f"[SYNC] Checkpoint: publishing {len(pending)} photos "
+                      f"({downloaded}/{len(to_download)})", flush=True)
+                _publish_checkpoint()
+                metrics.phase("download")
+                pending = []
+                last_publish = time.time()
+        finally:
+            # Photos already on disk keep their records even if the cycle fails
+            db.add_photos(records)
+
+        metrics.phase("thumbnails")
+        _sync_thumbnails(http, master_url, sync_token, pending, master_thumbs,
+                         thumb_dir, concurrency)
+
+        # 5. Delete removed photos
+        metrics.phase("cleanup")
+        progress.update("sync", phase="cleaning")
         deleted = 0
         for path in to_delete:
             full_path = os.path.join(sync_dir, path)
             if os.path.exists(full_path):
                 os.remove(full_path)
-            # Remove thumbnail and DB record via shared function
             thumb_path = os.path.join(config.PHOTOS_DIR, "thumbs", os.path.basename(path))
             if os.path.exists(thumb_path):
                 os.remove(thumb_path)
-            db.remove_photo(os.path.basename(path))
             deleted += 1
+        # Then their DB records, in one commit
+        for row in db.remove_photos([os.path.basename(path) for path in to_delete]):
+            release_object(row["md5"])
+
+        # Drop partial downloads the master no longer wants (after a full
+        # manifest, master_photos covers every photo still to fetch, so
+        # anything else is stale)
+        if not is_delta:
+            wanted_parts = {_partial_path(os.path.join(sync_dir, p), md5)
+                            for p, md5 in master_photos.items()}
+            for root, dirs, files in os.walk(sync_dir):
+                for f in files:
+                    part = os.path.join(root, f)
+                    if f.endswith(".part") and part not in wanted_parts:
+                        os.remove(part)
 
         # Clean up empty subdirectories in sync/
         for root, dirs, files in os.walk(sync_dir, topdown=False):
             if root != sync_dir and not files and not dirs:
                 os.rmdir(root)
 
-        # 7. Notify: sets done/photos_chosen, triggers USB sync if needed
-        if downloaded > 0 or deleted > 0:
-            db.set_setting("sync_phase", "updating_frame")
+        # 6. Notify whatever the last checkpoint didn't cover, once any
+        # checkpoint publish still running has finished (it holds the USB lock)
+        if pending or deleted > 0:
+            metrics.phase("notify")
+            progress.update("sync", phase="updating_frame")
+            _checkpoint_idle.wait()
             print(f"[SYNC] USB check: mode={get_display_mode()}, downloaded={downloaded}, deleted={deleted}", flush=True)
-            # Mark USB as stale before update — cleared on success
-            try:
-                with open("/tmp/instapi_usb_stale", "w") as f:
-                    f.write(str(int(time.time())))
-            except OSError:
-                pass
-            notify_photos_changed()
-            print("[SYNC] Post-change notifications complete", flush=True)
-            # If we get here, update succeeded — clear stale flag
-            try:
-                os.remove("/tmp/instapi_usb_stale")
-            except OSError:
-                pass
-
-        # 9. Update state
-        db.set_setting("last_sync", datetime.now().isoformat(timespec="seconds"))
-        db.set_setting("last_sync_result", "success")
-        db.delete_setting("sync_error")
-        db.add_sync_log("success",
-                        photos_added=downloaded,
-                        photos_removed=deleted,
-                        duration_s=round(time.time() - _sync_start_time, 1))
+            _publish_to_frame()
+
+        # 7. Advance our journal position only if every change landed;
+        # otherwise the next cycle re-diffs against the full manifest
+        if "version" in manifest and downloaded == len(to_download):
+            db.set_setting("sync_manifest_version", manifest["version"])
+            if resp.headers.get("ETag"):
+                db.set_setting("sync_manifest_etag", resp.headers["ETag"])
+        else:
+            db.delete_setting("sync_manifest_version")
+            db.delete_setting("sync_manifest_etag")
+
+        # 8. Update state. Photos the master was too busy to send make this
+        # a busy cycle, retried when it asked, rather than a success
+        if deferred:
+            retry_after = max(deferred.values())
+            _record_sync_error(_sync_start_time,
+                               f"Master busy, {len(deferred)} photos left for the next cycle",
+                               metrics, downloaded, deleted)
+            print(f"[SYNC] Master busy, deferred {len(deferred)} photos "
+                  f"({downloaded} downloaded, {deleted} deleted)", flush=True)
+            return retry_after
+        if downloaded < len(to_download):
+            # Not current yet: an error result sends the loop into its
+            # retry backoff instead of a full interval of long-polling
+            failed = len(to_download) - downloaded
+            _record_sync_error(_sync_start_time,
+                               f"{failed} of {len(to_download)} photos failed to download",
+                               metrics, downloaded, deleted)
+            print(f"[SYNC] Incomplete: {downloaded} downloaded, {failed} failed, "
+                  f"{deleted} deleted", flush=True)
+            return
+        _record_sync_success(_sync_start_time, downloaded, deleted, metrics)
 
         print(f"[SYNC] Complete: {downloaded} downloaded, {deleted} deleted", flush=True)
 
     except requests.RequestException as e:
-        db.set_setting("sync_error", str(e))
-        db.set_setting("last_sync_result", "error")
-        db.add_sync_log("error",
-                        duration_s=round(time.time() - _sync_start_time, 1),
-                        error=str(e))
+        _record_sync_error(_sync_start_time, str(e), metrics)
         print(f"[SYNC] Network error: {e}")
+        if _lan_master["url"]:
+            # Moved or gone: next cycle re-probes, else uses master_url
+            _forget_lan_master()
     except Exception as e:
-        db.set_setting("sync_error", str(e))
-        db.set_setting("last_sync_result", "error")
-        db.add_sync_log("error",
-                        duration_s=round(time.time() - _sync_start_time, 1),
-                        error=str(e))
+        _record_sync_error(_sync_start_time, str(e), metrics)
         print(f"[SYNC] Unexpected error: {e}")
         import traceback
         traceback.print_exc()
     finally:
-        db.set_setting("sync_in_progress", False)
-        db.delete_setting("sync_total")
-        db.delete_setting("sync_completed")
-        db.delete_setting("sync_phase")
+        _report_to_master(http, master_url, sync_token)
+        http.close()
+        progress.finish("sync")
+
+
+def _sync_thumbnails(session, master_url, sync_token, synced, master_thumbs, thumb_dir,
+                     max_workers):
+    """Give each (path, dest) in synced a thumbnail.
+
+    Fetches the master's (a few KB each) instead of decoding every
+    full-size photo again; generates locally only as a fallback.
+    """
+    wanted = {path: master_thumbs[path] for path, _ in synced if path in master_thumbs}
+    failed = set()
+    if wanted:
+        failed = _fetch_thumbnails(session, master_url, sync_token, wanted, thumb_dir,
+                                   max_workers)
+    for path, dest in synced:
+        if path not in wanted or path in failed:
+            generate_thumbnail(dest, os.path.join(thumb_dir, os.path.basename(path)))
+
+
+def _publish_to_frame():
+    """Notify: sets done/photos_chosen, triggers USB sync if needed."""
+    # Mark USB as stale before update — cleared on success
+    try:
+        with open("/tmp/instapi_usb_stale", "w") as f:
+            f.write(str(int(time.time())))
+    except OSError:
+        pass
+    notify_photos_changed()
+    print("[SYNC] Post-change notifications complete", flush=True)
+    # If we get here, update succeeded — clear stale flag
+    try:
+        os.remove("/tmp/instapi_usb_stale")
+    except OSError:
+        pass
+
+
+def _publish_checkpoint():
+    """Run _publish_to_frame in the background, with at most one run pending.
+
+    A USB refresh can take minutes, so checkpoints don't hold up the
+    downloads: ones reached while a publish is running fold into a single
+    follow-up run, which picks up everything on disk by then.
+    """
+    with _checkpoint_lock:
+        if _checkpoint_publish["running"]:
+            _checkpoint_publish["again"] = True
+            return
+        _checkpoint_publish["running"] = True
+        _checkpoint_idle.clear()
+
+    def publish():
+        while True:
+            try:
+                _publish_to_frame()
+            except Exception as e:
+                print(f"[SYNC] Checkpoint publish failed: {e}")
+            with _checkpoint_lock:
+                if not _checkpoint_publish["again"]:
+                    _checkpoint_publish["running"] = False
+                    _checkpoint_idle.set()
+                    return
+                _checkpoint_publish["again"] = False
+
+    threading.Thread(target=publish, daemon=True).start()
+
+
+def _report_to_master(session, master_url, sync_token):
+    """Tell the master which version we applied and how the cycle went.
+
+    Feeds its fleet dashboard. Best effort: masters predating /sync/report
+    answer 404, and an unreachable master already failed the cycle.
+    """
+    report = {
+        "token": sync_token,
+        "version": db.get_setting("sync_manifest_version"),
+        "result": db.get_setting("last_sync_result"),
+        "error": db.get_setting("sync_error"),
+    }
+    try:
+        with session.post(f"{master_url}/sync/report", json=report, timeout=10):
+            pass
+    except requests.RequestException:
+        pass
 
 
 def _reconcile_after_sync():
@@ -547,40 +2231,115 @@ def _reconcile_after_sync():
         db.set_setting("done", False)
 
 
-def _sync_loop():
-    """Background loop that runs sync cycles at configured interval.
+def _wait_for_master_change(stop_event, interval):
+    """Sleep until the master reports new photos, interval passes, or stop.
+
+    Keeps one /sync/wait long-poll outstanding against the master. Falls
+    back to plain interval sleeping when we have no journal version to wait
+    on or the master predates the endpoint. Returns True if woken by a change.
+    """
+    deadline = time.time() + interval
+    while not stop_event.is_set():
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False
+
+        master_url = _lan_master["url"] or db.get_setting("master_url")
+        version = db.get_setting("sync_manifest_version")
+        if not master_url or version is None:
+            stop_event.wait(remaining)
+            return False
+
+        wait_s = int(min(config.SYNC_WAIT_TIMEOUT, remaining))
+        try:
+            resp = requests.get(
+                f"{master_url}/sync/wait",
+                params={"token": db.get_setting("sync_token"), "version": version,
+                        "timeout": wait_s},
+                timeout=wait_s + 15
+            )
+        except requests.RequestException:
+            # Master unreachable — don't hammer it, the interval still applies
+            _forget_lan_master()
+            stop_event.wait(min(60, remaining))
+            continue
 
-    On failure, retries with exponential backoff: 5 min → 10 min → 20 min,
-    capped at the normal sync interval. Resets to normal interval on success.
+        if resp.status_code == 404:
+            # Master without long-poll support: plain interval polling
+            stop_event.wait(remaining)
+            return False
+        if resp.status_code != 200:
+            stop_event.wait(min(_retry_after(resp, 60), remaining))
+            continue
+        try:
+            changed = resp.json().get("changed")
+        except (ValueError, AttributeError):
+            # Not our JSON (a proxy's error page, say): sit out the interval
+            stop_event.wait(remaining)
+            return False
+        if changed:
+            # Give a burst of uploads a moment to finish landing; the random
+            # part keeps every frame that woke with us from syncing in step
+            stop_event.wait(config.SYNC_WAIT_SETTLE + random.uniform(0, config.SYNC_WAKE_SPREAD))
+            return True
+    return False
+
+
+def _sync_loop(stop_event, at_boot=False):
+    """Background loop that runs sync cycles as photos change on the master.
+
+    After a successful cycle it long-polls the master and starts the next
+    cycle as soon as something changes, with the configured interval as a
+    fallback. On failure, retries with exponential backoff: 5 min → 10 min
+    → 20 min, capped at the normal sync interval. A busy master's
+    Retry-After replaces the backoff. Every delay is jittered so frames
+    that rebooted together (say, after a power cut) don't stay in step.
     """
-    # Initial delay to let the app finish starting
-    if _sync_stop_event.wait(10):
+    # Initial delay to let the app finish starting. At boot, add a random
+    # offset so frames powered on together don't all hit the master at once;
+    # Sync Now and config saves restart the loop and keep the fixed delay.
+    delay = 10
+    if at_boot:
+        delay += random.uniform(0, config.SYNC_START_SPREAD)
+    if stop_event.wait(delay):
         return
 
+    # First cycle after (re)start always diffs the full manifest, catching
+    # any local drift (e.g. files removed by hand) that deltas can't see
+    _forget_manifest_position()
+
     fail_count = 0
-    while not _sync_stop_event.is_set():
-        run_sync_cycle()
+    while not stop_event.is_set():
+        retry_after = run_sync_cycle()
         last_result = db.get_setting("last_sync_result")
         if last_result == "success":
             fail_count = 0
             interval = db.get_setting("sync_interval", config.DEFAULT_SYNC_INTERVAL)
+            if _wait_for_master_change(stop_event, _jittered(interval)):
+                print("[SYNC] Master reported changes, syncing now")
+            continue
+        if retry_after is not None:
+            # Busy isn't broken: come back when asked, without escalating
+            interval = _jittered(max(retry_after, config.SYNC_WAIT_SETTLE), floor=True)
+            print(f"[SYNC] Master busy, retry in {interval:.0f}s")
         else:
             fail_count += 1
             normal_interval = db.get_setting("sync_interval", config.DEFAULT_SYNC_INTERVAL)
-            interval = min(300 * (2 ** (fail_count - 1)), normal_interval)
-            print(f"[SYNC] Retry in {interval}s (attempt {fail_count})")
-        if _sync_stop_event.wait(interval):
+            interval = _jittered(min(300 * (2 ** (fail_count - 1)), normal_interval))
+            print(f"[SYNC] Retry in {interval:.0f}s (attempt {fail_count})")
+        if stop_event.wait(interval):
             break
 
     print("[SYNC] Sync loop stopped")
 
 
-def start_sync_loop():
-    """Start the background sync loop."""
-    global _sync_thread
+def start_sync_loop(at_boot=False):
+    """Start the background sync loop (at_boot: spread the first cycle)."""
+    global _sync_thread, _sync_stop_event
     stop_sync_loop()
-    _sync_stop_event.clear()
-    _sync_thread = threading.Thread(target=_sync_loop, daemon=True)
+    _sync_stop_event = threading.Event()
+    _sync_thread = threading.Thread(target=_sync_loop, args=(_sync_stop_event, at_boot),
+                                    daemon=True)
     _sync_thread.start()
     print("[SYNC] Sync loop started")
 
@@ -9,7 +9,8 @@ from PIL import Image, ImageOps
 from app import app
 import config
 import db
-from photo_ops import compute_md5, generate_thumbnail, notify_photos_changed
+import progress
+from photo_ops import compute_md5, generate_thumbnail, notify_photos_changed, store_object
 
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 STAGING_DIR = os.path.join(config.PHOTOS_DIR, ".staging")
@@ -41,10 +42,7 @@ def _validate_token():
     if token == db.get_setting("upload_token"):
         return "admin"
     # Check sync child tokens (each child's token doubles as their upload identity)
-    for child in db.get_setting("sync_children", []):
-        if child["token"] == token:
-            return child["label"]
-    return False
+    return db.get_sync_child_label(token) or False
 
 
 @app.route("/upload")
@@ -107,9 +105,7 @@ def upload_photos():
         return jsonify({"success": False, "error": "No valid files"})
 
     # Track processing progress
-    db.set_setting("upload_processing", True)
-    db.set_setting("upload_total", len(staged))
-    db.set_setting("upload_processed", 0)
+    progress.start("upload", total=len(staged))
 
     # Process in background thread (prevents OOM from processing all at once)
     t = threading.Thread(
@@ -135,6 +131,7 @@ def _process_staged_uploads(staged_files, uploader):
     os.makedirs(thumb_dir, exist_ok=True)
 
     processed_filenames = []
+    records = []  # written to the DB in one commit at the end
 
     for idx, (staging_path, filename) in enumerate(staged_files):
         try:
@@ -154,9 +151,9 @@ def _process_staged_uploads(staged_files, uploader):
             file_size = os.path.getsize(photo_path)
             file_md5 = compute_md5(photo_path)
 
-            # Track in DB
-            db.add_photo(filename, subdir="upload", uploaded_by=uploader,
-                         size_bytes=file_size, md5=file_md5)
+            records.append({"filename": filename, "subdir": "upload", "uploaded_by": uploader,
+                            "size_bytes": file_size, "md5": file_md5})
+            store_object(photo_path, file_md5)
 
             processed_filenames.append(filename)
             print(f"[UPLOAD] Processed {idx + 1}/{len(staged_files)}: {filename}")
@@ -170,19 +167,19 @@ def _process_staged_uploads(staged_files, uploader):
             except OSError:
                 pass
 
-            db.set_setting("upload_processed", idx + 1)
+            progress.update("upload", completed=idx + 1)
 
             # Free memory every 5 files
             if (idx + 1) % 5 == 0:
                 gc.collect()
 
+    # Track in DB
+    db.add_photos(records)
     if processed_filenames:
         notify_photos_changed()
 
     # Clear processing state
-    db.delete_setting("upload_processing")
-    db.delete_setting("upload_total")
-    db.delete_setting("upload_processed")
+    progress.finish("upload")
 
     # Clean up staging dir
     try:
@@ -196,8 +193,9 @@ def _process_staged_uploads(staged_files, uploader):
 @app.route("/upload/status")
 def upload_status():
     """Return upload processing progress."""
+    upload = progress.get("upload")
     return jsonify({
-        "processing": db.get_setting("upload_processing", False),
-        "total": db.get_setting("upload_total", 0),
-        "processed": db.get_setting("upload_processed", 0),
+        "processing": upload["running"],
+        "total": upload["total"],
+        "processed": upload["completed"],
     })
@@ -37,6 +37,13 @@
             setTimeout(() => { toast.classList.remove('show'); }, 3000);
         }
 
+        // Escape text for interpolation into innerHTML
+        function escapeHtml(text) {
+            const div = document.createElement('div');
+            div.textContent = text == null ? '' : String(text);
+            return div.innerHTML.replace(/"/g, '&quot;').replace(/'/g, '&#39;');
+        }
+
         // Update disk space bar from storage data
         function updateDiskBar(storage) {
             const fill = document.getElementById('diskBarFill');
@@ -124,7 +131,8 @@
                 : allPhotos.filter(p => p.uploaded_by === activeFilter);
 
             // Build filter chips
-            const myKey = syncRole === 'child' ? myLabel : 'admin';
+            const pullsFromMaster = syncRole === 'child' || syncRole === 'relay';
+            const myKey = pullsFromMaster ? myLabel : 'admin';
             const uploaders = [...new Set(allPhotos.map(p => p.uploaded_by).filter(u => u && u !== 'unknown'))]
                 .sort((a, b) => a === myKey ? -1 : b === myKey ? 1 : a.localeCompare(b));
             const filtersEl = document.getElementById('photoFilters');
@@ -157,7 +165,7 @@
             grid.classList.remove('empty');
             grid.innerHTML = filtered.map(photo => {
                 // Children can only delete their own photos; master/admin can delete any
-                const canDelete = syncRole !== 'child' || photo.uploaded_by === myLabel;
+                const canDelete = !pullsFromMaster || photo.uploaded_by === myLabel;
                 return `
                     <div class="photo-thumb" onclick="showLightbox('${photo.path}')">
                         <img data-src="${photo.thumb}" alt="${photo.name}"
@@ -314,7 +322,12 @@
 
         // ========== Family Sync ==========
 
-        function showChildSetup() {
+        // Role the sync view currently shows ('relay' shows both views)
+        let currentSyncRole = window.INSTAPI_CONFIG.syncRole;
+        let childSetupRole = 'child';
+
+        function showChildSetup(role = 'child') {
+            childSetupRole = role;
             document.getElementById('syncUnconfigured').style.display = 'none';
             document.getElementById('syncChildSetup').style.display = '';
         }
@@ -325,14 +338,22 @@
         }
 
         function showSyncView(role) {
+            currentSyncRole = role;
             ['syncUnconfigured', 'syncChildSetup', 'syncMaster', 'syncChild'].forEach(
                 id => document.getElementById(id).style.display = 'none'
             );
-            if (role === 'master') {
+            if (role === 'master' || role === 'relay') {
                 document.getElementById('syncMaster').style.display = '';
+                document.getElementById('syncMasterDesc').textContent = role === 'relay'
+                    ? "This frame relays the primary frame's photos. Nearby frames sync from here."
+                    : 'This is the primary frame. Other frames sync photos from here.';
                 loadChildFrames();
-            } else if (role === 'child') {
+                loadSyncFleet();
+            }
+            if (role === 'child' || role === 'relay') {
                 document.getElementById('syncChild').style.display = '';
+            }
+            if (role) {
                 loadSyncStatus();
             } else {
                 document.getElementById('syncUnconfigured').style.display = '';
@@ -368,12 +389,12 @@
                 const resp = await fetch('/admin/sync_config', {
                     method: 'POST',
                     headers: {'Content-Type': 'application/json'},
-                    body: JSON.stringify({sync_role: 'child', master_url: masterUrl, sync_token: syncToken})
+                    body: JSON.stringify({sync_role: childSetupRole, master_url: masterUrl, sync_token: syncToken})
                 });
                 const data = await resp.json();
                 if (data.success) {
                     showToast('Sync configured! Starting first sync...');
-                    showSyncView('child');
+                    showSyncView(childSetupRole);
                     document.getElementById('syncMasterUrl').textContent = masterUrl;
                 } else {
                     showToast(data.error || 'Failed', true);
@@ -396,7 +417,8 @@
 
             // Connection dot
             dot.className = 'sync-dot ' + (isSyncing ? 'syncing' : isError ? 'error' : 'connected');
-            connText.textContent = isSyncing ? 'Syncing...' : isError ? 'Master unreachable' : 'Connected to master';
+            connText.textContent = isSyncing ? 'Syncing...' : isError ? 'Master unreachable'
+                : data.sync_via_lan ? 'Connected to master (local network)' : 'Connected to master';
 
             // Details
             let lines = [];
@@ -433,8 +455,8 @@
                 if (resp.status === 401) { window.location.href = '/admin/login'; return; }
                 const data = await resp.json();
 
-                // Update child view
-                if (data.sync_role === 'child') {
+                // Update child view (a relay shows both)
+                if (data.sync_role === 'child' || data.sync_role === 'relay') {
                     document.getElementById('syncMasterUrl').textContent = data.master_url || '';
                     const icon = document.getElementById('syncStatusIcon');
                     const status = document.getElementById('syncStatusText');
@@ -473,10 +495,26 @@
                     // Set interval selector
                     const sel = document.getElementById('syncIntervalSelect');
                     if (sel) sel.value = String(data.sync_interval || 1800);
+                    const conc = document.getElementById('syncConcurrencySelect');
+                    if (conc) conc.value = String(data.sync_concurrency || 4);
+                    const maxDim = document.getElementById('syncMaxDimSelect');
+                    if (maxDim) {
+                        maxDim.value = String(data.sync_max_dim);
+                        // A relay always keeps originals for its frames
+                        maxDim.disabled = data.sync_role === 'relay';
+                    }
 
                     // Render sync status card
                     renderSyncStatus(data);
                 }
+                if (data.sync_role === 'master' || data.sync_role === 'relay') {
+                    const rate = document.getElementById('syncRateLimitSelect');
+                    if (rate) rate.value = String(data.sync_rate_limit_kbps);
+                    const total = document.getElementById('syncMaxTransfersSelect');
+                    if (total) total.value = String(data.sync_max_transfers);
+                    const perChild = document.getElementById('syncChildMaxTransfersSelect');
+                    if (perChild) perChild.value = String(data.sync_child_max_transfers);
+                }
             } catch (e) {
                 console.error('Failed to load sync status:', e);
                 const status = document.getElementById('syncStatusText');
@@ -488,8 +526,8 @@
             }
         }
 
-        // Auto-poll sync status for child frames (immediate + every 10s)
-        if (window.INSTAPI_CONFIG.syncRole === "child") {
+        // Auto-poll sync status for child and relay frames (immediate + every 10s)
+        if (window.INSTAPI_CONFIG.syncRole === "child" || window.INSTAPI_CONFIG.syncRole === "relay") {
         loadSyncStatus();
         setInterval(loadSyncStatus, 10000);
         }
@@ -541,12 +579,45 @@
                 await fetch('/admin/sync_config', {
                     method: 'POST',
                     headers: {'Content-Type': 'application/json'},
-                    body: JSON.stringify({sync_role: 'child', sync_interval: parseInt(value)})
+                    body: JSON.stringify({sync_role: currentSyncRole, sync_interval: parseInt(value)})
                 });
                 showToast('Interval updated');
             } catch (e) {}
         }
 
+        async function updateSyncConcurrency(value) {
+            try {
+                await fetch('/admin/sync_config', {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({sync_role: currentSyncRole, sync_concurrency: parseInt(value)})
+                });
+                showToast('Parallel downloads updated');
+            } catch (e) {}
+        }
+
+        async function updateSyncMaxDim(value) {
+            try {
+                await fetch('/admin/sync_config', {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({sync_role: currentSyncRole, sync_max_dim: parseInt(value)})
+                });
+                showToast('Display resolution updated');
+            } catch (e) {}
+        }
+
+        async function updateSyncQos(key, value) {
+            try {
+                await fetch('/admin/sync_config', {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({sync_role: currentSyncRole, [key]: parseInt(value)})
+                });
+                showToast('Sync limits updated');
+            } catch (e) {}
+        }
+
         async function loadChildFrames() {
             try {
                 const resp = await fetch('/admin/sync_children');
@@ -575,6 +646,53 @@
             }
         }
 
+        const FLEET_ICONS = {ok: ['✅', 'green'], behind: ['⏳', 'blue'], error: ['⚠️', 'orange'],
+                             stale: ['💤', 'orange'], never: ['❔', '']};
+
+        async function loadSyncFleet() {
+            const list = document.getElementById('syncFleetList');
+            if (!list) return;
+            try {
+                const resp = await fetch('/admin/sync_fleet');
+                if (!resp.ok) return;
+                const data = await resp.json();
+                if (data.children.length === 0) {
+                    list.innerHTML = '';
+                    return;
+                }
+                list.innerHTML = data.children.map(c => {
+                    const [icon, color] = FLEET_ICONS[c.status] || FLEET_ICONS.never;
+                    const lines = [];
+                    if (c.status === 'never') {
+                        lines.push('Has not connected yet');
+                    } else {
+                        lines.push(`Last seen ${timeAgo(c.last_seen_at)}`);
+                        if (c.versions_behind === 0) lines.push('up to date');
+                        else if (c.versions_behind) lines.push(`${c.versions_behind} changes behind`);
+                        lines.push(`${c.photos_served} photos (${(c.bytes_served / 1048576).toFixed(1)} MB) sent`);
+                    }
+                    const error = c.status === 'error' || c.status === 'stale'
+                        ? `<br><span class="stale-warning">${escapeHtml(c.last_error || 'No contact for a while')}</span>` : '';
+                    return `
+                    <div class="action-item">
+                        <div class="action-icon ${color}">${icon}</div>
+                        <div class="action-content">
+                            <h3>${escapeHtml(c.label)}</h3>
+                            <p>${lines.join(' · ')}${error}</p>
+                        </div>
+                    </div>`;
+                }).join('');
+            } catch (e) {
+                console.error('Failed to load frame status:', e);
+            }
+        }
+
+        // Refresh frame status on the master (or relay) every 30s
+        if (window.INSTAPI_CONFIG.syncRole === "master" || window.INSTAPI_CONFIG.syncRole === "relay") {
+        loadSyncFleet();
+        setInterval(loadSyncFleet, 30000);
+        }
+
         async function addChildFrame() {
             const label = prompt('Frame name (e.g. "Gramma"):');
             if (!label) return;
@@ -0,0 +1,37 @@
+def _identity(info):
+    return lambda: info
+
+
+def test_discover_finds_matching_master():
+    import beacon
+    port = beacon.start_responder(_identity({"id": "abc", "port": 3000}), port=0,
+                                  host="127.0.0.1")
+    try:
+        assert beacon.discover("abc", timeout=0.3, addr=("127.0.0.1", port)) == [("127.0.0.1", 3000)]
+        # Probes for another master go unanswered
+        assert beacon.discover("other", timeout=0.2, addr=("127.0.0.1", port)) == []
+    finally:
+        beacon.stop_responder()
+
+
+def test_responder_silent_when_not_serving():
+    import beacon
+    port = beacon.start_responder(_identity(None), port=0, host="127.0.0.1")
+    try:
+        assert beacon.discover("abc", timeout=0.2, addr=("127.0.0.1", port)) == []
+    finally:
+        beacon.stop_responder()
+
+
+def test_responder_ignores_garbage():
+    import socket
+    import beacon
+    port = beacon.start_responder(_identity({"id": "abc", "port": 3000}), port=0,
+                                  host="127.0.0.1")
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.sendto(b"\xff not json", ("127.0.0.1", port))
+            sock.sendto(b"[1, 2]", ("127.0.0.1", port))
+        assert beacon.discover("abc", timeout=0.3, addr=("127.0.0.1", port)) == [("127.0.0.1", 3000)]
+    finally:
+        beacon.stop_responder()
@@ -0,0 +1,207 @@
+import sqlite3
+
+import pytest
+
+
+def _init_test_db(monkeypatch, tmp_path):
+    import db
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "test.db"))
+    _close(db)
+    db.init_db()
+    return db
+
+
+def _close(db):
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_settings_cache_writes_through(tmp_path, monkeypatch):
+    """Reads come from memory; set/delete/clear keep it in step with the DB."""
+    db = _init_test_db(monkeypatch, tmp_path)
+    db.set_setting("sync_role", "child")
+    db.get_setting("sync_role")
+
+    queries = []
+    db.get_db().set_trace_callback(queries.append)
+    assert db.get_setting("sync_role") == "child"
+    assert db.get_setting("missing", 7) == 7
+    assert [q for q in queries if "settings" in q] == []
+    db.get_db().set_trace_callback(None)
+
+    db.set_setting("sync_role", "relay")
+    assert db.get_setting("sync_role") == "relay"
+    db.delete_setting("sync_role")
+    assert db.get_setting("sync_role") is None
+    db.set_setting("upload_token", "t")
+    db.clear_all_settings()
+    assert db.get_all_settings() == {}
+
+    _close(db)
+
+
+def test_settings_cache_returns_copies(tmp_path, monkeypatch):
+    db = _init_test_db(monkeypatch, tmp_path)
+    value = {"labels": ["a"]}
+    db.set_setting("thing", value)
+    value["labels"].append("changed after saving")
+    db.get_setting("thing")["labels"].append("changed by a reader")
+    db.get_all_settings()["thing"]["labels"].clear()
+    assert db.get_setting("thing") == {"labels": ["a"]}
+
+    _close(db)
+
+
+def test_settings_cache_shared_across_threads(tmp_path, monkeypatch):
+    """A write on one thread's connection is seen by readers on others."""
+    import threading
+    db = _init_test_db(monkeypatch, tmp_path)
+    db.set_setting("current_index", 1)
+    assert db.get_setting("current_index") == 1
+
+    def write():
+        db.set_setting("current_index", 2)
+        db._local.conn.close()
+    thread = threading.Thread(target=write)
+    thread.start()
+    thread.join()
+    assert db.get_setting("current_index") == 2
+
+    _close(db)
+
+
+def test_transaction_commits_once(tmp_path, monkeypatch):
+    """Writes inside transaction() share one commit; nested blocks join it."""
+    db = _init_test_db(monkeypatch, tmp_path)
+    commits = []
+    db.get_db().set_trace_callback(lambda q: q == "COMMIT" and commits.append(q))
+    with db.transaction():
+        db.add_photo("a.jpg", md5="aaa")
+        with db.transaction():
+            db.set_setting("current_index", 3)
+        db.remove_photo("a.jpg")
+    db.get_db().set_trace_callback(None)
+    assert len(commits) == 1
+    assert db.get_photo("a.jpg") is None
+    assert db.get_setting("current_index") == 3
+
+    _close(db)
+
+
+def test_transaction_rolls_back(tmp_path, monkeypatch):
+    """A failed block leaves neither the DB nor the settings cache changed."""
+    db = _init_test_db(monkeypatch, tmp_path)
+    db.set_setting("current_index", 1)
+    version = db.get_photo_version()
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.add_photo("a.jpg", md5="aaa")
+            db.set_setting("current_index", 2)
+            raise RuntimeError("boom")
+    assert db.get_setting("current_index") == 1
+    assert db.get_photo("a.jpg") is None
+    assert db.get_photo_version() == version
+
+    _close(db)
+
+
+def test_bulk_photo_writes(tmp_path, monkeypatch):
+    """add_photos journals only rows that change; remove_photos returns rows."""
+    db = _init_test_db(monkeypatch, tmp_path)
+    db.add_photo("a.jpg", subdir="upload", uploaded_by="Ann", md5="aaa", size_bytes=1)
+    version = db.get_photo_version()
+    db.add_photos([
+        {"filename": "a.jpg", "subdir": "upload", "md5": "aaa", "size_bytes": 1},
+        {"filename": "b.jpg", "subdir": "upload", "md5": "bbb", "size_bytes": 2},
+        {"filename": "c.jpg", "subdir": "upload", "md5": "ccc", "size_bytes": 3},
+    ])
+    changes = db.get_photo_changes(version)
+    assert [(c["filename"], c["op"]) for c in changes] == [("b.jpg", "add"), ("c.jpg", "add")]
+    assert db.get_photo("a.jpg")["uploaded_by"] == "Ann"
+
+    removed = db.remove_photos(["a.jpg", "c.jpg", "missing.jpg"])
+    assert sorted(row["md5"] for row in removed) == ["aaa", "ccc"]
+    assert [row["filename"] for row in db.get_all_photos()] == ["b.jpg"]
+    db.set_settings({"done": True, "current_index": 0})
+    assert db.get_all_settings() == {"done": True, "current_index": 0}
+
+    _close(db)
+
+
+def test_migrations_upgrade_unversioned_db(tmp_path, monkeypatch, capsys):
+    """A DB from before versioning is migrated once and keeps its rows."""
+    import db
+    db_path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE photos (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                 "filename TEXT UNIQUE NOT NULL, subdir TEXT NOT NULL DEFAULT '', "
+                 "uploaded_by TEXT NOT NULL DEFAULT 'admin', "
+                 "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, "
+                 "size_bytes INTEGER DEFAULT 0, md5 TEXT)")
+    conn.execute("CREATE INDEX idx_photos_subdir ON photos(subdir)")
+    conn.execute("INSERT INTO photos (filename, subdir, md5) VALUES ('a.jpg', 'upload', 'aaa')")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    _close(db)
+    db.init_db()
+    out = capsys.readouterr().out
+    assert f"Schema v0 -> v{db.MIGRATIONS[-1][0]}" in out
+
+    conn = db.get_db()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == db.MIGRATIONS[-1][0]
+    indexes = {row["name"] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='photos'")}
+    assert {"idx_photos_manifest", "idx_photos_created", "idx_photos_md5"} <= indexes
+    assert "idx_photos_subdir" not in indexes
+    assert db.get_photo_urls() == ["/static/photos/upload/a.jpg"]
+
+    # Up to date: nothing re-runs
+    db.init_db()
+    assert "[MIGRATION]" not in capsys.readouterr().out
+
+    _close(db)
+
+
+def test_sync_child_status_columns_exist(tmp_path, monkeypatch):
+    """Every column update_sync_child accepts is in the migrated schema."""
+    db = _init_test_db(monkeypatch, tmp_path)
+    columns = {row["name"] for row in db.get_db().execute("PRAGMA table_info(sync_children)")}
+    assert db.SYNC_CHILD_STATUS_COLUMNS <= columns
+
+    _close(db)
+
+
+def test_migration_failure_rolls_back(tmp_path, monkeypatch):
+    """A failing migration leaves user_version at the last one that succeeded."""
+    db = _init_test_db(monkeypatch, tmp_path)
+    latest = db.MIGRATIONS[-1][0]
+
+    def broken(conn):
+        conn.execute("CREATE INDEX idx_broken ON photos(filename)")
+        raise sqlite3.OperationalError("boom")
+    monkeypatch.setattr(db, "MIGRATIONS", db.MIGRATIONS + [(latest + 1, "broken", broken)])
+    with pytest.raises(sqlite3.OperationalError):
+        db.init_db()
+    conn = db.get_db()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == latest
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name='idx_broken'").fetchone() is None
+
+    _close(db)
+
+
+def test_manifest_scans_use_covering_index(tmp_path, monkeypatch):
+    db = _init_test_db(monkeypatch, tmp_path)
+    conn = db.get_db()
+    for sql, params in (
+        ("SELECT filename, subdir FROM photos ORDER BY created_at", ()),
+        (f"SELECT {', '.join(db._MANIFEST_COLUMNS)} FROM photos "
+         "WHERE subdir = ? OR substr(subdir, 1, ?) = ? ORDER BY subdir, filename",
+         ("sync", 5, "sync/")),
+    ):
+        plan = " ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+        assert "COVERING INDEX" in plan, plan
+
+    _close(db)
@@ -0,0 +1,101 @@
+import sqlite3
+
+
+def _init_test_db(monkeypatch, tmp_path):
+    import db
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "test.db"))
+    _close(db)
+    db.init_db()
+    return db
+
+
+def _close(db):
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_storage_profile_detection(tmp_path, monkeypatch):
+    import db
+    model = tmp_path / "model"
+    monkeypatch.setattr(db, "MODEL_FILE", str(model))
+    monkeypatch.setattr(db, "DB_PROFILE", "")
+    assert db.storage_profile() == "pi4"  # no device tree: dev machine
+    model.write_text("Raspberry Pi Zero 2 W Rev 1.0\x00")
+    assert db.storage_profile() == "zero"
+    model.write_text("Raspberry Pi 5 Model B Rev 1.0\x00")
+    assert db.storage_profile() == "pi4"
+    monkeypatch.setattr(db, "DB_PROFILE", "zero")
+    assert db.storage_profile() == "zero"
+
+
+def test_profile_pragmas_applied(tmp_path, monkeypatch):
+    import db
+    monkeypatch.setattr(db, "DB_PROFILE", "zero")
+    db = _init_test_db(monkeypatch, tmp_path)
+    conn = db.get_db()
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    assert conn.execute("PRAGMA cache_size").fetchone()[0] == -2048
+    assert conn.execute("PRAGMA wal_autocheckpoint").fetchone()[0] == 500
+    assert db.get_storage_stats()["auto_vacuum"] == "incremental"
+    _close(db)
+
+
+def test_maintenance_frees_pages_and_truncates_wal(tmp_path, monkeypatch):
+    import maintenance
+    db = _init_test_db(monkeypatch, tmp_path)
+    db.add_photos([{"filename": f"{i}.jpg", "md5": "x" * 500} for i in range(500)])
+    db.remove_photos([f"{i}.jpg" for i in range(500)])
+    db.set_setting("current_index", 1)
+    before = db.get_storage_stats()
+    assert before["freelist_count"] > 0
+    assert before["wal_bytes"] > 0
+
+    result = maintenance.run()
+    after = db.get_storage_stats()
+    assert result["pages_freed"] > 0
+    assert not result["checkpoint_busy"]
+    assert after["freelist_count"] == 0
+    assert after["page_count"] < before["page_count"]
+    assert after["wal_bytes"] == 0
+    assert maintenance.last_run()["pages_freed"] == result["pages_freed"]
+    _close(db)
+
+
+def test_maintenance_converts_old_database(tmp_path, monkeypatch):
+    """Databases created before incremental auto_vacuum get switched over."""
+    import db
+    path = tmp_path / "test.db"
+    sqlite3.connect(path).executescript("PRAGMA journal_mode=WAL;" + db.SCHEMA_SQL).close()
+    db = _init_test_db(monkeypatch, tmp_path)
+    assert db.get_storage_stats()["auto_vacuum"] == "none"
+    db.vacuum_free_pages()
+    assert db.get_storage_stats()["auto_vacuum"] == "incremental"
+    _close(db)
+
+
+def test_maintenance_waits_for_idle(monkeypatch):
+    import maintenance
+    import progress
+    import qos
+    assert maintenance.is_idle()
+    qos.begin_interactive()
+    try:
+        assert not maintenance.is_idle()
+    finally:
+        qos.end_interactive()
+    progress.start("sync")
+    try:
+        assert not maintenance.is_idle()
+    finally:
+        progress.finish("sync")
+    assert maintenance.is_idle()
+
+
+def test_sync_log_keeps_newest(tmp_path, monkeypatch):
+    db = _init_test_db(monkeypatch, tmp_path)
+    monkeypatch.setattr(db, "SYNC_LOG_RETAIN", 3)
+    for i in range(5):
+        db.add_sync_log("success", photos_added=i)
+    assert [e["photos_added"] for e in db.get_sync_history(10)] == [4, 3, 2]
+    _close(db)
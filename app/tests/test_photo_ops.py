@@ -200,6 +200,131 @@ def test_delete_photo_files_missing_file(tmp_path, monkeypatch):
         db._local.conn = None
 
 
+# ============== object store ==============
+
+def test_store_object_dedupes_identical_files(tmp_path):
+    """A second identical file should become a hardlink to the first's object."""
+    from photo_ops import store_object, object_path, compute_md5
+    photos_dir = str(tmp_path / "photos")
+    a = os.path.join(photos_dir, "upload", "a.jpg")
+    b = os.path.join(photos_dir, "sync", "upload", "b.jpg")
+    _make_test_image(a)
+    _make_test_image(b)
+    md5 = compute_md5(a)
+
+    assert store_object(a, md5, photos_dir) is True
+    assert store_object(b, md5, photos_dir) is True
+
+    obj = object_path(md5, photos_dir)
+    assert os.path.samefile(a, obj)
+    assert os.path.samefile(b, obj)
+    assert os.stat(obj).st_nlink == 3
+
+
+def test_walk_photos_excludes_objects(tmp_path):
+    from photo_ops import walk_photos, store_object, compute_md5
+    photos_dir = str(tmp_path / "photos")
+    path = os.path.join(photos_dir, "upload", "a.jpg")
+    _make_test_image(path)
+    store_object(path, compute_md5(path), photos_dir)
+
+    assert [f for f, _, _ in walk_photos(photos_dir)] == ["a.jpg"]
+
+
+def test_link_object_and_release(tmp_path):
+    """Objects can be linked into new paths and go away with their last name."""
+    from photo_ops import store_object, link_object, release_object, object_path, compute_md5
+    photos_dir = str(tmp_path / "photos")
+    src = os.path.join(photos_dir, "picker", "a.jpg")
+    content = _make_test_image(src)
+    md5 = compute_md5(src)
+    store_object(src, md5, photos_dir)
+
+    dest = os.path.join(photos_dir, "sync", "picker", "a.jpg")
+    assert link_object(md5, dest, photos_dir) is True
+    with open(dest, "rb") as f:
+        assert f.read() == content
+    assert link_object("0" * 32, dest, photos_dir) is False
+
+    os.remove(src)
+    release_object(md5, photos_dir)
+    assert os.path.exists(object_path(md5, photos_dir))
+    os.remove(dest)
+    release_object(md5, photos_dir)
+    assert not os.path.exists(object_path(md5, photos_dir))
+
+
+def test_delete_photo_files_releases_object(tmp_path, monkeypatch):
+    db = _init_test_db(monkeypatch, tmp_path)
+    from photo_ops import delete_photo_files, store_object, object_path, compute_md5
+
+    photos_dir = str(tmp_path / "photos")
+    path = os.path.join(photos_dir, "upload", "test.jpg")
+    _make_test_image(path)
+    md5 = compute_md5(path)
+    store_object(path, md5, photos_dir)
+    db.add_photo("test.jpg", subdir="upload", uploaded_by="admin", md5=md5)
+
+    delete_photo_files("test.jpg", photos_dir)
+
+    assert not os.path.exists(object_path(md5, photos_dir))
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_prune_objects_removes_orphans(tmp_path):
+    from photo_ops import store_object, prune_objects, object_path, compute_md5
+    photos_dir = str(tmp_path / "photos")
+    kept = os.path.join(photos_dir, "upload", "kept.jpg")
+    gone = os.path.join(photos_dir, "upload", "gone.jpg")
+    _make_test_image(kept, b"\xff\xd8\xff\xe0kept")
+    _make_test_image(gone, b"\xff\xd8\xff\xe0gone")
+    kept_md5, gone_md5 = compute_md5(kept), compute_md5(gone)
+    store_object(kept, kept_md5, photos_dir)
+    store_object(gone, gone_md5, photos_dir)
+    os.remove(gone)
+
+    assert prune_objects(photos_dir) == 1
+    assert os.path.exists(object_path(kept_md5, photos_dir))
+    assert not os.path.exists(os.path.dirname(object_path(gone_md5, photos_dir)))
+
+
+# ============== photo variants ==============
+
+def test_photo_variant_renders_once_and_caches(tmp_path, monkeypatch):
+    db = _init_test_db(monkeypatch, tmp_path)
+    import config
+    from PIL import Image
+    from photo_ops import photo_variant, prune_variants, compute_md5
+    monkeypatch.setattr(config, "PHOTOS_DIR", str(tmp_path / "photos"))
+
+    big = str(tmp_path / "photos" / "upload" / "big.jpg")
+    small = str(tmp_path / "photos" / "upload" / "small.jpg")
+    os.makedirs(os.path.dirname(big))
+    Image.new("RGB", (3000, 2000)).save(big, "JPEG")
+    Image.new("RGB", (800, 600)).save(small, "JPEG")
+    big_md5, small_md5 = compute_md5(big), compute_md5(small)
+
+    path, md5, size = photo_variant(big, big_md5, 1280)
+    assert path != big
+    assert Image.open(path).size == (1280, 853)
+    assert md5 == compute_md5(path) and size == os.path.getsize(path)
+    assert photo_variant(big, big_md5, 1280) == (path, md5, size)
+
+    # Already fits: the original is the variant
+    assert photo_variant(small, small_md5, 1280) == (small, small_md5, os.path.getsize(small))
+
+    assert prune_variants({small_md5}) == 1
+    assert not os.path.exists(path)
+    assert db.get_photo_variant(big_md5, 1280) is None
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
 # ============== notify_photos_changed ==============
 
 def test_notify_photos_changed_sets_flags(tmp_path, monkeypatch):
@@ -0,0 +1,46 @@
+import threading
+
+
+def test_progress_lifecycle():
+    """start/update/finish should round-trip, with idle defaults after."""
+    import progress
+    assert progress.get("job") == progress._idle()
+
+    progress.start("job", total=5, phase="downloading")
+    progress.update("job", completed=2)
+    state = progress.get("job")
+    assert state["running"] is True
+    assert (state["total"], state["completed"], state["phase"]) == (5, 2, "downloading")
+    assert progress.is_running("job")
+
+    progress.finish("job")
+    assert progress.get("job")["running"] is False
+    assert not progress.is_running("job")
+
+
+def test_progress_snapshot_is_a_copy():
+    import progress
+    progress.start("job", total=1)
+    progress.get("job")["completed"] = 99
+    assert progress.get("job")["completed"] == 0
+    progress.finish("job")
+
+
+def test_progress_concurrent_updates():
+    """Updates from many threads shouldn't lose the job or raise."""
+    import progress
+    progress.start("job", total=800)
+
+    def work(offset):
+        for i in range(100):
+            progress.update("job", completed=offset + i)
+            progress.get("job")
+
+    threads = [threading.Thread(target=work, args=(n * 100,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert progress.get("job")["total"] == 800
+    progress.finish("job")
@@ -0,0 +1,72 @@
+def test_admit_bulk_caps_total_and_per_child():
+    import qos
+    assert qos.admit_bulk("a", 3, 2)
+    assert qos.admit_bulk("a", 3, 2)
+    assert not qos.admit_bulk("a", 3, 2)  # per-child cap
+    assert qos.admit_bulk("b", 3, 2)
+    assert not qos.admit_bulk("c", 3, 2)  # total cap
+    assert qos.bulk_in_flight() == {"a": 2, "b": 1}
+
+    for child in ("a", "a", "b"):
+        qos.end_bulk(child)
+    assert qos.bulk_in_flight() == {}
+
+
+def test_interactive_lane_limits_bulk_to_one():
+    import qos
+    qos.begin_interactive()
+    try:
+        assert qos.interactive_busy()
+        assert qos.admit_bulk("a", 6, 4)
+        assert not qos.admit_bulk("b", 6, 4)
+    finally:
+        qos.end_interactive()
+        qos.end_bulk("a")
+    assert not qos.interactive_busy()
+
+
+def test_is_interactive():
+    import qos
+    assert qos.is_interactive("/upload")
+    assert qos.is_interactive("/admin/sync_status")
+    assert qos.is_interactive("/slideshow")
+    assert not qos.is_interactive("/sync/photo/a.jpg")
+
+
+def test_token_bucket_paces_to_rate(monkeypatch):
+    """Sleeps add up to bytes / rate once the one-second burst is spent."""
+    import qos
+    clock = [100.0]
+    slept = []
+    monkeypatch.setattr(qos.time, "monotonic", lambda: clock[0])
+
+    def sleep(s):
+        slept.append(s)
+        clock[0] += s
+    monkeypatch.setattr(qos.time, "sleep", sleep)
+
+    bucket = qos.TokenBucket()
+    for _ in range(10):
+        bucket.consume(1000, 1000)
+    assert abs(sum(slept) - 10.0) < 0.01
+
+    slept.clear()
+    bucket.consume(10 ** 9, 0)  # unlimited
+    assert slept == []
+
+
+def test_paced_slows_while_interactive(monkeypatch):
+    import config
+    import qos
+    rates = []
+    monkeypatch.setattr(qos._bucket, "consume", lambda n, rate: rates.append(rate))
+
+    assert list(qos.paced([b"ab", b"cd"], 0)) == [b"ab", b"cd"]
+    qos.begin_interactive()
+    try:
+        list(qos.paced([b"ef"], 0))
+        list(qos.paced([b"gh"], 10 * 1024 * 1024))
+    finally:
+        qos.end_interactive()
+    yield_rate = config.QOS_YIELD_KBPS * 1024
+    assert rates == [0, 0, yield_rate, yield_rate]
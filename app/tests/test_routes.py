@@ -125,17 +125,17 @@ def test_download_status_default(app_client):
 
 
 def test_download_status_during_download(app_client):
-    """Should reflect download progress from DB settings."""
-    import db
-    db.set_setting("downloading", True)
-    db.set_setting("download_total", 10)
-    db.set_setting("download_completed", 3)
+    """Should reflect download progress from the progress registry."""
+    import progress
+    progress.start("picker_download", total=10)
+    progress.update("picker_download", completed=3)
 
     resp = app_client.get("/admin/download_status")
     data = resp.get_json()
     assert data["downloading"] is True
     assert data["download_total"] == 10
     assert data["download_completed"] == 3
+    progress.finish("picker_download")
 
 
 def test_done_redirects_to_admin(app_client):
@@ -179,3 +179,15 @@ def test_get_next_photos_sequential(app_client, monkeypatch):
     resp = app_client.get("/get_next_photos?count=2")
     data = resp.get_json()
     assert len(data) == 2
+
+
+def test_admin_db_stats(app_client):
+    resp = app_client.get("/admin/db_stats")
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["storage"]["page_count"] > 0
+    assert "wal_bytes" in data["storage"]
+
+    resp = app_client.post("/admin/db_maintenance")
+    assert resp.get_json()["success"] is True
+    assert app_client.get("/admin/db_stats").get_json()["last_maintenance"] is not None
@@ -15,14 +15,42 @@ def _init_test_db(monkeypatch, tmp_path):
     return db
 
 
+class _PhotoResp:
+    """Minimal streamed response for mocked /sync/photo downloads."""
+    def __init__(self, status_code, content=b""):
+        self.status_code = status_code
+        self.content = content
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+
+
+def _patch_master(monkeypatch, handler, bundle_handler=None, report_handler=None):
+    """Route the sync cycle's HTTP session through handler(url, **kwargs).
+
+    POSTs to /sync/bundle go to bundle_handler and to /sync/report to
+    report_handler; without one the mocked master answers 404, as a
+    master without that endpoint would.
+    """
+    def post(self, url, **kwargs):
+        target = bundle_handler if "/sync/bundle" in url else report_handler
+        return (target or (lambda u, **k: _PhotoResp(404)))(url, **kwargs)
+
+    monkeypatch.setattr("routes.sync_routes.requests.Session.get",
+                        lambda self, url, **kwargs: handler(url, **kwargs))
+    monkeypatch.setattr("routes.sync_routes.requests.Session.post", post)
+
+
 @pytest.fixture
 def sync_master_client(app_client):
     """App client configured as master with one child token."""
     import db
     db.set_setting("sync_role", "master")
-    db.set_setting("sync_children", [
-        {"label": "Gramma", "token": "test-child-token-123"}
-    ])
+    db.add_sync_child("Gramma", "test-child-token-123")
     return app_client
 
 
@@ -161,6 +189,50 @@ def test_photo_download_rejects_thumbs(master_with_photos):
     assert resp.status_code == 403
 
 
+def test_photo_download_honours_range(master_with_photos):
+    """Range requests guarded by the photo's md5 should get a 206 tail."""
+    import db
+    md5 = db.get_photo("test_0.jpg")["md5"]
+    full = master_with_photos.get("/sync/photo/picker/test_0.jpg?token=test-child-token-123")
+    assert full.headers["ETag"] == f'"{md5}"'
+
+    resp = master_with_photos.get("/sync/photo/picker/test_0.jpg?token=test-child-token-123",
+                                  headers={"Range": "bytes=10-", "If-Range": f'"{md5}"'})
+    assert resp.status_code == 206
+    assert resp.data == full.data[10:]
+
+    # A stale validator means the file changed: send it all again
+    resp = master_with_photos.get("/sync/photo/picker/test_0.jpg?token=test-child-token-123",
+                                  headers={"Range": "bytes=10-", "If-Range": '"stale"'})
+    assert resp.status_code == 200
+    assert resp.data == full.data
+
+
+def test_bundle_streams_requested_photos(master_with_photos):
+    """Bundle should tar the requested photos and skip off-limits/missing ones."""
+    import io
+    import tarfile
+    import config
+    resp = master_with_photos.post("/sync/bundle", json={
+        "token": "test-child-token-123",
+        "paths": ["picker/test_0.jpg", "picker/test_2.jpg", "picker/nope.jpg",
+                  "thumbs/thumb.jpg", "../../etc/passwd"],
+    })
+    assert resp.status_code == 200
+    with tarfile.open(fileobj=io.BytesIO(resp.data), mode="r|") as tar:
+        members = {m.name: tar.extractfile(m).read() for m in tar}
+    assert set(members) == {"picker/test_0.jpg", "picker/test_2.jpg"}
+    with open(os.path.join(config.PHOTOS_DIR, "picker", "test_2.jpg"), "rb") as f:
+        assert members["picker/test_2.jpg"] == f.read()
+
+
+def test_bundle_requires_token(master_with_photos):
+    """Bundle endpoint should reject unknown tokens."""
+    resp = master_with_photos.post("/sync/bundle", json={
+        "token": "wrong", "paths": ["picker/test_0.jpg"]})
+    assert resp.status_code == 403
+
+
 # ============== MASTER ADMIN TESTS ==============
 
 def test_add_child_frame(sync_master_client):
@@ -190,7 +262,7 @@ def test_add_child_requires_label(sync_master_client):
 def test_remove_child_frame(sync_master_client):
     """Should remove child by token."""
     import db
-    assert len(db.get_setting("sync_children")) == 1
+    assert len(db.get_sync_children()) == 1
 
     resp = sync_master_client.post(
         "/admin/sync_remove_child",
@@ -199,7 +271,7 @@ def test_remove_child_frame(sync_master_client):
     )
     data = resp.get_json()
     assert data["success"] is True
-    assert len(db.get_setting("sync_children")) == 0
+    assert len(db.get_sync_children()) == 0
 
 
 def test_list_children(sync_master_client):
@@ -210,6 +282,65 @@ def test_list_children(sync_master_client):
     assert data[0]["label"] == "Gramma"
 
 
+def test_removed_child_token_rejected(sync_master_client):
+    """Token cache must drop a child as soon as it's removed."""
+    assert sync_master_client.get(
+        "/sync/manifest?token=test-child-token-123").status_code == 200
+
+    sync_master_client.post("/admin/sync_remove_child", json={"token": "test-child-token-123"})
+    assert sync_master_client.get(
+        "/sync/manifest?token=test-child-token-123").status_code == 403
+
+    token = sync_master_client.post(
+        "/admin/sync_add_child", json={"label": "Dad"}).get_json()["child"]["token"]
+    data = sync_master_client.get(f"/sync/manifest?token={token}").get_json()
+    assert data["your_label"] == "Dad"
+
+
+def test_sync_children_setting_migrates_to_table(tmp_path, monkeypatch):
+    """Children stored in the old JSON setting move into the table on init."""
+    db = _init_test_db(monkeypatch, tmp_path)
+    db.set_setting("sync_children", [{"label": "Gramma", "token": "tok-a"},
+                                     {"label": "Dad", "token": "tok-b"}])
+    db.init_db()
+
+    assert db.get_sync_children() == [{"label": "Gramma", "token": "tok-a"},
+                                      {"label": "Dad", "token": "tok-b"}]
+    assert db.get_setting("sync_children") is None
+    assert db.get_sync_child_label("tok-b") == "Dad"
+    assert db.get_sync_child_label("nope") is None
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_json_sync_children_authenticate_on_first_boot(tmp_path, monkeypatch):
+    """Children in device_state.json land in the table during the JSON import."""
+    import json
+    state_file = tmp_path / "device_state.json"
+    state_file.write_text(json.dumps({
+        "sync_role": "master",
+        "sync_children": [{"label": "Gramma", "token": "tok-a"}],
+    }))
+    monkeypatch.setenv("INSTAPI_STATE_FILE", str(state_file))
+    db = _init_test_db(monkeypatch, tmp_path)
+    # Keep the import away from the real slideshow_config.json
+    monkeypatch.setattr(db, "__file__", str(tmp_path / "db.py"))
+    photos_dir = tmp_path / "photos"
+    photos_dir.mkdir()
+
+    assert db.migrate_from_json(str(photos_dir)) is True
+
+    assert db.get_sync_child_label("tok-a") == "Gramma"
+    assert db.get_setting("sync_children") is None
+    assert db.get_setting("sync_role") == "master"
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
 # ============== CHILD TESTS ==============
 
 def test_sync_config_saves_role(app_client):
@@ -292,10 +423,12 @@ def test_sync_downloads_new_photos(monkeypatch, tmp_path):
     db.set_setting("sync_token", "tok123")
 
     photo_content = b"\xff\xd8\xff\xe0" + b"\x00" * 200
+    photo_md5 = hashlib.md5(photo_content).hexdigest()
 
     class MockResp:
         def __init__(self, status_code, data=None, content=None):
             self.status_code = status_code
+            self.headers = {}
             self._data = data
             self.content = content or b""
         def json(self):
@@ -305,17 +438,17 @@ def test_sync_downloads_new_photos(monkeypatch, tmp_path):
         if "/sync/manifest" in url:
             return MockResp(200, data={
                 "photos": [
-                    {"path": "upload/photo_1.jpg", "size": 204, "md5": "abc123"},
-                    {"path": "upload/photo_2.jpg", "size": 204, "md5": "def456"},
+                    {"path": "upload/photo_1.jpg", "size": 204, "md5": photo_md5},
+                    {"path": "upload/photo_2.jpg", "size": 204, "md5": photo_md5},
                 ],
                 "photo_count": 2,
                 "timestamp": 1000
             })
         elif "/sync/photo/" in url:
-            return MockResp(200, content=photo_content)
+            return _PhotoResp(200, photo_content)
         return MockResp(404)
 
-    monkeypatch.setattr("routes.sync_routes.requests.get", mock_get)
+    _patch_master(monkeypatch, mock_get)
     monkeypatch.setattr(sr, "sync_photos_to_usb", lambda: None)
     monkeypatch.setattr(sr, "get_display_mode", lambda: "hdmi")
 
@@ -357,6 +490,7 @@ def test_sync_deletes_removed_photos(monkeypatch, tmp_path):
     class MockResp:
         def __init__(self, status_code, data=None):
             self.status_code = status_code
+            self.headers = {}
             self._data = data
         def json(self):
             return self._data
@@ -366,7 +500,7 @@ def test_sync_deletes_removed_photos(monkeypatch, tmp_path):
             return MockResp(200, data={"photos": [], "photo_count": 0, "timestamp": 1000})
         return MockResp(404)
 
-    monkeypatch.setattr("routes.sync_routes.requests.get", mock_get)
+    _patch_master(monkeypatch, mock_get)
     monkeypatch.setattr(sr, "sync_photos_to_usb", lambda: None)
     monkeypatch.setattr(sr, "get_display_mode", lambda: "hdmi")
 
@@ -406,6 +540,7 @@ def test_sync_skips_existing_photos(monkeypatch, tmp_path):
     class MockResp:
         def __init__(self, status_code, data=None, content=None):
             self.status_code = status_code
+            self.headers = {}
             self._data = data
             self.content = content or b""
         def json(self):
@@ -419,10 +554,10 @@ def test_sync_skips_existing_photos(monkeypatch, tmp_path):
             })
         elif "/sync/photo/" in url:
             download_calls.append(url)
-            return MockResp(200, content=content)
+            return _PhotoResp(200, content)
         return MockResp(404)
 
-    monkeypatch.setattr("routes.sync_routes.requests.get", mock_get)
+    _patch_master(monkeypatch, mock_get)
     monkeypatch.setattr(sr, "sync_photos_to_usb", lambda: None)
     monkeypatch.setattr(sr, "get_display_mode", lambda: "hdmi")
 
@@ -453,7 +588,7 @@ def test_sync_handles_master_unreachable(monkeypatch, tmp_path):
     def mock_get(url, **kwargs):
         raise req.ConnectionError("Connection refused")
 
-    monkeypatch.setattr("routes.sync_routes.requests.get", mock_get)
+    _patch_master(monkeypatch, mock_get)
 
     sr.run_sync_cycle()
 
@@ -482,6 +617,7 @@ def test_sync_handles_disk_full(monkeypatch, tmp_path):
     class MockResp:
         def __init__(self, status_code, data=None):
             self.status_code = status_code
+            self.headers = {}
             self._data = data
         def json(self):
             return self._data
@@ -494,7 +630,7 @@ def test_sync_handles_disk_full(monkeypatch, tmp_path):
             })
         return MockResp(404)
 
-    monkeypatch.setattr("routes.sync_routes.requests.get", mock_get)
+    _patch_master(monkeypatch, mock_get)
 
     import collections
     DiskUsage = collections.namedtuple('DiskUsage', ['total', 'used', 'free'])
@@ -525,10 +661,12 @@ def test_sync_preserves_subdirs(monkeypatch, tmp_path):
     db.set_setting("sync_token", "tok123")
 
     photo_content = b"\xff\xd8\xff\xe0" + b"\x00" * 100
+    photo_md5 = hashlib.md5(photo_content).hexdigest()
 
     class MockResp:
         def __init__(self, status_code, data=None, content=None):
             self.status_code = status_code
+            self.headers = {}
             self._data = data
             self.content = content or b""
         def json(self):
@@ -538,16 +676,16 @@ def test_sync_preserves_subdirs(monkeypatch, tmp_path):
         if "/sync/manifest" in url:
             return MockResp(200, data={
                 "photos": [
-                    {"path": "picker/from_picker.jpg", "size": 104, "md5": "aaa"},
-                    {"path": "upload/from_upload.jpg", "size": 104, "md5": "bbb"},
+                    {"path": "picker/from_picker.jpg", "size": 104, "md5": photo_md5},
+                    {"path": "upload/from_upload.jpg", "size": 104, "md5": photo_md5},
                 ],
                 "photo_count": 2, "timestamp": 1000
             })
         elif "/sync/photo/" in url:
-            return MockResp(200, content=photo_content)
+            return _PhotoResp(200, photo_content)
         return MockResp(404)
 
-    monkeypatch.setattr("routes.sync_routes.requests.get", mock_get)
+    _patch_master(monkeypatch, mock_get)
     monkeypatch.setattr(sr, "sync_photos_to_usb", lambda: None)
     monkeypatch.setattr(sr, "get_display_mode", lambda: "hdmi")
 
@@ -561,6 +699,207 @@ def test_sync_preserves_subdirs(monkeypatch, tmp_path):
         db._local.conn = None
 
 
+def test_sync_downloads_in_parallel_within_limit(monkeypatch, tmp_path):
+    """Downloads should overlap but never exceed sync_concurrency in flight."""
+    import threading
+    import time
+    import config
+    import routes.sync_routes as sr
+    db = _init_test_db(monkeypatch, tmp_path)
+
+    photos_dir = str(tmp_path / "photos")
+    os.makedirs(photos_dir, exist_ok=True)
+    monkeypatch.setattr(config, "PHOTOS_DIR", photos_dir)
+
+    db.set_setting("sync_role", "child")
+    db.set_setting("master_url", "https://master.test")
+    db.set_setting("sync_token", "tok123")
+    db.set_setting("sync_concurrency", 3)
+
+    photo_content = b"\xff\xd8\xff\xe0" + b"\x00" * 100
+    photo_md5 = hashlib.md5(photo_content).hexdigest()
+    lock = threading.Lock()
+    active = [0]
+    peak = [0]
+
+    class MockResp:
+        def __init__(self, status_code, data=None, content=None):
+            self.status_code = status_code
+            self.headers = {}
+            self._data = data
+            self.content = content or b""
+        def json(self):
+            return self._data
+
+    def mock_get(url, **kwargs):
+        if "/sync/manifest" in url:
+            return MockResp(200, data={
+                "photos": [{"path": f"upload/p{i}.jpg", "size": 104, "md5": photo_md5}
+                           for i in range(12)],
+                "photo_count": 12, "timestamp": 1000
+            })
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return _PhotoResp(200, photo_content)
+
+    _patch_master(monkeypatch, mock_get)
+    monkeypatch.setattr(sr, "sync_photos_to_usb", lambda: None)
+    monkeypatch.setattr(sr, "get_display_mode", lambda: "hdmi")
+
+    sr.run_sync_cycle()
+
+    assert 1 < peak[0] <= 3
+    assert db.get_setting("last_sync_result") == "success"
+    assert db.get_last_sync()["photos_added"] == 12
+    assert db.get_photo("p0.jpg")["subdir"] == "sync/upload"
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_sync_retries_md5_mismatch(monkeypatch, tmp_path):
+    """A corrupted transfer should be retried and only the verified copy kept."""
+    import config
+    import routes.sync_routes as sr
+    db = _init_test_db(monkeypatch, tmp_path)
+
+    photos_dir = str(tmp_path / "photos")
+    os.makedirs(photos_dir, exist_ok=True)
+    monkeypatch.setattr(config, "PHOTOS_DIR", photos_dir)
+
+    db.set_setting("sync_role", "child")
+    db.set_setting("master_url", "https://master.test")
+    db.set_setting("sync_token", "tok123")
+
+    good = b"\xff\xd8\xff\xe0" + b"good" * 50
+    responses = [good[:20], good]  # first attempt truncated
+
+    class MockResp:
+        def __init__(self, status_code, data=None):
+            self.status_code = status_code
+            self.headers = {}
+            self._data = data
+        def json(self):
+            return self._data
+
+    def mock_get(url, **kwargs):
+        if "/sync/manifest" in url:
+            return MockResp(200, data={
+                "photos": [{"path": "upload/a.jpg", "size": len(good),
+                            "md5": hashlib.md5(good).hexdigest()}],
+                "photo_count": 1, "timestamp": 1000
+            })
+        return _PhotoResp(200, responses.pop(0))
+
+    _patch_master(monkeypatch, mock_get)
+    monkeypatch.setattr(sr, "sync_photos_to_usb", lambda: None)
+    monkeypatch.setattr(sr, "get_display_mode", lambda: "hdmi")
+
+    sr.run_sync_cycle()
+
+    dest = os.path.join(photos_dir, "sync", "upload", "a.jpg")
+    with open(dest, "rb") as f:
+        assert f.read() == good
+    assert not os.path.exists(dest + ".part")
+    assert db.get_photo("a.jpg")["md5"] == hashlib.md5(good).hexdigest()
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_sync_discards_persistent_md5_mismatch(monkeypatch, tmp_path):
+    """A photo that never matches the manifest md5 should not be stored."""
+    import config
+    import routes.sync_routes as sr
+    db = _init_test_db(monkeypatch, tmp_path)
+
+    photos_dir = str(tmp_path / "photos")
+    os.makedirs(photos_dir, exist_ok=True)
+    monkeypatch.setattr(config, "PHOTOS_DIR", photos_dir)
+
+    db.set_setting("sync_role", "child")
+    db.set_setting("master_url", "https://master.test")
+    db.set_setting("sync_token", "tok123")
+
+    attempts = []
+
+    class MockResp:
+        def __init__(self, status_code, data=None):
+            self.status_code = status_code
+            self.headers = {}
+            self._data = data
+        def json(self):
+            return self._data
+
+    def mock_get(url, **kwargs):
+        if "/sync/manifest" in url:
+            return MockResp(200, data={
+                "photos": [{"path": "upload/bad.jpg", "size": 10, "md5": "0" * 32}],
+                "photo_count": 1, "version": 3, "timestamp": 1000
+            })
+        attempts.append(url)
+        return _PhotoResp(200, b"\xff\xd8\xff\xe0corrupt")
+
+    _patch_master(monkeypatch, mock_get)
+    monkeypatch.setattr(sr, "sync_photos_to_usb", lambda: None)
+    monkeypatch.setattr(sr, "get_display_mode", lambda: "hdmi")
+
+    sr.run_sync_cycle()
+
+    dest = os.path.join(photos_dir, "sync", "upload", "bad.jpg")
+    assert len(attempts) == config.SYNC_DOWNLOAD_ATTEMPTS
+    assert not os.path.exists(dest)
+    assert not os.path.exists(dest + ".part")
+    assert db.get_photo("bad.jpg") is None
+    # Not current: retried with backoff rather than treated as a success
+    assert db.get_setting("last_sync_result") == "error"
+    assert db.get_setting("sync_manifest_version") is None
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_sync_config_clamps_concurrency(sync_child_client, monkeypatch):
+    """sync_concurrency should be saved and clamped to the allowed range."""
+    import db
+    import routes.sync_routes as sr
+    monkeypatch.setattr(sr, "start_sync_loop", lambda: None)
+
+    resp = sync_child_client.post(
+        "/admin/sync_config",
+        json={"sync_role": "child", "sync_concurrency": 50},
+        content_type="application/json"
+    )
+    assert resp.get_json()["success"] is True
+    assert db.get_setting("sync_concurrency") == 8
+
+
+def test_sync_config_sets_display_resolution(sync_child_client, monkeypatch):
+    """sync_max_dim must be a rendered size, and changing it forces a full diff."""
+    import db
+    import routes.sync_routes as sr
+    monkeypatch.setattr(sr, "start_sync_loop", lambda: None)
+    db.set_setting("sync_manifest_version", 5)
+
+    resp = sync_child_client.post("/admin/sync_config",
+                                  json={"sync_role": "child", "sync_max_dim": 1000})
+    assert resp.get_json()["success"] is False
+
+    resp = sync_child_client.post("/admin/sync_config",
+                                  json={"sync_role": "child", "sync_max_dim": 1280})
+    assert resp.get_json()["success"] is True
+    assert db.get_setting("sync_max_dim") == 1280
+    assert db.get_setting("sync_manifest_version") is None
+    assert sync_child_client.get("/admin/sync_status").get_json()["sync_max_dim"] == 1280
+
+
 # ============== DB SETTINGS TESTS ==============
 
 def test_sync_settings_round_trip(tmp_path, monkeypatch):
@@ -576,3 +915,1743 @@ def test_sync_settings_round_trip(tmp_path, monkeypatch):
     if hasattr(db._local, 'conn') and db._local.conn is not None:
         db._local.conn.close()
         db._local.conn = None
+
+
+# ============== DELTA SYNC TESTS ==============
+
+def test_photo_changes_journal(tmp_path, monkeypatch):
+    """Adds, deletes and metadata changes should be journaled, collapsed per file."""
+    db = _init_test_db(monkeypatch, tmp_path)
+
+    assert db.get_photo_version() == 0
+    db.add_photo("a.jpg", subdir="upload", md5="aaa", size_bytes=10)
+    db.add_photo("b.jpg", subdir="upload", md5="bbb", size_bytes=10)
+    v = db.get_photo_version()
+    db.add_photo("a.jpg", subdir="upload", md5="aaa", size_bytes=10)  # no-op
+    assert db.get_photo_version() == v
+    db.add_photo("a.jpg", subdir="upload", md5="aaa", size_bytes=20)  # meta
+    db.remove_photo("b.jpg")
+
+    changes = db.get_photo_changes(v)
+    assert [(c["filename"], c["op"]) for c in changes] == [("a.jpg", "meta"), ("b.jpg", "delete")]
+    assert db.get_photo_changes(db.get_photo_version()) == []
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_set_upload_meta_writes_only_changes(tmp_path, monkeypatch):
+    """Bulk uploader apply should touch only rows whose uploader differs."""
+    db = _init_test_db(monkeypatch, tmp_path)
+    db.add_photo("a.jpg", subdir="sync/upload", uploaded_by="", md5="aaa")
+    db.add_photo("b.jpg", subdir="sync/upload", uploaded_by="Gramma", md5="bbb")
+    version = db.get_photo_version()
+
+    meta = {"a.jpg": "Grampa", "b.jpg": "Gramma", "gone.jpg": "Aunt Sue"}
+    assert db.set_upload_meta(meta) == 1
+    assert db.get_photo("a.jpg")["uploaded_by"] == "Grampa"
+    assert db.get_photo("b.jpg")["uploaded_by"] == "Gramma"
+    assert db.get_photo("gone.jpg") is None
+    assert [(c["filename"], c["op"]) for c in db.get_photo_changes(version)] == [("a.jpg", "meta")]
+
+    # Nothing left to change: no writes at all
+    changes_before = db.get_db().total_changes
+    assert db.set_upload_meta(meta) == 0
+    assert db.get_db().total_changes == changes_before
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_photo_changes_compacted_returns_none(tmp_path, monkeypatch):
+    """Asking for changes older than the compacted journal needs a full manifest."""
+    db = _init_test_db(monkeypatch, tmp_path)
+    db.add_photo("a.jpg", subdir="upload", md5="aaa")
+    db.clear_all_photos()
+
+    assert db.get_photo_changes(0) is None
+    assert db.get_photo_changes(db.get_photo_version()) == []
+    assert db.get_photo_changes(db.get_photo_version() + 5) is None
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_manifest_since_returns_delta(master_with_photos):
+    """?since=<version> should return only the changes after that version."""
+    import db
+    full = master_with_photos.get("/sync/manifest?token=test-child-token-123").get_json()
+    version = full["version"]
+
+    db.add_photo("new.jpg", subdir="upload", uploaded_by="Gramma", md5="nnn", size_bytes=5)
+    db.remove_photo("test_0.jpg")
+
+    resp = master_with_photos.get(f"/sync/manifest?token=test-child-token-123&since={version}")
+    data = resp.get_json()
+    assert data["delta"] is True
+    assert data["version"] > version
+    assert data["your_label"] == "Gramma"
+    ops = {c["path"]: c["op"] for c in data["changes"]}
+    assert ops == {"upload/new.jpg": "add", "picker/test_0.jpg": "delete"}
+
+
+def test_manifest_since_compacted_falls_back_to_full(master_with_photos):
+    """A version older than the journal floor should get the full manifest."""
+    import db
+    db.get_db().execute("DELETE FROM photo_changes")
+    db.get_db().commit()
+
+    data = master_with_photos.get("/sync/manifest?token=test-child-token-123&since=0").get_json()
+    assert "delta" not in data
+    assert data["photo_count"] == 3
+
+
+def test_sync_applies_delta(monkeypatch, tmp_path):
+    """A child with a stored version should apply the master's delta only."""
+    import config
+    import routes.sync_routes as sr
+    db = _init_test_db(monkeypatch, tmp_path)
+
+    photos_dir = str(tmp_path / "photos")
+    sync_dir = os.path.join(photos_dir, "sync", "upload")
+    os.makedirs(sync_dir, exist_ok=True)
+    monkeypatch.setattr(config, "PHOTOS_DIR", photos_dir)
+
+    old_content = b"\xff\xd8\xff\xe0" + b"old" * 10
+    with open(os.path.join(sync_dir, "old.jpg"), "wb") as f:
+        f.write(old_content)
+    db.add_photo("old.jpg", subdir="sync/upload", md5=hashlib.md5(old_content).hexdigest())
+    keep_content = b"\xff\xd8\xff\xe0" + b"keep" * 10
+    with open(os.path.join(sync_dir, "keep.jpg"), "wb") as f:
+        f.write(keep_content)
+    db.add_photo("keep.jpg", subdir="sync/upload", md5=hashlib.md5(keep_content).hexdigest())
+
+    db.set_setting("sync_role", "child")
+    db.set_setting("master_url", "https://master.test")
+    db.set_setting("sync_token", "tok123")
+    db.set_setting("sync_manifest_version", 7)
+
+    new_content = b"\xff\xd8\xff\xe0" + b"new" * 10
+    seen_params = []
+
+    class MockResp:
+        def __init__(self, status_code, data=None):
+            self.status_code = status_code
+            self.headers = {}
+            self._data = data
+        def json(self):
+            return self._data
+
+    def mock_get(url, **kwargs):
+        if "/sync/manifest" in url:
+            seen_params.append(kwargs["params"])
+            return MockResp(200, data={
+                "delta": True, "since": 7, "version": 9, "timestamp": 1000,
+                "changes": [
+                    {"op": "add", "path": "upload/new.jpg", "size": len(new_content),
+                     "md5": hashlib.md5(new_content).hexdigest(), "uploaded_by": "Dad"},
+                    {"op": "delete", "path": "upload/old.jpg", "size": 0,
+                     "md5": "", "uploaded_by": "admin"},
+                ],
+            })
+        return _PhotoResp(200, new_content)
+
+    _patch_master(monkeypatch, mock_get)
+    monkeypatch.setattr(sr, "sync_photos_to_usb", lambda: None)
+    monkeypatch.setattr(sr, "get_display_mode", lambda: "hdmi")
+
+    sr.run_sync_cycle()
+
+    assert seen_params[0]["since"] == 7
+    assert os.path.exists(os.path.join(sync_dir, "new.jpg"))
+    assert not os.path.exists(os.path.join(sync_dir, "old.jpg"))
+    assert os.path.exists(os.path.join(sync_dir, "keep.jpg"))
+    assert db.get_photo("new.jpg")["uploaded_by"] == "Dad"
+    assert db.get_setting("sync_manifest_version") == 9
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+# ============== MANIFEST CACHE TESTS ==============
+
+def test_manifest_etag_not_modified(master_with_photos):
+    """An unchanged manifest should answer If-None-Match with 304."""
+    import db
+    from routes.sync_routes import mark_manifest_dirty
+    resp = master_with_photos.get("/sync/manifest?token=test-child-token-123")
+    etag = resp.headers["ETag"]
+    assert etag
+
+    resp = master_with_photos.get("/sync/manifest?token=test-child-token-123",
+                                  headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+
+    db.add_photo("another.jpg", subdir="upload", md5="xyz")
+    mark_manifest_dirty()
+    resp = master_with_photos.get("/sync/manifest?token=test-child-token-123",
+                                  headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+    assert resp.get_json()["photo_count"] == 4
+
+
+def test_manifest_etag_survives_rebuilds(master_with_photos, monkeypatch):
+    """Rebuilding unchanged content (later, or after a restart) keeps the ETag."""
+    import routes.sync_routes as sr
+    url = "/sync/manifest?token=test-child-token-123"
+    etag = master_with_photos.get(url).headers["ETag"]
+
+    monkeypatch.setattr(sr.time, "time", lambda: 4102444800.0)
+    sr.mark_manifest_dirty()
+    resp = master_with_photos.get(url, headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+
+
+def test_manifest_variants_render_outside_lock(master_with_photos, monkeypatch):
+    """Rendering one child's variants doesn't block other manifest requests."""
+    import routes.sync_routes as sr
+    held = []
+    real = sr._variant_entries
+
+    def variant_entries(entries, max_dim):
+        held.append(sr._manifest_lock.locked())
+        return real(entries, max_dim)
+    monkeypatch.setattr(sr, "_variant_entries", variant_entries)
+
+    resp = master_with_photos.get("/sync/manifest?token=test-child-token-123&max_dim=1280")
+    assert resp.status_code == 200
+    assert held == [False]
+
+
+def test_manifest_served_gzipped(master_with_photos):
+    """Clients accepting gzip should get the pre-compressed manifest."""
+    import gzip
+    import json
+    resp = master_with_photos.get("/sync/manifest?token=test-child-token-123",
+                                  headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    data = json.loads(gzip.decompress(resp.data))
+    assert data["photo_count"] == 3
+    assert data["your_label"] == "Gramma"
+
+
+def test_manifest_rebuild_is_single_flight(master_with_photos, monkeypatch):
+    """Concurrent requests after mark_manifest_dirty should rebuild once."""
+    import threading
+    import time
+    import db
+    import routes.sync_routes as sr
+
+    builds = []
+    real_get_all = db.get_all_photos
+
+    def slow_get_all():
+        builds.append(1)
+        time.sleep(0.05)
+        return real_get_all()
+
+    monkeypatch.setattr(db, "get_all_photos", slow_get_all)
+    sr.mark_manifest_dirty()
+
+    def fetch():
+        # Worker threads need their own connection to the test DB
+        sr._get_manifest()
+        if getattr(db._local, 'conn', None) is not None:
+            db._local.conn.close()
+            db._local.conn = None
+
+    threads = [threading.Thread(target=fetch) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(builds) == 1
+
+
+def test_sync_wait_returns_immediately_when_behind(master_with_photos):
+    """A child behind the journal shouldn't be held at all."""
+    import db
+    version = db.get_photo_version()
+    resp = master_with_photos.get(
+        f"/sync/wait?token=test-child-token-123&version={version - 1}&timeout=30")
+    assert resp.get_json() == {"changed": True, "version": version}
+
+
+def test_sync_wait_times_out_unchanged(master_with_photos):
+    import db
+    version = db.get_photo_version()
+    resp = master_with_photos.get(
+        f"/sync/wait?token=test-child-token-123&version={version}&timeout=0")
+    assert resp.get_json() == {"changed": False, "version": version}
+
+
+def test_sync_wait_rejects_bad_token(master_with_photos):
+    resp = master_with_photos.get("/sync/wait?token=nope&version=0")
+    assert resp.status_code == 403
+
+
+def test_sync_wait_wakes_on_change(master_with_photos):
+    """mark_manifest_dirty() should release a held long-poll right away."""
+    import threading
+    import time
+    import db
+    import routes.sync_routes as sr
+    version = db.get_photo_version()
+
+    def upload():
+        time.sleep(0.1)
+        db.add_photo("late.jpg", subdir="upload", md5="lll", size_bytes=5)
+        sr.mark_manifest_dirty()
+        db._local.conn.close()
+        db._local.conn = None
+
+    t = threading.Thread(target=upload)
+    start = time.time()
+    t.start()
+    resp = master_with_photos.get(
+        f"/sync/wait?token=test-child-token-123&version={version}&timeout=30")
+    t.join()
+
+    assert resp.get_json() == {"changed": True, "version": version + 1}
+    assert time.time() - start < 5
+
+
+def test_child_wait_for_master_change(monkeypatch, tmp_path):
+    """The child returns as soon as the master reports a change, and falls
+    back to plain interval sleeping when there's no version to wait on."""
+    import threading
+    import config
+    import routes.sync_routes as sr
+    db = _init_test_db(monkeypatch, tmp_path)
+    db.set_setting("master_url", "http://master:5000")
+    db.set_setting("sync_token", "tok")
+    monkeypatch.setattr(config, "SYNC_WAIT_SETTLE", 0)
+    monkeypatch.setattr(config, "SYNC_WAKE_SPREAD", 0)
+
+    calls = []
+
+    class MockResp:
+        status_code = 200
+
+        def json(self):
+            return {"changed": True, "version": 8}
+
+    def mock_get(url, params=None, timeout=None):
+        calls.append(params)
+        return MockResp()
+
+    monkeypatch.setattr(sr.requests, "get", mock_get)
+
+    # No applied version yet: nothing to long-poll on
+    assert sr._wait_for_master_change(threading.Event(), 0.05) is False
+    assert calls == []
+
+    db.set_setting("sync_manifest_version", 7)
+    assert sr._wait_for_master_change(threading.Event(), 1800) is True
+    assert calls[0]["version"] == 7
+    assert calls[0]["timeout"] == config.SYNC_WAIT_TIMEOUT
+
+    # A 200 that isn't JSON (a proxy's page) falls back to the interval
+    def not_json(self):
+        raise ValueError("Expecting value")
+    monkeypatch.setattr(MockResp, "json", not_json)
+    assert sr._wait_for_master_change(threading.Event(), 0.05) is False
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_sync_skips_diff_on_not_modified(monkeypatch, tmp_path):
+    """A 304 manifest should end the cycle successfully without any diffing."""
+    import config
+    import routes.sync_routes as sr
+    db = _init_test_db(monkeypatch, tmp_path)
+
+    photos_dir = str(tmp_path / "photos")
+    os.makedirs(photos_dir, exist_ok=True)
+    monkeypatch.setattr(config, "PHOTOS_DIR", photos_dir)
+
+    db.set_setting("sync_role", "child")
+    db.set_setting("master_url", "https://master.test")
+    db.set_setting("sync_token", "tok123")
+    db.set_setting("sync_manifest_version", 4)
+    db.set_setting("sync_manifest_etag", '"v4"')
+
+    sent_headers = []
+
+    class MockResp:
+        def __init__(self, status_code):
+            self.status_code = status_code
+            self.headers = {}
+
+    def mock_get(url, **kwargs):
+        sent_headers.append(kwargs.get("headers", {}))
+        return MockResp(304)
+
+    _patch_master(monkeypatch, mock_get)
+    monkeypatch.setattr(sr, "_build_local_manifest",
+                        lambda: pytest.fail("diff should be skipped on 304"))
+
+    sr.run_sync_cycle()
+
+    assert sent_headers[0]["If-None-Match"] == '"v4"'
+    assert db.get_setting("last_sync_result") == "success"
+    assert db.get_setting("sync_manifest_version") == 4
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+# ============== BUNDLE SYNC TESTS ==============
+
+def test_sync_downloads_via_bundle(monkeypatch, tmp_path):
+    """Child should fetch photos in bundles and retry bad members one by one."""
+    import io
+    import tarfile
+    import config
+    import routes.sync_routes as sr
+    db = _init_test_db(monkeypatch, tmp_path)
+
+    photos_dir = str(tmp_path / "photos")
+    os.makedirs(photos_dir, exist_ok=True)
+    monkeypatch.setattr(config, "PHOTOS_DIR", photos_dir)
+
+    db.set_setting("sync_role", "child")
+    db.set_setting("master_url", "https://master.test")
+    db.set_setting("sync_token", "tok123")
+    db.set_setting("sync_concurrency", 1)
+
+    contents = {f"upload/p{i}.jpg": b"\xff\xd8\xff\xe0" + bytes([i]) * 700 for i in range(5)}
+    bundles = []
+    singles = []
+
+    class MockResp:
+        def __init__(self, status_code, data=None):
+            self.status_code = status_code
+            self.headers = {}
+            self._data = data
+        def json(self):
+            return self._data
+
+    def mock_get(url, **kwargs):
+        if "/sync/manifest" in url:
+            return MockResp(200, data={
+                "photos": [{"path": p, "size": len(c), "md5": hashlib.md5(c).hexdigest()}
+                           for p, c in contents.items()],
+                "photo_count": len(contents), "timestamp": 1000
+            })
+        path = url.split("/sync/photo/", 1)[1]
+        singles.append(path)
+        return _PhotoResp(200, contents[path])
+
+    def mock_bundle(url, **kwargs):
+        paths = kwargs["json"]["paths"]
+        bundles.append(paths)
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w") as tar:
+            for p in paths:
+                data = contents[p] if p != "upload/p3.jpg" else b"corrupted"
+                info = tarfile.TarInfo(p)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        return _PhotoResp(200, buf.getvalue())
+
+    _patch_master(monkeypatch, mock_get, mock_bundle)
+    monkeypatch.setattr(sr, "sync_photos_to_usb", lambda: None)
+    monkeypatch.setattr(sr, "get_display_mode", lambda: "hdmi")
+
+    sr.run_sync_cycle()
+
+    assert bundles == [list(contents)]
+    assert singles == ["upload/p3.jpg"]
+    for path, content in contents.items():
+        with open(os.path.join(photos_dir, "sync", path), "rb") as f:
+            assert f.read() == content
+    assert db.get_last_sync()["photos_added"] == 5
+    assert db.get_setting("sync_manifest_version") is None  # no version in mock manifest
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+# ============== RESUMABLE DOWNLOAD TESTS ==============
+
+def test_sync_resumes_partial_download(monkeypatch, tmp_path):
+    """An interrupted download should be resumed with Range on the next cycle."""
+    import config
+    import requests as req
+    import routes.sync_routes as sr
+    db = _init_test_db(monkeypatch, tmp_path)
+
+    photos_dir = str(tmp_path / "photos")
+    os.makedirs(photos_dir, exist_ok=True)
+    monkeypatch.setattr(config, "PHOTOS_DIR", photos_dir)
+
+    db.set_setting("sync_role", "child")
+    db.set_setting("master_url", "https://master.test")
+    db.set_setting("sync_token", "tok123")
+
+    content = b"\xff\xd8\xff\xe0" + os.urandom(1000)
+    md5 = hashlib.md5(content).hexdigest()
+    requests_seen = []
+
+    class MockResp:
+        def __init__(self, status_code, data=None):
+            self.status_code = status_code
+            self.headers = {}
+            self._data = data
+        def json(self):
+            return self._data
+
+    class DroppedResp(_PhotoResp):
+        def iter_content(self, chunk_size=1):
+            yield self.content[:400]
+            raise req.ConnectionError("WiFi dropped")
+
+    def mock_get(url, **kwargs):
+        if "/sync/manifest" in url:
+            return MockResp(200, data={
+                "photos": [{"path": "upload/big.jpg", "size": len(content), "md5": md5}],
+                "photo_count": 1, "timestamp": 1000
+            })
+        headers = kwargs.get("headers", {})
+        requests_seen.append(headers)
+        if len(requests_seen) == 1:
+            return DroppedResp(200, content)
+        assert headers["Range"] == "bytes=400-"
+        assert headers["If-Range"] == f'"{md5}"'
+        return _PhotoResp(206, content[400:])
+
+    _patch_master(monkeypatch, mock_get)
+    monkeypatch.setattr(sr, "sync_photos_to_usb", lambda: None)
+    monkeypatch.setattr(sr, "get_display_mode", lambda: "hdmi")
+
+    dest = os.path.join(photos_dir, "sync", "upload", "big.jpg")
+    sr.run_sync_cycle()
+    assert not os.path.exists(dest)
+    assert os.path.getsize(f"{dest}.{md5}.part") == 400
+
+    sr.run_sync_cycle()
+    with open(dest, "rb") as f:
+        assert f.read() == content
+    assert not os.path.exists(f"{dest}.{md5}.part")
+    assert db.get_photo("big.jpg")["md5"] == md5
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_sync_removes_stale_partials(monkeypatch, tmp_path):
+    """Partials for photos no longer in the full manifest should be cleaned up."""
+    import config
+    import routes.sync_routes as sr
+    db = _init_test_db(monkeypatch, tmp_path)
+
+    photos_dir = str(tmp_path / "photos")
+    sync_dir = os.path.join(photos_dir, "sync", "upload")
+    os.makedirs(sync_dir, exist_ok=True)
+    monkeypatch.setattr(config, "PHOTOS_DIR", photos_dir)
+    stale = os.path.join(sync_dir, "gone.jpg.0123.part")
+    with open(stale, "wb") as f:
+        f.write(b"partial")
+
+    db.set_setting("sync_role", "child")
+    db.set_setting("master_url", "https://master.test")
+    db.set_setting("sync_token", "tok123")
+
+    class MockResp:
+        def __init__(self, status_code, data=None):
+            self.status_code = status_code
+            self.headers = {}
+            self._data = data
+        def json(self):
+            return self._data
+
+    _patch_master(monkeypatch, lambda url, **kw: MockResp(200, data={
+        "photos": [], "photo_count": 0, "timestamp": 1000}))
+    monkeypatch.setattr(sr, "sync_photos_to_usb", lambda: None)
+    monkeypatch.setattr(sr, "get_display_mode", lambda: "hdmi")
+
+    sr.run_sync_cycle()
+
+    assert not os.path.exists(stale)
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_sync_links_known_content_instead_of_downloading(monkeypatch, tmp_path):
+    """A manifest MD5 already in the object store is linked, not downloaded."""
+    import config
+    import routes.sync_routes as sr
+    from photo_ops import store_object, object_path
+    db = _init_test_db(monkeypatch, tmp_path)
+
+    photos_dir = str(tmp_path / "photos")
+    monkeypatch.setattr(config, "PHOTOS_DIR", photos_dir)
+    db.set_setting("sync_role", "child")
+    db.set_setting("master_url", "https://master.test")
+    db.set_setting("sync_token", "tok123")
+
+    known = b"\xff\xd8\xff\xe0known" + b"\x00" * 50
+    fresh = b"\xff\xd8\xff\xe0fresh" + b"\x00" * 50
+    known_md5 = hashlib.md5(known).hexdigest()
+    fresh_md5 = hashlib.md5(fresh).hexdigest()
+
+    local = os.path.join(photos_dir, "upload", "mine.jpg")
+    os.makedirs(os.path.dirname(local))
+    with open(local, "wb") as f:
+        f.write(known)
+    store_object(local, known_md5)
+
+    fetched = []
+
+    class MockResp:
+        status_code = 200
+        headers = {}
+
+        def json(self):
+            return {"photos": [
+                {"path": "upload/copy.jpg", "size": len(known), "md5": known_md5},
+                {"path": "upload/new.jpg", "size": len(fresh), "md5": fresh_md5},
+            ], "photo_count": 2, "timestamp": 1000}
+
+    def mock_get(url, **kwargs):
+        if "/sync/manifest" in url:
+            return MockResp()
+        fetched.append(url.rsplit("/", 1)[-1])
+        return _PhotoResp(200, fresh)
+
+    _patch_master(monkeypatch, mock_get)
+    monkeypatch.setattr(sr, "sync_photos_to_usb", lambda: None)
+    monkeypatch.setattr(sr, "get_display_mode", lambda: "hdmi")
+
+    sr.run_sync_cycle()
+
+    sync_dir = os.path.join(photos_dir, "sync", "upload")
+    assert fetched == ["new.jpg"]
+    assert os.path.samefile(os.path.join(sync_dir, "copy.jpg"), local)
+    assert os.path.samefile(os.path.join(sync_dir, "new.jpg"), object_path(fresh_md5))
+    assert db.get_photo("copy.jpg")["md5"] == known_md5
+    assert db.get_setting("last_sync_result") == "success"
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def _add_large_photo(db, config, name="big.jpg", size=(2400, 1600)):
+    """Write a real JPEG larger than the variant sizes to the master's upload/."""
+    from PIL import Image
+    path = os.path.join(config.PHOTOS_DIR, "upload", name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new("RGB", size, (200, 30, 30)).save(path, "JPEG")
+    with open(path, "rb") as f:
+        content = f.read()
+    md5 = hashlib.md5(content).hexdigest()
+    db.add_photo(name, subdir="upload", uploaded_by="admin", size_bytes=len(content), md5=md5)
+    return md5
+
+
+def test_manifest_and_photo_serve_variants(master_with_photos):
+    """?max_dim= lists variant MD5s and /sync/photo serves the matching bytes."""
+    import io
+    import config
+    import db
+    from PIL import Image
+    import routes.sync_routes as sr
+    big_md5 = _add_large_photo(db, config)
+    sr.mark_manifest_dirty()
+
+    data = master_with_photos.get(
+        "/sync/manifest?token=test-child-token-123&max_dim=1280").get_json()
+    assert data["max_dim"] == 1280
+    entries = {p["path"]: p for p in data["photos"]}
+    variant_md5 = entries["upload/big.jpg"]["md5"]
+    assert variant_md5 != big_md5
+    # Photos that can't be (or needn't be) scaled keep their own MD5
+    assert entries["picker/test_0.jpg"]["md5"] == db.get_photo("test_0.jpg")["md5"]
+
+    resp = master_with_photos.get(
+        "/sync/photo/upload/big.jpg?token=test-child-token-123&max_dim=1280")
+    assert resp.status_code == 200
+    assert hashlib.md5(resp.data).hexdigest() == variant_md5
+    assert resp.headers["ETag"] == f'"{variant_md5}"'
+    assert max(Image.open(io.BytesIO(resp.data)).size) == 1280
+
+    # Unsupported sizes fall back to originals
+    resp = master_with_photos.get(
+        "/sync/photo/upload/big.jpg?token=test-child-token-123&max_dim=999")
+    assert hashlib.md5(resp.data).hexdigest() == big_md5
+
+
+def test_manifest_variants_over_budget_returns_503(master_with_photos, monkeypatch):
+    """Rendering past the inline budget hands off to a background warm-up."""
+    import config
+    import db
+    import routes.sync_routes as sr
+    _add_large_photo(db, config)
+    sr.mark_manifest_dirty()
+    warming = []
+    monkeypatch.setattr(config, "SYNC_VARIANT_BUDGET", -1)
+    monkeypatch.setattr(sr, "_warm_variants_async", warming.append)
+
+    resp = master_with_photos.get("/sync/manifest?token=test-child-token-123&max_dim=1920")
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "30"
+    assert warming == [1920]
+
+
+def test_manifest_lists_thumbnails_and_serves_them(master_with_photos):
+    import config
+    import db
+    import routes.sync_routes as sr
+    thumb = b"\xff\xd8\xff\xe0thumb-of-test_0"
+    with open(os.path.join(config.PHOTOS_DIR, "thumbs", "test_0.jpg"), "wb") as f:
+        f.write(thumb)
+    sr.mark_manifest_dirty()
+
+    data = master_with_photos.get("/sync/manifest?token=test-child-token-123").get_json()
+    entries = {p["path"]: p for p in data["photos"]}
+    assert entries["picker/test_0.jpg"]["thumb_md5"] == hashlib.md5(thumb).hexdigest()
+    assert "thumb_md5" not in entries["picker/test_1.jpg"]
+
+    resp = master_with_photos.get("/sync/thumb/picker/test_0.jpg?token=test-child-token-123")
+    assert resp.status_code == 200
+    assert resp.data == thumb
+    assert master_with_photos.get(
+        "/sync/thumb/picker/test_1.jpg?token=test-child-token-123").status_code == 404
+    assert master_with_photos.get(
+        "/sync/thumb/picker/test_0.jpg?token=wrong").status_code == 403
+
+
+def test_sync_fetches_master_thumbnails(monkeypatch, tmp_path):
+    """Children use the master's thumbnail and only generate one when it has none."""
+    import config
+    import routes.sync_routes as sr
+    db = _init_test_db(monkeypatch, tmp_path)
+
+    photos_dir = str(tmp_path / "photos")
+    monkeypatch.setattr(config, "PHOTOS_DIR", photos_dir)
+    db.set_setting("sync_role", "child")
+    db.set_setting("master_url", "https://master.test")
+    db.set_setting("sync_token", "tok123")
+
+    content = b"\xff\xd8\xff\xe0" + b"\x00" * 100
+    md5 = hashlib.md5(content).hexdigest()
+    thumb = b"\xff\xd8\xff\xe0master-thumb"
+
+    class MockResp:
+        status_code = 200
+        headers = {}
+
+        def json(self):
+            return {"photos": [
+                {"path": "upload/a.jpg", "size": len(content), "md5": md5,
+                 "thumb_md5": hashlib.md5(thumb).hexdigest()},
+                {"path": "upload/b.jpg", "size": len(content), "md5": md5},
+            ], "photo_count": 2, "timestamp": 1000}
+
+    def mock_get(url, **kwargs):
+        if "/sync/manifest" in url:
+            return MockResp()
+        if "/sync/thumb/" in url:
+            return _PhotoResp(200, thumb)
+        return _PhotoResp(200, content)
+
+    generated = []
+    _patch_master(monkeypatch, mock_get)
+    monkeypatch.setattr(sr, "generate_thumbnail", lambda src, dst: generated.append(os.path.basename(dst)))
+    monkeypatch.setattr(sr, "sync_photos_to_usb", lambda: None)
+    monkeypatch.setattr(sr, "get_display_mode", lambda: "hdmi")
+
+    sr.run_sync_cycle()
+
+    with open(os.path.join(photos_dir, "thumbs", "a.jpg"), "rb") as f:
+        assert f.read() == thumb
+    assert generated == ["b.jpg"]
+    assert db.get_setting("last_sync_result") == "success"
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_sync_records_cycle_metrics(monkeypatch, tmp_path):
+    """A cycle should log phase timings, bytes, latency and retries."""
+    import config
+    import routes.sync_routes as sr
+    db = _init_test_db(monkeypatch, tmp_path)
+
+    photos_dir = str(tmp_path / "photos")
+    monkeypatch.setattr(config, "PHOTOS_DIR", photos_dir)
+    db.set_setting("sync_role", "child")
+    db.set_setting("master_url", "https://master.test")
+    db.set_setting("sync_token", "tok123")
+
+    content = b"\xff\xd8\xff\xe0" + b"\x00" * 300
+    md5 = hashlib.md5(content).hexdigest()
+    attempts = []
+
+    class MockResp:
+        status_code = 200
+        headers = {"Content-Length": "120"}
+
+        def json(self):
+            return {"photos": [{"path": "upload/a.jpg", "size": len(content), "md5": md5}],
+                    "photo_count": 1, "timestamp": 1000}
+
+    def mock_get(url, **kwargs):
+        if "/sync/manifest" in url:
+            return MockResp()
+        attempts.append(url)
+        # First attempt arrives corrupted, second is good
+        return _PhotoResp(200, content if len(attempts) > 1 else b"garbage")
+
+    _patch_master(monkeypatch, mock_get)
+    monkeypatch.setattr(sr, "sync_photos_to_usb", lambda: None)
+    monkeypatch.setattr(sr, "get_display_mode", lambda: "hdmi")
+
+    sr.run_sync_cycle()
+
+    entry = db.get_last_sync()
+    assert entry["result"] == "success"
+    assert entry["bytes_downloaded"] == 120 + len(content)
+    assert entry["retries"] == 1
+    assert entry["latency_p50_ms"] is not None
+    assert entry["throughput_bps"] > 0
+    assert {"manifest", "diff", "download", "cleanup"} <= set(entry["phase_timings"])
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_sync_metrics_endpoint_trends(sync_child_client):
+    import db
+    for bps in (1000, 1000, 3000, 3000):
+        db.add_sync_log("success", photos_added=2, duration_s=4.0, metrics={
+            "bytes_downloaded": 500, "retries": 1, "throughput_bps": bps,
+            "latency_p50_ms": 100, "latency_p95_ms": 300,
+            "phase_timings": {"manifest": 0.5, "download": 3.0},
+        })
+    db.add_sync_log("error", duration_s=1.0, error="Master returned 503")
+
+    data = sync_child_client.get("/admin/sync_metrics").get_json()
+    assert len(data["cycles"]) == 5
+    assert data["cycles"][-1]["result"] == "error"
+    trends = data["trends"]
+    assert trends["errors"] == 1
+    assert trends["slowest_phase"] == "download"
+    assert trends["avg_throughput_bps"] == 2000
+    assert trends["throughput_change_pct"] == 200.0
+    assert trends["total_bytes"] == 2000
+    assert trends["total_retries"] == 4
+
+
+def test_sync_log_gains_metric_columns(tmp_path, monkeypatch):
+    """init_db should add telemetry columns to a sync_log from an older version."""
+    import sqlite3
+    import db
+    db_path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE sync_log (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                 "timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP, result TEXT NOT NULL, "
+                 "photos_added INTEGER DEFAULT 0, photos_removed INTEGER DEFAULT 0, "
+                 "duration_s REAL DEFAULT 0, error TEXT)")
+    conn.execute("INSERT INTO sync_log (result) VALUES ('success')")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(db, "DB_PATH", db_path)
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+    db.init_db()
+
+    db.add_sync_log("success", metrics={"retries": 2, "phase_timings": {"diff": 0.1}})
+    history = db.get_sync_history(5)
+    assert history[0]["retries"] == 2
+    assert history[1]["phase_timings"] == {}
+
+    db._local.conn.close()
+    db._local.conn = None
+
+
+def test_sync_downloads_newest_first_with_checkpoints(monkeypatch, tmp_path):
+    """Photos should arrive newest first and reach the frame in checkpoints."""
+    import config
+    import routes.sync_routes as sr
+    db = _init_test_db(monkeypatch, tmp_path)
+
+    monkeypatch.setattr(config, "PHOTOS_DIR", str(tmp_path / "photos"))
+    monkeypatch.setattr(config, "SYNC_CHECKPOINT_PHOTOS", 2)
+    db.set_setting("sync_role", "child")
+    db.set_setting("master_url", "https://master.test")
+    db.set_setting("sync_token", "tok123")
+    db.set_setting("sync_concurrency", 1)
+
+    bodies = {f"upload/p{i}.jpg": b"\xff\xd8\xff\xe0" + bytes([i]) * 100 for i in range(5)}
+    # p0 is oldest, p4 newest; listed out of order
+    photos = [{"path": f"upload/p{i}.jpg", "size": 104,
+               "md5": hashlib.md5(bodies[f"upload/p{i}.jpg"]).hexdigest(),
+               "created_at": f"2026-01-0{i + 1} 12:00:00"}
+              for i in (2, 0, 4, 1, 3)]
+    fetched = []
+
+    class MockResp:
+        status_code = 200
+        headers = {}
+
+        def json(self):
+            return {"photos": photos, "photo_count": len(photos), "timestamp": 1000}
+
+    def mock_get(url, **kwargs):
+        if "/sync/manifest" in url:
+            return MockResp()
+        path = url.split("/sync/photo/")[1]
+        fetched.append(path)
+        return _PhotoResp(200, bodies[path])
+
+    published = []
+    _patch_master(monkeypatch, mock_get)
+    monkeypatch.setattr(sr, "notify_photos_changed", lambda: published.append(db.get_photo_count()))
+    monkeypatch.setattr(sr, "get_display_mode", lambda: "hdmi")
+
+    sr.run_sync_cycle()
+
+    assert fetched == [f"upload/p{i}.jpg" for i in (4, 3, 2, 1, 0)]
+    # Checkpoints publish in the background, coalescing while one runs; the
+    # end of the cycle waits for them and publishes the rest
+    assert len(published) >= 2 and published[0] >= 2
+    assert published[-1] == 5
+    # Local rows keep the master's timestamps, so slideshow order is unchanged
+    assert db.get_photo("p0.jpg")["created_at"] == "2026-01-01 12:00:00"
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_manifests_carry_created_at(master_with_photos):
+    import db
+    version = db.get_photo_version()
+    db.add_photo("late.jpg", subdir="upload", size_bytes=10, md5="abc")
+
+    full = master_with_photos.get("/sync/manifest?token=test-child-token-123").get_json()
+    assert all(p["created_at"] for p in full["photos"])
+
+    delta = master_with_photos.get(
+        f"/sync/manifest?token=test-child-token-123&since={version}").get_json()
+    assert delta["changes"][0]["path"] == "upload/late.jpg"
+    assert delta["changes"][0]["created_at"]
+
+
+def _ndjson(records):
+    import json
+    return b"".join(json.dumps(r).encode() + b"\n" for r in records)
+
+
+class _NdjsonResp:
+    """Mocked streamed NDJSON manifest response."""
+    status_code = 200
+    headers = {"Content-Type": "application/x-ndjson"}
+
+    def __init__(self, records):
+        self.body = _ndjson(records)
+
+    def iter_lines(self, chunk_size=512):
+        return iter(self.body.split(b"\n"))
+
+
+def test_ndjson_manifest_streams_in_path_order(master_with_photos):
+    import json
+    import db
+    db.add_photo("root.jpg", subdir="", size_bytes=5, md5="r00t")
+    db.add_photo("mine.jpg", subdir="sync/upload", size_bytes=5, md5="s1")
+
+    resp = master_with_photos.get("/sync/manifest?token=test-child-token-123&format=ndjson")
+    assert resp.status_code == 200
+    assert resp.mimetype == "application/x-ndjson"
+    records = [json.loads(line) for line in resp.data.splitlines()]
+
+    assert records[0]["your_label"] == "Gramma"
+    assert "version" in records[0]
+    paths = [r["path"] for r in records[1:-1]]
+    # Sorted by (subdir, filename); synced photos are never re-published
+    assert paths == ["root.jpg", "picker/test_0.jpg", "picker/test_1.jpg", "picker/test_2.jpg"]
+    assert records[1]["uploaded_by"] == "admin"
+    assert records[-1] == {"end": True, "photo_count": 4}
+
+    # Same version -> 304
+    again = master_with_photos.get("/sync/manifest?token=test-child-token-123&format=ndjson",
+                                   headers={"If-None-Match": resp.headers["ETag"]})
+    assert again.status_code == 304
+
+
+def test_ndjson_manifest_gzip(master_with_photos):
+    import gzip
+    resp = master_with_photos.get("/sync/manifest?token=test-child-token-123&format=ndjson",
+                                  headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    lines = gzip.decompress(resp.data).splitlines()
+    assert len(lines) == 5
+
+
+def test_sync_merges_streamed_manifest(monkeypatch, tmp_path):
+    """A streamed manifest should be diffed against local rows in one pass."""
+    import config
+    import routes.sync_routes as sr
+    db = _init_test_db(monkeypatch, tmp_path)
+
+    photos_dir = tmp_path / "photos"
+    monkeypatch.setattr(config, "PHOTOS_DIR", str(photos_dir))
+    db.set_setting("sync_role", "child")
+    db.set_setting("master_url", "https://master.test")
+    db.set_setting("sync_token", "tok123")
+
+    def body(name):
+        return b"\xff\xd8\xff\xe0" + name.encode() * 20
+
+    # Local: a.jpg current, b.jpg stale, gone.jpg removed on master
+    sync_dir = photos_dir / "sync" / "upload"
+    sync_dir.mkdir(parents=True)
+    for name, content in (("a.jpg", body("a.jpg")), ("b.jpg", b"old"), ("gone.jpg", b"x")):
+        (sync_dir / name).write_bytes(content)
+        db.add_photo(name, subdir="sync/upload", uploaded_by="Mom",
+                     size_bytes=len(content), md5=hashlib.md5(content).hexdigest())
+
+    entries = [{"path": f"upload/{n}", "size": len(body(n)), "md5": hashlib.md5(body(n)).hexdigest(),
+                "uploaded_by": "Dad" if n == "a.jpg" else "Mom"}
+               for n in ("a.jpg", "b.jpg", "c.jpg")]
+    records = [{"version": 7, "your_label": "Den"}] + entries + [{"end": True, "photo_count": 3}]
+    fetched = []
+
+    def mock_get(url, **kwargs):
+        if "/sync/manifest" in url:
+            assert kwargs["params"]["format"] == "ndjson"
+            return _NdjsonResp(records)
+        path = url.split("/sync/photo/")[1]
+        fetched.append(path)
+        return _PhotoResp(200, body(os.path.basename(path)))
+
+    _patch_master(monkeypatch, mock_get)
+    monkeypatch.setattr(sr, "sync_photos_to_usb", lambda: None)
+    monkeypatch.setattr(sr, "get_display_mode", lambda: "hdmi")
+
+    sr.run_sync_cycle()
+
+    assert sorted(fetched) == ["upload/b.jpg", "upload/c.jpg"]
+    assert db.get_photo("gone.jpg") is None
+    assert not (sync_dir / "gone.jpg").exists()
+    assert db.get_photo("a.jpg")["uploaded_by"] == "Dad"
+    assert db.get_photo("c.jpg")["md5"] == entries[2]["md5"]
+    assert db.get_setting("sync_label") == "Den"
+    assert db.get_setting("sync_manifest_version") == 7
+    assert db.get_last_sync()["bytes_downloaded"] > 0
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_truncated_manifest_stream_deletes_nothing(monkeypatch, tmp_path):
+    import config
+    import routes.sync_routes as sr
+    db = _init_test_db(monkeypatch, tmp_path)
+
+    photos_dir = tmp_path / "photos"
+    monkeypatch.setattr(config, "PHOTOS_DIR", str(photos_dir))
+    db.set_setting("master_url", "https://master.test")
+    db.set_setting("sync_token", "tok123")
+    (photos_dir / "sync").mkdir(parents=True)
+    (photos_dir / "sync" / "z.jpg").write_bytes(b"z")
+    db.add_photo("z.jpg", subdir="sync", md5=hashlib.md5(b"z").hexdigest())
+
+    # Cut off before the trailer (and before z.jpg would have been listed)
+    records = [{"version": 3}, {"path": "a.jpg", "size": 1, "md5": "aa"}]
+    _patch_master(monkeypatch, lambda url, **kw: _NdjsonResp(records))
+
+    sr.run_sync_cycle()
+
+    assert db.get_setting("last_sync_result") == "error"
+    assert db.get_photo("z.jpg") is not None
+    assert (photos_dir / "sync" / "z.jpg").exists()
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_ndjson_manifest_lists_variants(master_with_photos):
+    """Streamed manifests carry the same variant MD5s as the JSON one."""
+    import json
+    import config
+    import db
+    import routes.sync_routes as sr
+    _add_large_photo(db, config)
+    sr.mark_manifest_dirty()
+
+    # Streamed first, so it renders the variants itself
+    resp = master_with_photos.get(
+        "/sync/manifest?token=test-child-token-123&max_dim=1280&format=ndjson")
+    records = [json.loads(line) for line in resp.data.splitlines()]
+    full = master_with_photos.get(
+        "/sync/manifest?token=test-child-token-123&max_dim=1280").get_json()
+
+    assert records[0]["max_dim"] == 1280
+    streamed = {r["path"]: (r["md5"], r["size"]) for r in records[1:-1]}
+    assert streamed == {p["path"]: (p["md5"], p["size"]) for p in full["photos"]}
+
+
+def test_deleted_photo_variants_are_pruned(master_with_photos, monkeypatch):
+    """Deleting a photo drops its variants even though children stream NDJSON."""
+    import config
+    import db
+    import photo_ops
+    import routes.sync_routes as sr
+    monkeypatch.setattr("utils.sync_photos_to_usb", lambda: None)
+    monkeypatch.setattr(photo_ops, "PHOTOS_DIR", config.PHOTOS_DIR)
+    big_md5 = _add_large_photo(db, config)
+    sr.mark_manifest_dirty()
+    url = "/sync/manifest?token=test-child-token-123&max_dim=1280&format=ndjson"
+    assert master_with_photos.get(url).status_code == 200
+    variant = photo_ops.variant_path(big_md5, 1280)
+    assert os.path.exists(variant)
+
+    resp = master_with_photos.post("/admin/delete_photo",
+                                   json={"path": "/static/photos/upload/big.jpg"})
+    assert resp.get_json()["success"] is True
+    records = master_with_photos.get(url).data.splitlines()
+    assert not any(b"big.jpg" in line for line in records)
+    assert not os.path.exists(variant)
+    assert db.get_photo_variant(big_md5, 1280) is None
+
+
+def test_busy_master_answers_429_until_a_transfer_finishes(master_with_photos):
+    import config
+    import db
+    db.set_setting("sync_max_transfers", 1)
+    url = "/sync/photo/picker/test_0.jpg?token=test-child-token-123"
+
+    first = master_with_photos.get(url)
+    assert first.status_code == 200
+    busy = master_with_photos.get(url)
+    assert busy.status_code == 429
+    assert busy.headers["Retry-After"] == str(config.SYNC_BUSY_RETRY_AFTER)
+
+    first.close()
+    assert master_with_photos.get(url).status_code == 200
+    # Error responses don't hold a slot
+    assert master_with_photos.get("/sync/photo/picker/nope.jpg?token=test-child-token-123").status_code == 404
+
+
+def test_retry_after_parsing():
+    from email.utils import format_datetime
+    from datetime import datetime, timedelta, timezone
+    import routes.sync_routes as sr
+
+    class Resp:
+        def __init__(self, value):
+            self.headers = {"Retry-After": value} if value is not None else {}
+
+    assert sr._retry_after(Resp("120"), None) == 120
+    assert sr._retry_after(Resp(None), 7) == 7
+    assert sr._retry_after(Resp("soon"), 7) == 7
+    when = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=90), usegmt=True)
+    assert 85 <= sr._retry_after(Resp(when), None) <= 90
+
+
+def test_sync_cycle_returns_retry_after_when_master_busy(monkeypatch, tmp_path):
+    import routes.sync_routes as sr
+    db = _init_test_db(monkeypatch, tmp_path)
+    db.set_setting("master_url", "https://master.test")
+    db.set_setting("sync_token", "tok123")
+
+    class Busy:
+        status_code = 503
+        headers = {"Retry-After": "30"}
+
+    _patch_master(monkeypatch, lambda url, **kw: Busy())
+
+    assert sr.run_sync_cycle() == 30
+    assert db.get_setting("last_sync_result") == "error"
+    assert "busy" in db.get_setting("sync_error")
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_download_photo_waits_out_busy_master(monkeypatch, tmp_path):
+    import routes.sync_routes as sr
+    content = b"\xff\xd8\xff\xe0" + b"\x01" * 50
+    responses = [_PhotoResp(429), _PhotoResp(200, content)]
+    responses[0].headers = {"Retry-After": "3"}
+    slept = []
+    monkeypatch.setattr(sr.time, "sleep", slept.append)
+
+    class Session:
+        def get(self, url, **kwargs):
+            return responses.pop(0)
+
+    result = sr._download_photo(Session(), "https://m", "tok", "a.jpg",
+                                hashlib.md5(content).hexdigest(), str(tmp_path))
+    assert result is not None
+    assert len(slept) == 1 and 3 <= slept[0] <= 3 * 1.1 + 0.001
+
+
+def test_download_photo_busy_answers_dont_use_up_attempts(monkeypatch, tmp_path):
+    """429s are waited out without spending the MD5-mismatch attempts."""
+    import config
+    import threading
+    import routes.sync_routes as sr
+    content = b"\xff\xd8\xff\xe0" + b"\x01" * 50
+    responses = [_PhotoResp(429) for _ in range(config.SYNC_DOWNLOAD_ATTEMPTS + 1)]
+    for r in responses:
+        r.headers = {"Retry-After": "1"}
+    responses.append(_PhotoResp(200, content))
+    monkeypatch.setattr(sr.time, "sleep", lambda s: None)
+    busy = threading.Event()
+
+    class Session:
+        def get(self, url, **kwargs):
+            return responses.pop(0)
+
+    result = sr._download_photo(Session(), "https://m", "tok", "a.jpg",
+                                hashlib.md5(content).hexdigest(), str(tmp_path), busy=busy)
+    assert result is not None
+    assert busy.is_set()
+
+
+def test_download_photo_gives_up_on_a_master_that_stays_busy(monkeypatch, tmp_path):
+    import config
+    import routes.sync_routes as sr
+    monkeypatch.setattr(config, "SYNC_BUSY_GIVE_UP", 5)
+    slept = []
+    monkeypatch.setattr(sr.time, "sleep", slept.append)
+
+    class Session:
+        def get(self, url, **kwargs):
+            resp = _PhotoResp(429)
+            resp.headers = {"Retry-After": "3"}
+            return resp
+
+    with pytest.raises(sr._MasterBusy) as exc:
+        sr._download_photo(Session(), "https://m", "tok", "a.jpg", "0" * 32, str(tmp_path))
+    assert exc.value.retry_after == 3
+    assert len(slept) == 1
+
+
+def test_sync_cycle_left_busy_is_retried_later(monkeypatch, tmp_path):
+    """Photos the master stayed too busy to send don't count as a success."""
+    import config
+    import routes.sync_routes as sr
+    db = _init_test_db(monkeypatch, tmp_path)
+    photos_dir = str(tmp_path / "photos")
+    os.makedirs(photos_dir, exist_ok=True)
+    monkeypatch.setattr(config, "PHOTOS_DIR", photos_dir)
+    monkeypatch.setattr(config, "SYNC_BUSY_GIVE_UP", 5)
+    monkeypatch.setattr(sr.time, "sleep", lambda s: None)
+    db.set_setting("sync_role", "child")
+    db.set_setting("master_url", "https://master.test")
+    db.set_setting("sync_token", "tok123")
+
+    class MockResp:
+        status_code = 200
+        headers = {}
+        def json(self):
+            return {"photos": [{"path": f"upload/{n}.jpg", "size": 10, "md5": "0" * 32}
+                               for n in "abc"],
+                    "photo_count": 3, "version": 7, "timestamp": 1000}
+
+    def mock_get(url, **kwargs):
+        if "/sync/manifest" in url:
+            return MockResp()
+        resp = _PhotoResp(429)
+        resp.headers = {"Retry-After": "4"}
+        return resp
+
+    _patch_master(monkeypatch, mock_get)
+    monkeypatch.setattr(sr, "get_display_mode", lambda: "hdmi")
+
+    assert sr.run_sync_cycle() == 4
+    assert db.get_setting("last_sync_result") == "error"
+    assert "busy" in db.get_setting("sync_error")
+    assert db.get_setting("sync_manifest_version") is None
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_sync_loop_jitters_and_honours_retry_after(monkeypatch, tmp_path):
+    """A busy master's Retry-After replaces (and doesn't escalate) backoff."""
+    import config
+    import routes.sync_routes as sr
+    db = _init_test_db(monkeypatch, tmp_path)
+    results = [120, None, 120]
+
+    def fake_cycle():
+        db.set_setting("last_sync_result", "error")
+        return results.pop(0)
+
+    class Stop:
+        def __init__(self):
+            self.waits = []
+
+        def is_set(self):
+            return not results
+
+        def wait(self, seconds):
+            self.waits.append(seconds)
+            return not results
+
+    stop = Stop()
+    monkeypatch.setattr(sr, "run_sync_cycle", fake_cycle)
+    sr._sync_loop(stop, at_boot=True)
+
+    start, busy, failed, busy_again = stop.waits
+    assert 10 <= start <= 10 + config.SYNC_START_SPREAD
+    assert 120 <= busy <= 120 * (1 + config.SYNC_JITTER)
+    # First real failure still starts at the 5 minute step
+    assert 300 * (1 - config.SYNC_JITTER) <= failed <= 300 * (1 + config.SYNC_JITTER)
+    assert 120 <= busy_again <= 120 * (1 + config.SYNC_JITTER)
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_sync_loop_restart_skips_start_spread(monkeypatch):
+    """Sync Now and config saves restart the loop without the boot spread."""
+    import routes.sync_routes as sr
+    waits = []
+
+    class Stop:
+        def wait(self, seconds):
+            waits.append(seconds)
+            return True
+
+    monkeypatch.setattr(sr.random, "uniform", lambda a, b: b)
+    sr._sync_loop(Stop())
+    assert waits == [10]
+
+
+def test_bulk_lane_caps_each_child(master_with_photos, monkeypatch):
+    import db
+    import routes.sync_routes as sr
+    monkeypatch.setattr(sr, "_fleet_pending", {})
+    db.set_setting("sync_child_max_transfers", 1)
+    db.add_sync_child("Den", "den-token")
+    url = "/sync/photo/picker/test_0.jpg?token="
+
+    held = master_with_photos.get(url + "test-child-token-123")
+    assert held.status_code == 200
+    assert master_with_photos.get(url + "test-child-token-123").status_code == 429
+    # Another frame still gets through
+    other = master_with_photos.get(url + "den-token")
+    assert other.status_code == 200
+    held.close()
+    other.close()
+
+    # Being turned away is flow control, not a failing frame
+    fleet = master_with_photos.get("/admin/sync_fleet").get_json()["children"]
+    gramma = next(c for c in fleet if c["label"] == "Gramma")
+    assert gramma["status"] != "error"
+    assert gramma["last_error"] is None
+
+
+def test_bulk_lane_yields_to_interactive_requests(master_with_photos):
+    import qos
+    url = "/sync/photo/picker/test_0.jpg?token=test-child-token-123"
+    qos.begin_interactive()
+    try:
+        held = master_with_photos.get(url)
+        assert held.status_code == 200
+        # While an upload is in flight bulk is down to one transfer
+        assert master_with_photos.get(url).status_code == 429
+    finally:
+        qos.end_interactive()
+    assert master_with_photos.get(url).status_code == 200
+    held.close()
+
+
+def test_interactive_requests_are_tracked(sync_master_client, monkeypatch):
+    import qos
+    seen = []
+    monkeypatch.setattr(qos, "begin_interactive", lambda: seen.append("begin"))
+    monkeypatch.setattr(qos, "end_interactive", lambda: seen.append("end"))
+
+    sync_master_client.get("/upload")
+    assert seen == ["begin", "end"]
+    sync_master_client.get("/sync/manifest?token=test-child-token-123")
+    assert seen == ["begin", "end"]
+
+
+def test_master_qos_settings(sync_master_client):
+    import db
+    resp = sync_master_client.post("/admin/sync_config", json={
+        "sync_role": "master", "sync_max_transfers": 99,
+        "sync_child_max_transfers": 2, "sync_rate_limit_kbps": 512})
+    assert resp.get_json()["success"]
+    assert db.get_setting("sync_max_transfers") == 16
+    assert db.get_setting("sync_child_max_transfers") == 2
+    assert db.get_setting("sync_rate_limit_kbps") == 512
+
+    status = sync_master_client.get("/admin/sync_status").get_json()
+    assert status["sync_rate_limit_kbps"] == 512
+    assert status["sync_max_transfers"] == 16
+
+
+def test_fleet_dashboard_tracks_child_progress(master_with_photos):
+    import db
+    token = "test-child-token-123"
+    assert master_with_photos.get("/admin/sync_fleet").get_json()["children"][0]["status"] == "never"
+
+    master_with_photos.get(f"/sync/manifest?token={token}")
+    photo = master_with_photos.get(f"/sync/photo/picker/test_0.jpg?token={token}")
+    size = len(photo.data)
+    photo.close()
+    version = db.get_photo_version()
+    resp = master_with_photos.post("/sync/report", json={
+        "token": token, "version": version, "result": "success", "error": None})
+    assert resp.get_json()["success"]
+
+    fleet = master_with_photos.get("/admin/sync_fleet").get_json()
+    child = fleet["children"][0]
+    assert child["label"] == "Gramma"
+    assert child["status"] == "ok"
+    assert child["served_version"] == version
+    assert child["applied_version"] == version
+    assert child["versions_behind"] == 0
+    assert child["photos_served"] == 1
+    assert child["bytes_served"] == size
+    assert child["seen_ago_s"] is not None
+
+    # New photo on the master: the child is now behind until it reports
+    db.add_photo("new.jpg", subdir="upload", md5="n3w")
+    child = master_with_photos.get("/admin/sync_fleet").get_json()["children"][0]
+    assert child["status"] == "behind"
+    assert child["versions_behind"] == 1
+
+
+def test_fleet_dashboard_flags_errors_and_stale_children(master_with_photos):
+    import db
+    token = "test-child-token-123"
+    master_with_photos.post("/sync/report", json={
+        "token": token, "version": None, "result": "error", "error": "Disk full"})
+    child = master_with_photos.get("/admin/sync_fleet").get_json()["children"][0]
+    assert child["status"] == "error"
+    assert child["last_error"] == "Disk full"
+
+    db.update_sync_child(token, last_seen_at="2020-01-01T00:00:00")
+    child = master_with_photos.get("/admin/sync_fleet").get_json()["children"][0]
+    assert child["status"] == "stale"
+
+
+def test_sync_report_rejects_unknown_token(master_with_photos):
+    resp = master_with_photos.post("/sync/report", json={"token": "nope", "version": 1})
+    assert resp.status_code == 403
+
+
+def test_child_reports_applied_version(monkeypatch, tmp_path):
+    import routes.sync_routes as sr
+    db = _init_test_db(monkeypatch, tmp_path)
+    monkeypatch.setattr("config.PHOTOS_DIR", str(tmp_path / "photos"))
+    db.set_setting("master_url", "https://master.test")
+    db.set_setting("sync_token", "tok123")
+    db.set_setting("sync_manifest_version", 9)
+    db.set_setting("sync_manifest_etag", "v9")
+
+    class NotModified:
+        status_code = 304
+        headers = {}
+
+    reports = []
+    _patch_master(monkeypatch, lambda url, **kw: NotModified(),
+                  report_handler=lambda url, **kw: reports.append(kw["json"]) or _PhotoResp(200))
+
+    sr.run_sync_cycle()
+
+    assert reports == [{"token": "tok123", "version": 9, "result": "success", "error": None}]
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+# ============== RELAY TESTS ==============
+
+@pytest.fixture
+def relay_with_photos(master_with_photos):
+    """Relay with its own photos (picker/) plus two pulled into sync/."""
+    import config
+    import db
+    from routes.sync_routes import mark_manifest_dirty
+    db.set_setting("sync_role", "relay")
+    db.set_setting("master_url", "https://master.example.com")
+    db.set_setting("sync_token", "relay-token")
+    for subdir, name in (("sync", "a.jpg"), ("sync/upload", "b.jpg")):
+        content = b"\xff\xd8\xff\xe0" + name.encode() * 20
+        os.makedirs(os.path.join(config.PHOTOS_DIR, subdir), exist_ok=True)
+        with open(os.path.join(config.PHOTOS_DIR, subdir, name), "wb") as f:
+            f.write(content)
+        db.add_photo(name, subdir=subdir, uploaded_by="Gramma", size_bytes=len(content),
+                     md5=hashlib.md5(content).hexdigest())
+    mark_manifest_dirty()
+    return master_with_photos
+
+
+def test_relay_republishes_only_synced_photos(relay_with_photos):
+    """A relay's manifests list what it pulled, with paths as the master had them."""
+    import json
+    token = "token=test-child-token-123"
+    full = relay_with_photos.get(f"/sync/manifest?{token}").get_json()
+    assert sorted(p["path"] for p in full["photos"]) == ["a.jpg", "upload/b.jpg"]
+
+    resp = relay_with_photos.get(f"/sync/manifest?{token}&format=ndjson")
+    records = [json.loads(line) for line in resp.data.splitlines()]
+    assert [r["path"] for r in records[1:-1]] == ["a.jpg", "upload/b.jpg"]
+    assert records[-1] == {"end": True, "photo_count": 2}
+
+    import db
+    db.add_photo("local.jpg", subdir="upload", size_bytes=5, md5="l0ca1")
+    db.remove_photo("a.jpg")
+    delta = relay_with_photos.get(f"/sync/manifest?{token}&since={full['version']}").get_json()
+    assert [(c["path"], c["op"]) for c in delta["changes"]] == [("a.jpg", "delete")]
+
+
+def test_relay_serves_photos_from_sync_dir(relay_with_photos):
+    resp = relay_with_photos.get("/sync/photo/upload/b.jpg?token=test-child-token-123")
+    assert resp.status_code == 200
+    assert resp.data == b"\xff\xd8\xff\xe0" + b"b.jpg" * 20
+    # Its own photos and paths outside sync/ are not served
+    assert relay_with_photos.get(
+        "/sync/photo/picker/test_0.jpg?token=test-child-token-123").status_code == 404
+    assert relay_with_photos.get(
+        "/sync/photo/../picker/test_0.jpg?token=test-child-token-123").status_code in (403, 404)
+
+    import tarfile
+    import io
+    resp = relay_with_photos.post("/sync/bundle", json={
+        "token": "test-child-token-123", "paths": ["a.jpg", "upload/b.jpg"]})
+    with tarfile.open(fileobj=io.BytesIO(resp.data)) as tar:
+        assert tar.getnames() == ["a.jpg", "upload/b.jpg"]
+
+
+def test_relay_rejects_deletes(relay_with_photos):
+    """Ownership lives on the master, so relays don't take deletes."""
+    resp = relay_with_photos.post("/sync/delete_photo", json={
+        "token": "test-child-token-123", "filename": "a.jpg"})
+    assert resp.status_code == 404
+
+
+def test_sync_config_relay_pulls_and_serves(app_client, monkeypatch):
+    import db
+    import routes.sync_routes as sr
+    started = []
+    monkeypatch.setattr(sr, "start_sync_loop", lambda: started.append(True))
+
+    resp = app_client.post("/admin/sync_config", json={
+        "sync_role": "relay", "master_url": "https://master.example.com/",
+        "sync_token": "relay-token", "sync_rate_limit_kbps": 512})
+    assert resp.get_json()["success"] is True
+    assert db.get_setting("sync_role") == "relay"
+    assert db.get_setting("master_url") == "https://master.example.com"
+    assert db.get_setting("sync_token") == "relay-token"
+    assert db.get_setting("sync_rate_limit_kbps") == 512
+    assert started
+
+    assert app_client.post("/admin/sync_now").get_json()["success"] is True
+
+
+def test_sync_config_relay_keeps_originals(app_client, monkeypatch):
+    """A relay syncs full-resolution photos whatever resolution is sent."""
+    import db
+    import routes.sync_routes as sr
+    monkeypatch.setattr(sr, "start_sync_loop", lambda: None)
+
+    resp = app_client.post("/admin/sync_config", json={
+        "sync_role": "relay", "master_url": "https://master.example.com",
+        "sync_token": "relay-token", "sync_max_dim": 1920})
+    assert resp.get_json()["success"] is True
+    assert db.get_setting("sync_max_dim") == 0
+
+
+# ============== LAN DISCOVERY TESTS ==============
+
+def test_manifests_carry_sync_id_and_hello_proves_master(master_with_photos):
+    import json
+    import routes.sync_routes as sr
+    token = "token=test-child-token-123"
+    sync_id = master_with_photos.get(f"/sync/manifest?{token}").get_json()["sync_id"]
+    assert sync_id
+    version = master_with_photos.get(f"/sync/manifest?{token}").get_json()["version"]
+    assert master_with_photos.get(
+        f"/sync/manifest?{token}&since={version}").get_json()["sync_id"] == sync_id
+    resp = master_with_photos.get(f"/sync/manifest?{token}&format=ndjson")
+    assert json.loads(resp.data.splitlines()[0])["sync_id"] == sync_id
+
+    assert master_with_photos.get("/sync/hello?child=unknown&nonce=n1").status_code == 403
+    child = sr._hello_child_id("test-child-token-123")
+    assert master_with_photos.get(f"/sync/hello?child={child}").status_code == 403
+    answer = master_with_photos.get(f"/sync/hello?child={child}&nonce=n1").get_json()
+    assert answer == {"sync_id": sync_id,
+                      "proof": sr._hello_proof("test-child-token-123", "n1", "localhost")}
+
+
+def _lan_child(monkeypatch, tmp_path, lan_hello, hello_reply=None):
+    """Child that knows its master's sync_id and finds it on the LAN at
+    192.168.1.20:3000. Returns the list of URLs the cycle requested.
+
+    hello_reply(params) overrides the LAN host's /sync/hello answer
+    (by default, a correct proof)."""
+    import json
+    import config
+    import requests
+    import routes.sync_routes as sr
+    db = _init_test_db(monkeypatch, tmp_path)
+    monkeypatch.setattr(config, "PHOTOS_DIR", str(tmp_path / "photos"))
+    db.set_setting("sync_role", "child")
+    db.set_setting("master_url", "https://master.test")
+    db.set_setting("sync_token", "tok123")
+    db.set_setting("master_sync_id", "m1")
+    monkeypatch.setattr(sr, "_lan_master", {"url": None, "checked": 0.0})
+    monkeypatch.setattr(sr.beacon, "discover", lambda sync_id: [("192.168.1.20", 3000)])
+
+    class MockResp:
+        def __init__(self, status_code, data=None):
+            self.status_code = status_code
+            self.headers = {}
+            self._data = data
+        def json(self):
+            return self._data
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            return False
+
+    def good_reply(params):
+        return {"sync_id": "m1",
+                "proof": sr._hello_proof("tok123", params["nonce"], "192.168.1.20:3000")}
+
+    urls = []
+
+    def mock_get(url, **kwargs):
+        urls.append(url)
+        if url.startswith("http://192.168.1.20:3000/"):
+            if not lan_hello:
+                raise requests.ConnectionError("unreachable")
+            if "/sync/hello" in url:
+                assert "tok123" not in json.dumps(kwargs.get("params"))
+                return MockResp(200, (hello_reply or good_reply)(kwargs["params"]))
+        if "/sync/manifest" in url:
+            return MockResp(200, {"photos": [], "photo_count": 0, "sync_id": "m1"})
+        return MockResp(404)
+
+    _patch_master(monkeypatch, mock_get)
+    return db, urls
+
+
+def test_sync_prefers_lan_master(monkeypatch, tmp_path):
+    import routes.sync_routes as sr
+    db, urls = _lan_child(monkeypatch, tmp_path, lan_hello=True)
+
+    sr.run_sync_cycle()
+
+    assert urls == ["http://192.168.1.20:3000/sync/hello",
+                    "http://192.168.1.20:3000/sync/manifest"]
+    assert db.get_setting("last_sync_result") == "success"
+    assert sr._lan_master["url"] == "http://192.168.1.20:3000"
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_sync_falls_back_when_lan_master_unreachable(monkeypatch, tmp_path):
+    import routes.sync_routes as sr
+    db, urls = _lan_child(monkeypatch, tmp_path, lan_hello=False)
+
+    sr.run_sync_cycle()
+
+    assert urls[-1] == "https://master.test/sync/manifest"
+    assert db.get_setting("last_sync_result") == "success"
+    assert sr._lan_master["url"] is None
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+@pytest.mark.parametrize("reply", [
+    lambda params: {"sync_id": "m1", "proof": "forged"},
+    lambda params: {"sync_id": "m1"},
+    lambda params: ["not", "a", "dict"],
+    lambda params: None,
+])
+def test_sync_ignores_lan_host_without_proof(monkeypatch, tmp_path, reply):
+    """A LAN host that can't prove it holds our token never gets it."""
+    import progress
+    import routes.sync_routes as sr
+    db, urls = _lan_child(monkeypatch, tmp_path, lan_hello=True, hello_reply=reply)
+
+    sr.run_sync_cycle()
+
+    assert urls == ["http://192.168.1.20:3000/sync/hello",
+                    "https://master.test/sync/manifest"]
+    assert db.get_setting("last_sync_result") == "success"
+    assert sr._lan_master["url"] is None
+    assert not progress.is_running("sync")
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_sync_discovery_failure_finishes_cycle(monkeypatch, tmp_path):
+    """A discovery error is a failed cycle, not a stuck one."""
+    import progress
+    import routes.sync_routes as sr
+    db, urls = _lan_child(monkeypatch, tmp_path, lan_hello=True)
+
+    def broken(sync_id):
+        raise RuntimeError("no interfaces")
+    monkeypatch.setattr(sr.beacon, "discover", broken)
+
+    sr.run_sync_cycle()
+
+    assert db.get_setting("last_sync_result") == "error"
+    assert not progress.is_running("sync")
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
+
+
+def test_sync_learns_master_sync_id(monkeypatch, tmp_path):
+    """The first cycle goes through master_url and learns the id to probe for."""
+    import routes.sync_routes as sr
+    db, urls = _lan_child(monkeypatch, tmp_path, lan_hello=True)
+    db.delete_setting("master_sync_id")
+
+    sr.run_sync_cycle()
+
+    assert urls == ["https://master.test/sync/manifest"]
+    assert db.get_setting("master_sync_id") == "m1"
+
+    if hasattr(db._local, 'conn') and db._local.conn is not None:
+        db._local.conn.close()
+        db._local.conn = None
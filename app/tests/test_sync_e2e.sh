@@ -5,6 +5,7 @@ set -euo pipefail
 
 MASTER_PORT=3100
 CHILD_PORT=3101
+BEACON_PORT=3110  # LAN discovery; the child probes 127.0.0.1 instead of broadcasting
 SYNC_TOKEN="e2e-test-token-abc123"
 APP_DIR="$(cd "$(dirname "$0")/.." && pwd)"
 REPO_DIR="$(cd "$APP_DIR/.." && pwd)"
@@ -18,6 +19,9 @@ MASTER_DIR="$TMPDIR_BASE/master"
 CHILD_DIR="$TMPDIR_BASE/child"
 MASTER_PID=""
 CHILD_PID=""
+CREATED_SECRETS=false
+HAD_SLIDESHOW_CONFIG=false
+SLIDESHOW_CONFIG=""
 PASS=0; FAIL=0; TOTAL=0
 
 cleanup() {
@@ -27,6 +31,10 @@ cleanup() {
     wait "$CHILD_PID" 2>/dev/null || true
     rm -rf "$TMPDIR_BASE"
     [ "$CREATED_SECRETS" = "true" ] && rm -f "$APP_DIR/secrets.json"
+    if [ "$HAD_SLIDESHOW_CONFIG" = "true" ] && [ ! -f "$SLIDESHOW_CONFIG" ] \
+            && [ -f "$SLIDESHOW_CONFIG.migrated" ]; then
+        mv "$SLIDESHOW_CONFIG.migrated" "$SLIDESHOW_CONFIG"
+    fi
     echo ""
     echo "Cleaned up temp dir and processes."
 }
@@ -51,6 +59,11 @@ wait_for_port() {
     return 1
 }
 
+# Portable md5 (md5 -q is macOS-only, md5sum is Linux-only)
+file_md5() {
+    python3 -c 'import hashlib,sys; print(hashlib.md5(open(sys.argv[1],"rb").read()).hexdigest())' "$1"
+}
+
 ADMIN_PASSWORD="e2e-test-admin"
 COOKIES_MASTER="$TMPDIR_BASE/cookies_master.txt"
 COOKIES_CHILD="$TMPDIR_BASE/cookies_child.txt"
@@ -61,6 +74,7 @@ start_master() {
     INSTAPI_STATE_FILE="$MASTER_DIR/device_state.json" \
     INSTAPI_DB_PATH="$MASTER_DIR/instapi.db" \
     INSTAPI_ADMIN_PASSWORD="$ADMIN_PASSWORD" \
+    INSTAPI_BEACON_PORT=$BEACON_PORT \
     PORT=$MASTER_PORT \
     python3 main.py >"$TMPDIR_BASE/master.log" 2>&1 &
     MASTER_PID=$!
@@ -87,6 +101,8 @@ start_child() {
     INSTAPI_STATE_FILE="$CHILD_DIR/device_state.json" \
     INSTAPI_DB_PATH="$CHILD_DIR/instapi.db" \
     INSTAPI_ADMIN_PASSWORD="$ADMIN_PASSWORD" \
+    INSTAPI_BEACON_PORT=$BEACON_PORT \
+    INSTAPI_DISCOVERY_ADDR=127.0.0.1 \
     PORT=$CHILD_PORT \
     python3 main.py >"$TMPDIR_BASE/child.log" 2>&1 &
     CHILD_PID=$!
@@ -96,15 +112,29 @@ start_child() {
         "http://127.0.0.1:$CHILD_PORT/admin/login" >/dev/null 2>&1
 }
 
-wait_sync_done() {
-    for i in $(seq 1 30); do
-        local in_progress
-        in_progress=$(curl -s -b "$COOKIES_CHILD" "http://127.0.0.1:$CHILD_PORT/admin/sync_status" \
-            | python3 -c "import sys,json; print(json.load(sys.stdin).get('sync_in_progress',False))" 2>/dev/null)
-        [ "$in_progress" = "False" ] && return 0
+# "<newest sync_log id> <in progress>" from the child's sync status
+child_sync_state() {
+    curl -s -b "$COOKIES_CHILD" "http://127.0.0.1:$CHILD_PORT/admin/sync_status" \
+        | python3 -c "
+import sys, json
+s = json.load(sys.stdin)
+print((s.get('sync_history') or [{}])[0].get('id'), s.get('sync_in_progress', False))" 2>/dev/null
+}
+
+# Trigger a child sync and wait for that cycle to finish. Sync Now only
+# restarts the loop and the cycle starts ~10s later, so "not in progress"
+# right after the trigger proves nothing: wait for a new sync_log entry,
+# then for the cycle to wind down.
+sync_child_now() {
+    local before id running
+    before=$(child_sync_state | cut -d' ' -f1)
+    curl -s -b "$COOKIES_CHILD" -X POST "http://127.0.0.1:$CHILD_PORT/admin/sync_now" >/dev/null
+    for i in $(seq 1 60); do
         sleep 1
+        read -r id running <<< "$(child_sync_state)"
+        [ "$id" != "$before" ] && [ "$running" = "False" ] && return 0
     done
-    echo "WARNING: sync did not complete in 30s"
+    echo "WARNING: sync did not complete in 60s"
     return 1
 }
 
@@ -139,6 +169,11 @@ SJSON
     CREATED_SECRETS=true
 fi
 
+# Both instances run from APP_DIR, so the first boot's JSON import renames the
+# checked-in slideshow_config.json; cleanup puts it back
+SLIDESHOW_CONFIG="$APP_DIR/slideshow_config.json"
+[ -f "$SLIDESHOW_CONFIG" ] && HAD_SLIDESHOW_CONFIG=true
+
 echo "Setting up isolated directories..."
 mkdir -p "$MASTER_DIR/photos" "$CHILD_DIR/photos"
 
@@ -157,11 +192,12 @@ cat > "$MASTER_DIR/device_state.json" <<JSON
 }
 JSON
 
-# Child state: role=child, pointing at master, long interval (we trigger manually)
+# Child state: role=child, pointing at master, long interval (we trigger manually).
+# master_url uses "localhost" so the LAN address discovery finds (127.0.0.1) differs
 cat > "$CHILD_DIR/device_state.json" <<JSON
 {
   "sync_role": "child",
-  "master_url": "http://127.0.0.1:$MASTER_PORT",
+  "master_url": "http://localhost:$MASTER_PORT",
   "sync_token": "$SYNC_TOKEN",
   "sync_interval": 86400
 }
@@ -214,8 +250,7 @@ done
 restart_master
 
 # Trigger sync on child
-curl -s -b "$COOKIES_CHILD" -X POST "http://127.0.0.1:$CHILD_PORT/admin/sync_now" >/dev/null
-wait_sync_done
+sync_child_now
 
 # Verify photos landed in child's sync dir
 CHILD_COUNT=$(find "$CHILD_DIR/photos/sync" -name "*.jpg" 2>/dev/null | wc -l | tr -d ' ')
@@ -227,8 +262,8 @@ echo "=== Test 5: MD5 verification ==="
 ALL_MATCH=true
 for i in 1 2 3; do
     if [ -f "$CHILD_DIR/photos/sync/photo_$i.jpg" ]; then
-        MASTER_MD5=$(md5 -q "$MASTER_DIR/photos/photo_$i.jpg")
-        CHILD_MD5=$(md5 -q "$CHILD_DIR/photos/sync/photo_$i.jpg")
+        MASTER_MD5=$(file_md5 "$MASTER_DIR/photos/photo_$i.jpg")
+        CHILD_MD5=$(file_md5 "$CHILD_DIR/photos/sync/photo_$i.jpg")
         if [ "$MASTER_MD5" != "$CHILD_MD5" ]; then
             ALL_MATCH=false
             echo "    photo_$i.jpg: master=$MASTER_MD5 child=$CHILD_MD5"
@@ -247,8 +282,7 @@ echo "=== Test 6: Deletion sync ==="
 rm "$MASTER_DIR/photos/photo_2.jpg"
 restart_master
 
-curl -s -b "$COOKIES_CHILD" -X POST "http://127.0.0.1:$CHILD_PORT/admin/sync_now" >/dev/null
-wait_sync_done
+sync_child_now
 
 CHILD_COUNT=$(find "$CHILD_DIR/photos/sync" -name "*.jpg" 2>/dev/null | wc -l | tr -d ' ')
 [ "$CHILD_COUNT" = "2" ] && result PASS "deletion sync: $CHILD_COUNT photos remain" \
@@ -264,8 +298,7 @@ echo "=== Test 7: Incremental sync - add photo_4 ==="
 create_test_photo "$MASTER_DIR/photos/photo_4.jpg" "200"
 restart_master
 
-curl -s -b "$COOKIES_CHILD" -X POST "http://127.0.0.1:$CHILD_PORT/admin/sync_now" >/dev/null
-wait_sync_done
+sync_child_now
 
 CHILD_COUNT=$(find "$CHILD_DIR/photos/sync" -name "*.jpg" 2>/dev/null | wc -l | tr -d ' ')
 [ "$CHILD_COUNT" = "3" ] && result PASS "incremental sync: $CHILD_COUNT photos" \
@@ -292,8 +325,7 @@ SYNCED_COUNT=$(curl -s -b "$COOKIES_CHILD" "http://127.0.0.1:$CHILD_PORT/admin/s
 echo ""
 echo "=== Test 9: Re-sync downloads 0 photos (no re-download bug) ==="
 # Sync again — nothing changed, should download 0
-curl -s -b "$COOKIES_CHILD" -X POST "http://127.0.0.1:$CHILD_PORT/admin/sync_now" >/dev/null
-wait_sync_done
+sync_child_now
 # Check logs for "0 to download"
 LAST_SYNC=$(curl -s -b "$COOKIES_CHILD" "http://127.0.0.1:$CHILD_PORT/admin/sync_status" \
     | python3 -c "import sys,json; d=json.load(sys.stdin); print(d.get('synced_photo_count',0))")
@@ -304,8 +336,8 @@ LAST_SYNC=$(curl -s -b "$COOKIES_CHILD" "http://127.0.0.1:$CHILD_PORT/admin/sync
 ALL_MATCH=true
 for i in 1 3 4; do
     if [ -f "$CHILD_DIR/photos/sync/photo_$i.jpg" ] && [ -f "$MASTER_DIR/photos/photo_$i.jpg" ]; then
-        M_MD5=$(md5 -q "$MASTER_DIR/photos/photo_$i.jpg")
-        C_MD5=$(md5 -q "$CHILD_DIR/photos/sync/photo_$i.jpg")
+        M_MD5=$(file_md5 "$MASTER_DIR/photos/photo_$i.jpg")
+        C_MD5=$(file_md5 "$CHILD_DIR/photos/sync/photo_$i.jpg")
         [ "$M_MD5" != "$C_MD5" ] && ALL_MATCH=false
     fi
 done
@@ -420,8 +452,7 @@ sleep 5
 restart_master
 
 # Sync to child
-curl -s -b "$COOKIES_CHILD" -X POST "http://127.0.0.1:$CHILD_PORT/admin/sync_now" >/dev/null
-wait_sync_done
+sync_child_now
 CHILD_HAS=$(find "$CHILD_DIR/photos/sync" -name "*.jpg" 2>/dev/null | wc -l | tr -d ' ')
 [ "$CHILD_HAS" -ge 1 ] && result PASS "photo synced to child ($CHILD_HAS files)" \
                         || result FAIL "photo not on child after sync"
@@ -441,12 +472,21 @@ curl -s -X POST -H "Content-Type: application/json" \
 
 # Re-sync child — deleted photo should be removed
 restart_master
-curl -s -b "$COOKIES_CHILD" -X POST "http://127.0.0.1:$CHILD_PORT/admin/sync_now" >/dev/null
-wait_sync_done
+sync_child_now
 CHILD_AFTER=$(find "$CHILD_DIR/photos/sync" -name "*.jpg" 2>/dev/null | wc -l | tr -d ' ')
 [ "$CHILD_AFTER" -lt "$CHILD_HAS" ] && result PASS "deleted photo removed from child after re-sync ($CHILD_AFTER files)" \
                                      || result FAIL "child still has $CHILD_AFTER files (expected fewer than $CHILD_HAS)"
 
+# ============================================================
+echo ""
+echo "=== Test 16: Child finds the master on the LAN ==="
+# Earlier cycles taught the child the master's sync_id; this one probes for it
+sync_child_now
+VIA_LAN=$(curl -s -b "$COOKIES_CHILD" "http://127.0.0.1:$CHILD_PORT/admin/sync_status" \
+    | python3 -c "import sys,json; print(json.load(sys.stdin).get('sync_via_lan'))")
+[ "$VIA_LAN" = "http://127.0.0.1:$MASTER_PORT" ] && result PASS "child syncs via LAN address $VIA_LAN" \
+                                                || result FAIL "expected LAN address, got $VIA_LAN"
+
 # Clean up temp files
 rm -f /tmp/e2e_upload_test.jpg /tmp/e2e_upload_b.jpg /tmp/e2e_cycle.jpg /tmp/e2e_upload_resp.json /tmp/e2e_delete_resp.json
 
@@ -5,19 +5,20 @@ import requests
 import qrcode
 from PIL import Image
 import db
+import progress
 from config import (
     PHOTOS_DIR,
     PICKER_API_BASE_URL,
     MODE_FILE,
     get_base_url,
 )
-from photo_ops import generate_thumbnail, compute_md5
+from photo_ops import generate_thumbnail, compute_md5, store_object
 
 def get_upload_url():
     """Build upload page URL with token.
-    Child frames point to master's upload page using their sync token.
+    Child and relay frames point to master's upload page using their sync token.
     Used by both QR watermarks and the choose_mode_qr endpoint."""
-    if db.get_setting("sync_role") == "child" and db.get_setting("master_url"):
+    if db.get_setting("sync_role") in ("child", "relay") and db.get_setting("master_url"):
         token = db.get_setting("sync_token", "")
         return f"{db.get_setting('master_url')}/upload?t={token}"
     token = db.get_setting("upload_token", "")
@@ -115,6 +116,7 @@ def download_and_return_paths(photo_urls, source):
     batch_id = int(_time.time())
 
     returned_paths = []
+    records = []  # written to the DB in one commit at the end
     for i, photo_url in enumerate(photo_urls):
         filename = f"{source}_{batch_id}_{i}.jpg"
         photo_path = os.path.join(subdir, filename)
@@ -131,17 +133,22 @@ def download_and_return_paths(photo_urls, source):
                 # Track in DB
                 size = os.path.getsize(photo_path)
                 file_md5 = compute_md5(photo_path)
-                db.add_photo(filename, subdir=source, uploaded_by='admin',
-                             size_bytes=size, md5=file_md5)
-                # Add QR watermark only in USB mode (HDMI has persistent overlay)
+                records.append({"filename": filename, "subdir": source, "uploaded_by": "admin",
+                                "size_bytes": size, "md5": file_md5})
+                # Add QR watermark only in USB mode (HDMI has persistent overlay).
+                # Watermarking rewrites the file in place, so only unmarked
+                # photos can share an inode with the object store.
                 if should_watermark:
                     add_qr_watermark(photo_path)
+                else:
+                    store_object(photo_path, file_md5)
             else:
                 print(f"Failed to download {filename}, status code: {resp.status_code}")
         else:
             print(f"{filename} already exists, skipping.")
-        db.set_setting("download_completed", i + 1)
+        progress.update("picker_download", completed=i + 1)
         returned_paths.append(f"/static/photos/{source}/{filename}")
+    db.add_photos(records)
     return returned_paths
 
 _usb_sync_lock = threading.Lock()
@@ -214,13 +221,11 @@ def fetch_and_download_picker_photos(session_id):
                 picker_photo_urls.append(item["mediaFile"]["baseUrl"] + "=w2048-h1024")
 
         # Track download progress for admin UI
-        db.set_setting("downloading", True)
-        db.set_setting("download_total", len(picker_photo_urls))
-        db.set_setting("download_completed", 0)
-
-        download_and_return_paths(picker_photo_urls, "picker")
-
-        db.set_setting("downloading", False)
+        progress.start("picker_download", total=len(picker_photo_urls))
+        try:
+            download_and_return_paths(picker_photo_urls, "picker")
+        finally:
+            progress.finish("picker_download")
 
         # Notify: sets done/photos_chosen, triggers USB sync if needed
         from photo_ops import notify_photos_changed